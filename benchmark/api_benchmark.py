@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-24 16:30
+# Author  : Jiang Liu
+# Desc    : 进程内接口的基准测试：在只有几个页面的小文档上，比较每次启动命令行进程、每次重新加载配置并创建合并器、
+#           以及复用同一个 DocsifyMerger 时每次合并的耗时，并检查三种方式的输出一致
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+
+import src.log as log
+from src.docsify_merger import DocsifyMerger
+from src.serial_number_matcher import _compile_serial_number_matcher
+
+REMOVE_CONFIG_FILE = os.path.join(ROOT_PATH, 'config', 'serial_number_remove_config.json')
+GENERATE_CONFIG_FILE = os.path.join(ROOT_PATH, 'config', 'serial_number_generate_config.json')
+
+
+def build_book(root_path, pages):
+    """
+    该函数用于生成测试用的小文档：主页与 pages 个页面，每个页面有几级标题与一个内链
+    """
+    sidebar = ["- [Home](/)\n"]
+    with open(os.path.join(root_path, 'README.md'), 'w', encoding='utf-8') as file:
+        file.write("# Home\n\nA tiny book.\n")
+    for index in range(pages):
+        sidebar.append(f"- [Page {index}](page{index}.md)\n")
+        with open(os.path.join(root_path, f"page{index}.md"), 'w', encoding='utf-8') as file:
+            file.write(f"# {index + 1}. Page {index}\n\nSee [home](README.md).\n\n"
+                       f"## {index + 1}.1 Section\n\nText.\n\n### Detail\n\nMore text.\n")
+    with open(os.path.join(root_path, '_sidebar.md'), 'w', encoding='utf-8') as file:
+        file.writelines(sidebar)
+
+
+def per_call(repeat, function):
+    """
+    该函数用于多次调用并返回每次调用的平均耗时（毫秒）
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the per-call overhead of merging a tiny book')
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--cli_repeat', type=int, default=10, help='Number of command line runs')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    log.logger = logging.getLogger()
+
+    with tempfile.TemporaryDirectory() as root_path:
+        book_path = os.path.join(root_path, 'book')
+        os.makedirs(book_path)
+        build_book(book_path, args.pages)
+        cli_output = os.path.join(root_path, 'cli.md')
+        setup_output = os.path.join(root_path, 'setup.md')
+        reused_output = os.path.join(root_path, 'reused.md')
+        command = [sys.executable, os.path.join(ROOT_PATH, 'main.py'), '-d', book_path, '-o', cli_output,
+                   '-r', REMOVE_CONFIG_FILE, '-g', GENERATE_CONFIG_FILE, '--no_cache']
+
+        def run_cli():
+            subprocess.run(command, cwd=root_path, check=True, stdout=subprocess.DEVNULL)
+
+        def run_with_setup():
+            # 模拟每次都从头开始：清空匹配器的缓存，重新读取配置文件并创建合并器
+            _compile_serial_number_matcher.cache_clear()
+            merger = DocsifyMerger.from_config_files(book_path, REMOVE_CONFIG_FILE, GENERATE_CONFIG_FILE)
+            merger.merge_to_path(setup_output)
+
+        merger = DocsifyMerger.from_config_files(book_path, REMOVE_CONFIG_FILE, GENERATE_CONFIG_FILE)
+        results = [
+            ('command line', per_call(args.cli_repeat, run_cli)),
+            ('setup per call', per_call(args.repeat, run_with_setup)),
+            ('reused merger', per_call(args.repeat, lambda: merger.merge_to_path(reused_output))),
+            ('reused, lines only', per_call(args.repeat, lambda: sum(1 for _ in merger.merge_to_lines()))),
+        ]
+        with open(cli_output, 'rb') as cli, open(setup_output, 'rb') as setup, open(reused_output, 'rb') as reused:
+            expected = cli.read()
+            assert setup.read() == expected and reused.read() == expected
+        for name, elapsed in results:
+            print(f"{name:<20} {elapsed:>9.3f} ms/call")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-25 17:05
+# Author  : Jiang Liu
+# Desc    : 异步接口的基准测试：在合成的文档树上，比较在协程中直接调用同步接口与使用 merge_to_async_chunks 时，
+#           事件循环的最长停顿、得到第一个文本块的时间以及总耗时，并检查两种方式的结果一致
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import src.log as log
+from corpus_generator import CorpusConfig, generate_corpus
+from src.docsify_merger import DocsifyMerger
+
+# 事件循环中心跳任务的间隔（秒），心跳之间的额外延迟即为事件循环的停顿
+TICK = 0.005
+
+
+async def heartbeat(stalls, stopped):
+    """
+    该函数用于在事件循环中定期醒来，记录每次醒来比预期晚了多久
+    """
+    last = time.perf_counter()
+    while not stopped.is_set():
+        await asyncio.sleep(TICK)
+        now = time.perf_counter()
+        stalls.append(now - last - TICK)
+        last = now
+
+
+async def measure(consume):
+    """
+    该函数用于在心跳任务运行的同时执行 consume
+    :param consume:     协程函数，接收一个记录时间的回调，在得到第一个文本块时调用，返回合并后的文本
+    :return:            (最长停顿, 第一个文本块的时间, 总耗时, 合并后的文本)，时间单位为秒
+    """
+    stalls = []
+    stopped = asyncio.Event()
+    task = asyncio.create_task(heartbeat(stalls, stopped))
+    await asyncio.sleep(TICK * 2)
+    start = time.perf_counter()
+    first = []
+
+    def on_first():
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    text = await consume(on_first)
+    total = time.perf_counter() - start
+    stopped.set()
+    await task
+    return max(stalls), first[0], total, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure event loop stalls while merging from a coroutine')
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--file_lines', type=int, default=200)
+    parser.add_argument('--chunk_size', type=int, default=64 * 1024)
+    parser.add_argument('--max_pending', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--dir', type=str, default=None, help='Directory to build the tree in')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    log.logger = logging.getLogger()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root_path:
+        generate_corpus(root_path, CorpusConfig(files=args.files, file_lines=args.file_lines))
+        merger = DocsifyMerger(root_path, workers=args.workers)
+
+        async def blocking(on_first):
+            chunks = list(merger.merge_to_chunks(args.chunk_size))
+            on_first()
+            return ''.join(chunks)
+
+        async def streaming(on_first):
+            chunks = []
+            async for chunk in merger.merge_to_async_chunks(args.chunk_size, max_pending=args.max_pending):
+                on_first()
+                chunks.append(chunk)
+            return ''.join(chunks)
+
+        results = [(name, asyncio.run(measure(consume))) for name, consume in
+                   [('blocking call', blocking), ('async chunks', streaming)]]
+        assert results[0][1][3] == results[1][1][3]
+        print(f"{'':<16} {'max stall ms':>13} {'first chunk ms':>15} {'total s':>9}")
+        for name, (stall, first, total, _) in results:
+            print(f"{name:<16} {stall * 1000:>13.1f} {first * 1000:>15.1f} {total:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-18 19:47
+# Author  : Jiang Liu
+# Desc    : 合成 Docsify 文档树的生成器：可以控制文件数量、侧边栏深度、文件大小、标题密度、链接密度、代码块比例以及中文编号标题的比例
+import argparse
+import json
+import os
+import random
+
+CHINESE_NUMERALS = ['一', '二', '三', '四', '五', '六', '七', '八', '九', '十']
+CHINESE_UNITS = ['章', '节', '小节', '讲', '部分']
+WORDS = ['docsify', 'merger', 'sidebar', 'markdown', 'heading', 'serial', 'number', 'document', 'section',
+         'example', 'config', 'output', 'render', 'plugin', 'theme', 'search', 'cache', 'route', 'page', 'link']
+CJK_WORDS = ['文档', '侧边栏', '标题', '编号', '配置', '输出', '插件', '主题', '搜索', '缓存', '路由', '页面']
+
+
+class CorpusConfig:
+    """
+    该类用于描述合成文档树的参数
+    """
+
+    def __init__(self, files=500, depth=3, file_lines=200, heading_density=0.1, link_density=0.2,
+                 code_ratio=0.1, cjk_ratio=0.3, seed=0):
+        """
+        该函数用于初始化合成文档树的参数
+        :param files:               Markdown文件的数量（不包括主页）
+        :param depth:               侧边栏的深度，为1时所有文件都在同一层级
+        :param file_lines:          每个文件的行数
+        :param heading_density:     标题行占所有行的比例
+        :param link_density:        每个正文行包含链接的概率，其中四分之一为外链
+        :param code_ratio:          位于代码块中的行占所有行的比例（近似值）
+        :param cjk_ratio:           带编号的标题中使用中文编号（例如 "第三章"）的比例
+        :param seed:                随机数种子，相同的参数与种子生成的文档树完全相同
+        """
+        self.files = files
+        self.depth = depth
+        self.file_lines = file_lines
+        self.heading_density = heading_density
+        self.link_density = link_density
+        self.code_ratio = code_ratio
+        self.cjk_ratio = cjk_ratio
+        self.seed = seed
+
+    def to_dict(self):
+        """
+        该函数用于将参数转换为字典，便于输出为 JSON
+        :return:    参数的字典
+        """
+        return dict(self.__dict__)
+
+
+def to_chinese(n):
+    """
+    该函数用于将 1 到 99 的整数转换为中文数字，用于生成 "第十二章" 这类标题
+    :param n:   整数
+    :return:    中文数字
+    """
+    if n <= 10:
+        return CHINESE_NUMERALS[n - 1]
+    tens, ones = divmod(n, 10)
+    prefix = '' if tens == 1 else CHINESE_NUMERALS[tens - 1]
+    return prefix + '十' + (CHINESE_NUMERALS[ones - 1] if ones else '')
+
+
+def build_heading(rng, config, counters):
+    """
+    该函数用于生成一个标题行，标题可能带有数字编号、中文编号或不带编号
+    :param rng:         随机数生成器
+    :param config:      合成文档树的参数
+    :param counters:    当前文件中各级标题的计数器
+    :return:            标题行
+    """
+    level = rng.choice((1, 2, 2, 3, 3, 3, 4))
+    counters[level - 1] += 1
+    for index in range(level, len(counters)):
+        counters[index] = 0
+    counter = counters[level - 1]
+    if rng.random() < config.cjk_ratio:
+        serial = f"第{to_chinese(min(counter, 99))}{rng.choice(CHINESE_UNITS)} "
+        name = ''.join(rng.choice(CJK_WORDS) for _ in range(2))
+    elif rng.random() < 0.8:
+        serial = '.'.join(str(max(count, 1)) for count in counters[:level]) + ' '
+        name = ' '.join(rng.choice(WORDS) for _ in range(3)).capitalize()
+    else:
+        serial = ''
+        name = ' '.join(rng.choice(WORDS) for _ in range(3)).capitalize()
+    return f"{'#' * level} {serial}{name}\n"
+
+
+def build_text(rng, config, paths):
+    """
+    该函数用于生成一个正文行，可能包含内链或外链
+    :param rng:         随机数生成器
+    :param config:      合成文档树的参数
+    :param paths:       所有Markdown文件的链接，用于生成内链
+    :return:            正文行
+    """
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    if rng.random() < config.link_density:
+        position = rng.randrange(len(words))
+        if rng.random() < 0.25:
+            words[position] = f'[{words[position]}](https://example.com/{words[position]} "{words[position]}")'
+        else:
+            words[position] = f'[{words[position]}]({rng.choice(paths)}#{rng.choice(WORDS)})'
+    return ' '.join(words) + '\n'
+
+
+def build_code_block(rng, length):
+    """
+    该函数用于生成一个代码块，代码块中包含形似标题与链接的行，用于检验代码块不会被处理
+    :param rng:     随机数生成器
+    :param length:  代码块的总行数（包括围栏）
+    :return:        代码块的行列表
+    """
+    lines = ["```bash\n"]
+    for _ in range(max(length - 2, 0)):
+        choice = rng.random()
+        if choice < 0.2:
+            lines.append(f"# {rng.choice(WORDS)} comment\n")
+        elif choice < 0.3:
+            lines.append(f"echo '[{rng.choice(WORDS)}](page.md)'\n")
+        else:
+            lines.append(f"{rng.choice(WORDS)} --{rng.choice(WORDS)} {rng.randint(0, 999)}\n")
+    lines.append("```\n")
+    return lines
+
+
+def build_file(rng, config, paths):
+    """
+    该函数用于生成一个Markdown文件的内容
+    :param rng:         随机数生成器
+    :param config:      合成文档树的参数
+    :param paths:       所有Markdown文件的链接
+    :return:            Markdown文件的行列表
+    """
+    lines = []
+    counters = [0] * 6
+    code_length = 8
+    # 每一行开启代码块的概率，使代码块中的行约占 code_ratio
+    code_start = config.code_ratio / code_length / max(1 - config.code_ratio, 1e-6)
+    while len(lines) < config.file_lines:
+        choice = rng.random()
+        if choice < config.heading_density:
+            lines.append(build_heading(rng, config, counters))
+            lines.append("\n")
+        elif choice < config.heading_density + code_start:
+            lines.extend(build_code_block(rng, code_length))
+        else:
+            lines.append(build_text(rng, config, paths))
+    return lines[:config.file_lines]
+
+
+def build_layout(config):
+    """
+    该函数用于计算文档树的布局：侧边栏的行以及每个文件的链接。
+    文件的编号按 branch 进制展开，前 depth - 1 位对应目录层级，因此侧边栏的深度恰好为 depth
+    :param config:  合成文档树的参数
+    :return:        (侧边栏的行列表, 文件链接列表)
+    """
+    depth = max(config.depth, 1)
+    branch = 2
+    while branch ** depth < config.files:
+        branch += 1
+    sidebar = ["- [Home](README.md)\n"]
+    paths = []
+    previous = None
+    for index in range(config.files):
+        digits = []
+        value = index
+        for _ in range(depth):
+            value, digit = divmod(value, branch)
+            digits.append(digit)
+        digits.reverse()
+        folders = digits[:-1]
+        for level, _ in enumerate(folders):
+            if previous is None or previous[:level + 1] != folders[:level + 1]:
+                name = '.'.join(str(digit) for digit in folders[:level + 1])
+                sidebar.append(f"{'    ' * level}- Section {name}\n")
+        previous = folders
+        link = '/'.join([f"s{digit}" for digit in folders] + [f"page-{index:05d}.md"])
+        sidebar.append(f"{'    ' * len(folders)}- [Page {index}]({link})\n")
+        paths.append(link)
+    return sidebar, paths
+
+
+def generate_corpus(root_path, config):
+    """
+    该函数用于在指定目录下生成合成的 Docsify 文档树
+    :param root_path:   Docsify的根目录
+    :param config:      合成文档树的参数（CorpusConfig）
+    :return:            文档树的统计信息：文件数、字节数、行数、标题数、链接数
+    """
+    rng = random.Random(config.seed)
+    sidebar, paths = build_layout(config)
+    stats = {'files': 0, 'bytes': 0, 'lines': 0, 'headings': 0, 'links': 0}
+    os.makedirs(root_path, exist_ok=True)
+    for link in ['README.md'] + paths:
+        lines = build_file(rng, config, paths)
+        path = os.path.join(root_path, link)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = ''.join(lines).encode('utf-8')
+        with open(path, 'wb') as file:
+            file.write(data)
+        stats['files'] += 1
+        stats['bytes'] += len(data)
+        stats['lines'] += len(lines)
+        in_code = False
+        for line in lines:
+            if line.startswith('```'):
+                in_code = not in_code
+            elif not in_code:
+                stats['headings'] += line.startswith('#')
+                stats['links'] += line.count('](')
+    with open(os.path.join(root_path, '_sidebar.md'), 'w', encoding='utf-8') as file:
+        file.writelines(sidebar)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Docsify tree')
+    parser.add_argument('root_path', type=str)
+    defaults = CorpusConfig()
+    for name, value in defaults.to_dict().items():
+        parser.add_argument(f'--{name}', type=type(value), default=value)
+    args = parser.parse_args()
+    config = CorpusConfig(**{name: getattr(args, name) for name in defaults.to_dict()})
+    stats = generate_corpus(args.root_path, config)
+    print(json.dumps({'config': config.to_dict(), 'corpus': stats}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-27 17:20
+# Author  : Jiang Liu
+# Desc    : 行缓冲的基准测试：在合成的文档树上解析内链并添加目录（需要在内存中保存整个文档），
+#           比较原先以 str 列表保存合并后的行、再拼接为一个字符串并编码（服务模式）的方式，与 merge_to_buffer 的方式，
+#           输出保存文档所占的内存、峰值内存、垃圾回收的次数与耗时以及总耗时，并检查两种方式的结果一致
+import argparse
+import gc
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import src.log as log
+from corpus_generator import CorpusConfig, generate_corpus
+from src.docsify_merger import DocsifyMerger, decode_raw_lines
+
+
+def merge_with_list(merger, stored):
+    """
+    该函数用于按原先的方式合并：合并后的行保存在 str 列表中，解析内链后与目录拼接为一个字符串再编码
+    :param stored:  用于返回保存文档所占内存的列表，由 measure 在保存完成时填充
+    """
+    anchor_index = merger.new_anchor_index()
+    toc = merger.new_table_of_contents()
+    lines = list(decode_raw_lines(merger.iter_merged_lines(anchor_index, toc)))
+    stored.append(tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0)
+    return ''.join(itertools.chain(toc.lines(), anchor_index.resolve_lines(lines))).encode('utf-8')
+
+
+def merge_with_buffer(merger, stored):
+    """
+    该函数用于使用行缓冲合并：合并后的行保存在 LineBuffer 中，内链在缓冲中改写，最后直接得到字节
+    """
+    buffer = merger.merge_to_buffer()
+    stored.append(tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0)
+    return buffer.to_bytes()
+
+
+def measure(merger, function):
+    """
+    该函数用于分两次执行 function：第一次统计垃圾回收与耗时，第二次使用 tracemalloc 统计内存（tracemalloc 会拖慢执行）
+    :return:    (保存文档所占的内存, 峰值内存, 垃圾回收次数, 垃圾回收耗时, 总耗时, 结果)，内存单位为字节，时间单位为秒
+    """
+    pauses = []
+    started = []
+
+    def on_gc(phase, info):
+        if phase == 'start':
+            started.append(time.perf_counter())
+        elif started:
+            pauses.append(time.perf_counter() - started.pop())
+
+    gc.collect()
+    gc.callbacks.append(on_gc)
+    start = time.perf_counter()
+    try:
+        content = function(merger, [])
+    finally:
+        gc.callbacks.remove(on_gc)
+    total = time.perf_counter() - start
+    del content
+
+    gc.collect()
+    stored = []
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    content = function(merger, stored)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return stored[0] - base, peak - base, len(pauses), sum(pauses), total, content
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare holding a merged book in a list of str and in a LineBuffer')
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--file_lines', type=int, default=200)
+    parser.add_argument('--mmap_threshold', type=float, default=None)
+    parser.add_argument('--dir', type=str, default=None, help='Directory to build the tree in')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    log.logger = logging.getLogger()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root_path:
+        generate_corpus(root_path, CorpusConfig(files=args.files, file_lines=args.file_lines))
+        merger = DocsifyMerger(root_path, workers=4, resolve_links=True, toc_depth=3,
+                               mmap_threshold=args.mmap_threshold)
+        results = [(name, measure(merger, function)) for name, function in
+                   [('list of str', merge_with_list), ('line buffer', merge_with_buffer)]]
+        assert results[0][1][5] == results[1][1][5]
+        print(f"{len(results[0][1][5]) / 1024 / 1024:.1f} MB merged")
+        print(f"{'':<12} {'stored MB':>10} {'peak MB':>9} {'gc runs':>8} {'gc ms':>8} {'total s':>8}")
+        for name, (stored, peak, runs, pause, total, _) in results:
+            print(f"{name:<12} {stored / 1024 / 1024:>10.1f} {peak / 1024 / 1024:>9.1f} {runs:>8} "
+                  f"{pause * 1000:>8.1f} {total:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-20 16:05
+# Author  : Jiang Liu
+# Desc    : 链接扫描器的基准测试：在构造的最坏情况输入上比较原先的整文件 DOTALL 正则与单遍扫描器，
+#           输入长度每次翻倍，正则的耗时按平方增长，而扫描器的耗时按线性增长
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.link_scanner import replace_links
+
+# 原先的实现：对整个文件执行一次 DOTALL 正则
+LEGACY_REGEX = re.compile(r"\[(?P<description>(?:\\[\[\]]|[^\[\]])*)\]\(\s*(?P<url>[^\s\)]+)?"
+                          r"(?:\s+[\"\'](?P<title>.*?)[\"\'])?\s*\)", flags=re.DOTALL)
+
+# 最坏情况的输入：参数为输入的大致长度（字符数）
+CASES = {
+    # 大量没有结束的标题，每个链接的开始都要扫描到文件末尾
+    'unclosed_titles': lambda n: '[a](u "' * (n // 7),
+    # 链接后面跟着很长的空白，正则需要在 \s* 与 \s+ 之间尝试所有的划分方式
+    'whitespace_run': lambda n: '[a](' + ' ' * (n - 5) + 'x',
+    # 链接中可以包含 "["，每个链接的开始都会重新解析同一段很长的链接
+    'open_urls': lambda n: '[a](u' * (n // 5 - 1) + ' x',
+    # 大量的引号，每个引号都可能是标题的结束
+    'quotes': lambda n: '[a](u "' + "'" * (n - 7),
+    # 大量没有闭合的方括号与转义的方括号
+    'brackets': lambda n: ('[' + '\\]' * 8) * (n // 17),
+    # 长度各不相同的反引号，行内代码的匹配需要按长度分组
+    'backticks': lambda n: ''.join('`' * (i % 7 + 1) + '[a](b.md)' for i in range(n // 13)),
+    # 正常的文档：每行一个内链与一个外链
+    'typical': lambda n: '[intro](guide.md#intro) see [site](https://example.com "Site")\n' * (n // 63),
+}
+
+
+def legacy_replace(text):
+    """
+    该函数为原先的实现，内链只保留描述，外链保持不变
+    """
+    return LEGACY_REGEX.sub(lambda match: match.group(0) if (match.group('url') or '').startswith('http')
+                            else match.group('description'), text)
+
+
+def scanner_replace(text):
+    """
+    该函数使用单遍扫描器，替换规则与 legacy_replace 相同
+    """
+    return replace_links(text, lambda description, url, title, original: original if (url or '').startswith('http')
+                         else description)
+
+
+def best_of(function, text, repeat):
+    """
+    该函数用于多次执行并返回最短的耗时（毫秒）
+    """
+    return min(timeit.repeat(lambda: function(text), number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the legacy link regex with the single-pass link scanner')
+    parser.add_argument('--cases', type=str, nargs='*', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 2000, 4000, 8000, 16000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy_limit', type=float, default=10.0,
+                        help='Skip the legacy regex on larger inputs once a single run exceeds this many seconds')
+    args = parser.parse_args()
+
+    print(f"{'case':<16} {'chars':>8} {'legacy ms':>12} {'scanner ms':>12} {'speedup':>9}")
+    for name in args.cases:
+        legacy_skipped = False
+        for size in args.sizes:
+            text = CASES[name](size)
+            fast = best_of(scanner_replace, text, args.repeat)
+            if legacy_skipped:
+                print(f"{name:<16} {len(text):>8} {'skipped':>12} {fast:>12.2f} {'':>9}")
+                continue
+            slow = best_of(legacy_replace, text, 1 if size > args.sizes[0] else args.repeat)
+            # 除了反引号的情况（扫描器不处理行内代码中的链接），两种实现的结果必须一致
+            if name != 'backticks':
+                assert scanner_replace(text) == legacy_replace(text), name
+            legacy_skipped = slow / 1000 > args.legacy_limit
+            print(f"{name:<16} {len(text):>8} {slow:>12.2f} {fast:>12.2f} {slow / max(fast, 1e-6):>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-22 14:12
+# Author  : Jiang Liu
+# Desc    : 内存映射模式的基准测试：在包含一个很大的自动生成的 API 参考页面的文档树上，
+#           比较原来的逐行处理、内存映射模式以及直接复制文件的吞吐量，并检查两种处理方式的输出完全一致
+import argparse
+import filecmp
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.log as log
+from src.mapped_markdown import RawLineWriter
+from src.merger_markdown import merge
+from src.renumber_title import renumber_titles
+
+WORDS = ['returns', 'the', 'value', 'of', 'parameter', 'request', 'response', 'object', 'field', 'string',
+         'integer', 'optional', 'required', 'default', 'client', 'server', 'timeout', 'buffer', 'stream', 'index']
+
+
+def write_api_reference(path, size, link_ratio=0.05, code_ratio=0.1, paragraphs=5, seed=0):
+    """
+    该函数用于生成一个类似自动生成的 API 参考的大文件：每个接口一个标题，之后是说明段落、参数表与示例代码
+    :param path:        文件路径
+    :param size:        文件的大致字节数
+    :param link_ratio:  包含内链的段落的比例
+    :param code_ratio:  示例代码的比例
+    :param paragraphs:  每个接口的说明段落数的上限，段落越多，标题越稀疏
+    :param seed:        随机数种子
+    """
+    rng = random.Random(seed)
+    written = 0
+    index = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        while written < size:
+            index += 1
+            parts = [f"## {index}. api_{index}\n\n"]
+            for _ in range(rng.randint(2, max(paragraphs, 2))):
+                sentences = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(12, 30)))
+                if rng.random() < link_ratio:
+                    sentences += f" See [api_{index - 1}](api.md#api_{index - 1})."
+                parts.append(f"{sentences.capitalize()}.\n{' '.join(rng.choice(WORDS) for _ in range(16))}.\n\n")
+            parts.append("| name | type | description |\n| ---- | ---- | ----------- |\n")
+            parts.extend(f"| arg{i} | string | {' '.join(rng.choice(WORDS) for _ in range(8))} |\n" for i in range(6))
+            parts.append("\n")
+            if rng.random() < code_ratio:
+                parts.append(f"```python\nclient.api_{index}(arg0, arg1)\n```\n\n")
+            text = ''.join(parts)
+            file.write(text)
+            written += len(text)
+
+
+def build_tree(root_path, size, link_ratio, code_ratio, paragraphs):
+    """
+    该函数用于生成测试用的 Docsify 文件树：主页与一个很大的 API 参考页面
+    :return:    API 参考页面的路径
+    """
+    with open(os.path.join(root_path, '_sidebar.md'), 'w', encoding='utf-8') as file:
+        file.write("- [Home](README.md)\n- [API](api.md)\n")
+    with open(os.path.join(root_path, 'README.md'), 'w', encoding='utf-8') as file:
+        file.write("# Home\n\nSee the [API reference](api.md).\n")
+    path = os.path.join(root_path, 'api.md')
+    write_api_reference(path, size, link_ratio, code_ratio, paragraphs)
+    return path
+
+
+def time_merge(root_path, output_path, mmap_threshold=None):
+    """
+    该函数用于统计一次合并并写入输出文件的耗时
+    :param root_path:       Docsify的根目录
+    :param output_path:     输出文件的路径
+    :param mmap_threshold:  使用内存映射的最小文件大小（字节），为 None 时不使用内存映射
+    :return:                耗时（秒）
+    """
+    start = time.perf_counter()
+    tokens = merge(root_path, os.path.join(root_path, 'README.md'), mmap_threshold=mmap_threshold)
+    with open(output_path, 'w', encoding='utf-8') as file:
+        writer = file if mmap_threshold is None else RawLineWriter(file)
+        writer.writelines(renumber_titles(tokens))
+    return time.perf_counter() - start
+
+
+def time_copy(source_path, output_path):
+    """
+    该函数用于统计直接复制文件的耗时，作为吞吐量的上限
+    """
+    start = time.perf_counter()
+    shutil.copyfile(source_path, output_path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare line-by-line processing, the mmap fast path and a raw copy')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 64, 256], help='Size of the big page in MB')
+    parser.add_argument('--link_ratio', type=float, default=0.05)
+    parser.add_argument('--code_ratio', type=float, default=0.1)
+    parser.add_argument('--paragraphs', type=int, default=5, help='Maximum number of paragraphs under each heading')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--dir', type=str, default=None, help='Directory to build the tree in')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    log.logger = logging.getLogger()
+
+    print(f"{'MB':>6} {'lines s':>9} {'mmap s':>9} {'copy s':>9} {'lines MB/s':>11} {'mmap MB/s':>10} {'copy MB/s':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(dir=args.dir) as root_path:
+            source_path = build_tree(root_path, size * 1024 * 1024, args.link_ratio, args.code_ratio,
+                                     args.paragraphs)
+            lines_output = os.path.join(root_path, 'lines.out')
+            mmap_output = os.path.join(root_path, 'mmap.out')
+            copy_output = os.path.join(root_path, 'copy.out')
+            lines = min(time_merge(root_path, lines_output) for _ in range(args.repeat))
+            mapped = min(time_merge(root_path, mmap_output, mmap_threshold=0) for _ in range(args.repeat))
+            copied = min(time_copy(source_path, copy_output) for _ in range(args.repeat))
+            assert filecmp.cmp(lines_output, mmap_output, shallow=False), size
+            megabytes = os.path.getsize(source_path) / 1024 / 1024
+            print(f"{megabytes:>6.0f} {lines:>9.3f} {mapped:>9.3f} {copied:>9.3f} {megabytes / lines:>11.1f} "
+                  f"{megabytes / mapped:>10.1f} {megabytes / copied:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-13 11:08
+# Author  : Jiang Liu
+# Desc    : 预读取的基准测试：在冷缓存的文件树上比较顺序读取与线程池预读取的合并耗时
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.log as log
+import src.prefetch as prefetch
+from src.merger_markdown import merge
+
+
+def build_tree(root_path, file_count, files_per_folder=50):
+    """
+    该函数用于生成测试用的 Docsify 文件树
+    :param root_path:           Docsify的根目录
+    :param file_count:          Markdown文件的数量
+    :param files_per_folder:    每个文件夹中的文件数量
+    :return:                    所有Markdown文件的路径列表
+    """
+    paths = []
+    sidebar = []
+    for index in range(file_count):
+        folder = f"part-{index // files_per_folder:04d}"
+        if index % files_per_folder == 0:
+            os.makedirs(os.path.join(root_path, folder))
+            sidebar.append(f"- Part {index // files_per_folder}\n")
+        link = f"{folder}/page-{index:05d}.md"
+        sidebar.append(f"    - [Page {index}]({link})\n")
+        path = os.path.join(root_path, link)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(f"# 1.{index} Page {index}\n\n" + "Some text with a [link](other.md).\n" * 40)
+        paths.append(path)
+    with open(os.path.join(root_path, '_sidebar.md'), 'w', encoding='utf-8') as file:
+        file.writelines(sidebar)
+    with open(os.path.join(root_path, 'README.md'), 'w', encoding='utf-8') as file:
+        file.write("# Home\n")
+    return paths
+
+
+def drop_page_cache(paths):
+    """
+    该函数用于尽可能地将文件从页缓存中移除，以模拟冷缓存
+    :param paths:   文件路径列表
+    :return:        是否成功移除
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def time_merge(root_path, workers):
+    """
+    该函数用于统计一次合并的耗时
+    :param root_path:   Docsify的根目录
+    :param workers:     预读取线程数
+    :return:            耗时（秒）
+    """
+    start = time.perf_counter()
+    for _ in merge(root_path, os.path.join(root_path, 'README.md'), workers=workers):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sidebar file prefetching')
+    parser.add_argument('--files', type=int, default=5000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--dir', type=str, default=None, help='Directory to build the tree in (e.g. on NFS)')
+    parser.add_argument('--latency_ms', type=float, default=0,
+                        help='Simulated per-file read latency, for machines without a slow file system at hand')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    log.logger = logging.getLogger()
+
+    if args.latency_ms > 0:
+        read_markdown_bytes = prefetch.read_markdown_bytes
+
+        def slow_read_markdown_bytes(path):
+            time.sleep(args.latency_ms / 1000)
+            return read_markdown_bytes(path)
+
+        prefetch.read_markdown_bytes = slow_read_markdown_bytes
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root_path:
+        paths = build_tree(root_path, args.files)
+        for workers in args.workers:
+            cold = drop_page_cache(paths)
+            elapsed = time_merge(root_path, workers)
+            print(f"workers={workers:<3} files={args.files} latency={args.latency_ms}ms "
+                  f"{'cold' if cold else 'warm'} cache: {elapsed:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-12 17:20
+# Author  : Jiang Liu
+# Desc    : 标题编号匹配器的微基准测试：比较逐个 re.match 与 SerialNumberMatcher 的单个标题耗时
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.renumber_title import DEFAULT_SERIAL_NUMBER_REGEX_LIST
+from src.serial_number_matcher import SerialNumberMatcher
+
+# 用于生成额外正则的前缀，模拟不同文档体系下的编号风格
+PREFIX_WORDS = ['Chapter', 'Part', 'Section', 'Step', 'Lesson', 'Appendix', 'Unit', 'Module',
+                '第', '卷', '篇', '§', 'No.', 'Case', 'Rule', 'Item']
+
+
+def build_regex_list(count):
+    """
+    该函数用于生成指定数量的标题编号正则表达式，前几个为默认配置
+    :param count:   正则表达式的数量
+    :return:        正则表达式列表
+    """
+    regex_list = list(DEFAULT_SERIAL_NUMBER_REGEX_LIST)
+    index = 0
+    while len(regex_list) < count:
+        word = PREFIX_WORDS[index % len(PREFIX_WORDS)]
+        regex_list.append(rf'^{re.escape(word)}\s*{index // len(PREFIX_WORDS)}[\.:：]')
+        index += 1
+    return regex_list[:count]
+
+
+def build_titles(count, seed=0):
+    """
+    该函数用于生成测试用的标题
+    :param count:   标题的数量
+    :param seed:    随机数种子
+    :return:        标题列表
+    """
+    rng = random.Random(seed)
+    samples = ['1.2. Overview', '3.4.5 Details', '第三章 概述', '(a) Notes', 'Chapter 7: Intro',
+               'Quick start', 'Configuration', '安装指南', 'Step 2. Deploy', 'FAQ']
+    return [rng.choice(samples) for _ in range(count)]
+
+
+def naive_longest_match(regex_list, title_name):
+    """
+    该函数为原先的实现：对每一个正则调用一次 re.match
+    """
+    max_length_match = ""
+    for regex in regex_list:
+        match = re.match(regex, title_name)
+        if match and len(match.group()) > len(max_length_match):
+            max_length_match = match.group()
+    return max_length_match
+
+
+def main():
+    titles = build_titles(2000)
+    print(f"{'patterns':>10} {'naive us/heading':>18} {'matcher us/heading':>20} {'speedup':>9}")
+    for count in (4, 16, 64, 256, 512):
+        regex_list = build_regex_list(count)
+        matcher = SerialNumberMatcher(regex_list)
+        for title in titles:
+            assert matcher.longest_match(title) == naive_longest_match(regex_list, title)
+        naive = min(timeit.repeat(lambda: [naive_longest_match(regex_list, title) for title in titles],
+                                  number=1, repeat=3)) / len(titles) * 1e6
+        fast = min(timeit.repeat(lambda: [matcher.longest_match(title) for title in titles],
+                                 number=1, repeat=3)) / len(titles) * 1e6
+        print(f"{count:>10} {naive:>18.2f} {fast:>20.2f} {naive / fast:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
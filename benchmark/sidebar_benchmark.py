@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-23 10:05
+# Author  : Jiang Liu
+# Desc    : 侧边栏解析的基准测试：在包含数万个条目的侧边栏上，比较每行重新编译正则与预编译正则的解析耗时，
+#           以及在每个子文件夹都有 _sidebar.md 的文档树上，顺序与并发读取子侧边栏时合并为一棵树的耗时，并检查结果一致
+import argparse
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.log as log
+from src.sidebar_resolver import SidebarTreeNode, iter_nodes, load_nested_sidebars, parse_sidebar
+
+
+def legacy_parse_line(line):
+    """
+    该函数为预编译正则之前的 parse_line：每一行都重新编译一次正则，作为比较的基准
+    """
+    indentation = len(line) - len(line.lstrip())
+    line = line.lstrip()
+    regex = r"^[ ]*- (?:\[(?P<name>.*)\]\([ ]*(?P<link>\S+)?(?:[ ]+[\"\'](?P<title>.*)[\"\'])?[ ]*\)|(?P<foldername>.*))[ ]*$"
+    match = re.compile(regex).match(line)
+    if match:
+        return indentation, match.group('name'), match.group('link'), match.group('title'), match.group('foldername')
+    return indentation, None, None, None, None
+
+
+def legacy_parse_sidebar(lines, homepage):
+    """
+    该函数为使用 legacy_parse_line 的 parse_sidebar，只用于比较耗时
+    """
+    root = SidebarTreeNode()
+    stack = [root]
+    for line in lines:
+        indentation, name, link, title, folder_name = legacy_parse_line(line)
+        level = indentation // 4 + 1
+        while len(stack) > level:
+            stack.pop()
+        node = SidebarTreeNode(name=folder_name or name, link=None if folder_name else (link or homepage),
+                               level=level)
+        stack[-1].children.append(node)
+        stack.append(node)
+    return root
+
+
+def build_site(root_path, folders, entries):
+    """
+    该函数用于生成测试用的 Docsify 文件树：根侧边栏列出所有文件夹，每个文件夹有自己的 _sidebar.md，
+    其中包含分组与 entries 个页面，页面链接相对于该文件夹
+    :return:    (根侧边栏的行列表, 所有条目合并为一个侧边栏时的行列表)
+    """
+    with open(os.path.join(root_path, 'README.md'), 'w', encoding='utf-8') as file:
+        file.write("# Home\n")
+    root_lines = ["- [Home](/)\n"]
+    flat_lines = ["- [Home](/)\n"]
+    for folder_index in range(folders):
+        folder = f"part{folder_index}"
+        os.makedirs(os.path.join(root_path, folder))
+        with open(os.path.join(root_path, folder, 'README.md'), 'w', encoding='utf-8') as file:
+            file.write(f"# Part {folder_index}\n")
+        root_lines.append(f"- [Part {folder_index}]({folder}/)\n")
+        flat_lines.append(f"- Part {folder_index}\n")
+        lines = ["- [Home](/)\n"]
+        for index in range(entries):
+            if index % 20 == 0:
+                lines.append(f"- Group {index // 20}\n")
+                flat_lines.append(f"    - Group {index // 20}\n")
+            open(os.path.join(root_path, folder, f"page{index}.md"), 'w').close()
+            lines.append(f"    - [Page {index}](page{index}.md \"Page {index}\")\n")
+            flat_lines.append(f"        - [Page {index}]({folder}/page{index}.md \"Page {index}\")\n")
+        with open(os.path.join(root_path, folder, '_sidebar.md'), 'w', encoding='utf-8') as file:
+            file.writelines(lines)
+    with open(os.path.join(root_path, '_sidebar.md'), 'w', encoding='utf-8') as file:
+        file.writelines(root_lines)
+    return root_lines, flat_lines
+
+
+def best_of(repeat, function):
+    """
+    该函数用于多次执行并返回最短的耗时（秒）与最后一次的结果
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def leaves(root):
+    """
+    该函数用于列出树中所有叶子节点的 (链接, 层级)
+    """
+    return [(node.link, node.level) for node in iter_nodes(root) if not node.children]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure sidebar parsing on sidebars with tens of thousands of entries')
+    parser.add_argument('--folders', type=int, default=100, help='Number of sub folders with their own _sidebar.md')
+    parser.add_argument('--entries', type=int, default=600, help='Number of pages in each nested sidebar')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--dir', type=str, default=None, help='Directory to build the tree in')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    log.logger = logging.getLogger()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root_path:
+        _, flat_lines = build_site(root_path, args.folders, args.entries)
+        homepage = os.path.join(root_path, 'README.md')
+        print(f"flat sidebar: {len(flat_lines)} lines")
+        legacy, _ = best_of(args.repeat, lambda: legacy_parse_sidebar(flat_lines, homepage))
+        compiled, flat = best_of(args.repeat, lambda: parse_sidebar(flat_lines, homepage))
+        print(f"{'recompile per line':<24} {legacy:>8.3f} s {len(flat_lines) / legacy:>12.0f} lines/s")
+        print(f"{'precompiled':<24} {compiled:>8.3f} s {len(flat_lines) / compiled:>12.0f} lines/s")
+
+        expected = None
+        for workers in args.workers:
+            elapsed, root = best_of(args.repeat, lambda: load_nested_sidebars(root_path, homepage, workers))
+            result = leaves(root)
+            if expected is None:
+                expected = result
+                # 合并后的树与把所有条目写在一个侧边栏中时的层级一致（只多出每个文件夹的主页与首页链接）
+                assert [level for link, level in result if link.endswith('.md') and 'page' in link] == \
+                       [level for link, level in leaves(flat) if 'page' in link], workers
+            assert result == expected, workers
+            print(f"{f'nested, {workers} workers':<24} {elapsed:>8.3f} s {len(result) / elapsed:>12.0f} entries/s")
+
+
+if __name__ == '__main__':
+    main()
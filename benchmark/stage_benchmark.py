@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-18 21:26
+# Author  : Jiang Liu
+# Desc    : 分阶段的基准测试：在合成的文档树上分别统计侧边栏解析、合并、去除内链、去除标题编号、重新编号以及写入的耗时，
+#           并以 JSON 格式输出吞吐量（MB/s、标题/s），便于在不同版本之间比较
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import src.log as log
+from corpus_generator import CorpusConfig, generate_corpus
+from src.merger_markdown import merge, remove_internal_link
+from src.prefetch import read_markdown_file
+from src.renumber_title import SerialNumberConfig, renumber_title, renumber_titles, remove_title_serial
+from src.sidebar_resolver import parse_sidebar
+
+# 各个坐标轴上的取值，每次只改变一个坐标轴，其余参数使用 CorpusConfig 的默认值
+AXES = {
+    'files': [100, 1000, 5000],
+    'depth': [1, 3, 5],
+    'file_lines': [50, 200, 1000],
+    'heading_density': [0.02, 0.1, 0.3],
+    'link_density': [0.0, 0.2, 1.0],
+    'code_ratio': [0.0, 0.1, 0.5],
+    'cjk_ratio': [0.0, 0.3, 1.0],
+}
+
+# 六级都使用阿拉伯数字，避免字母或罗马数字编号超出范围
+SERIAL_NUMBER_CONFIG_ARRAY = [SerialNumberConfig(independent=False) for _ in range(6)]
+
+
+def best_of(repeat, function):
+    """
+    该函数用于多次执行并返回最短的墙钟时间与对应的 CPU 时间
+    :param repeat:      执行次数
+    :param function:    被测函数
+    :return:            (墙钟时间, CPU 时间)，单位为秒
+    """
+    best = None
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        function()
+        elapsed = (time.perf_counter() - wall, time.process_time() - cpu)
+        if best is None or elapsed[0] < best[0]:
+            best = elapsed
+    return best
+
+
+def run_scenario(root_path, config, repeat=3, workers=1):
+    """
+    该函数用于生成一个文档树并统计各个阶段的耗时
+    :param root_path:   用于生成文档树的目录
+    :param config:      合成文档树的参数（CorpusConfig）
+    :param repeat:      每个阶段的执行次数，取最短的一次
+    :param workers:     合并时预读取文件的线程数
+    :return:            该场景的测试结果
+    """
+    corpus = generate_corpus(root_path, config)
+    homepage = os.path.join(root_path, 'README.md')
+    sidebar = read_markdown_file(os.path.join(root_path, '_sidebar.md'))
+    root = parse_sidebar(sidebar, homepage)
+    files = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        stack.extend(reversed(node.children))
+        if not node.children and node.link is not None:
+            files.append(read_markdown_file(os.path.join(root_path, node.link)))
+    all_lines = [line for lines in files for line in lines]
+    merged = list(renumber_titles(merge(root_path, homepage, workers=workers),
+                                  serial_number_config_array=SERIAL_NUMBER_CONFIG_ARRAY))
+    output_path = os.path.join(root_path, 'merged.md')
+
+    def write():
+        with open(output_path, 'w', encoding='utf-8') as file:
+            file.writelines(merged)
+
+    stages = {
+        'parse_sidebar': lambda: parse_sidebar(sidebar, homepage),
+        'merge': lambda: list(merge(root_path, homepage, workers=workers)),
+        'remove_internal_link': lambda: [remove_internal_link(lines) for lines in files],
+        'remove_title_serial': lambda: [list(remove_title_serial(lines)) for lines in files],
+        'renumber_title': lambda: list(renumber_title(all_lines, SERIAL_NUMBER_CONFIG_ARRAY)),
+        'write': write,
+    }
+    megabytes = corpus['bytes'] / 1024 / 1024
+    results = {}
+    for name, function in stages.items():
+        wall, cpu = best_of(repeat, function)
+        results[name] = {
+            'wall_seconds': round(wall, 6),
+            'cpu_seconds': round(cpu, 6),
+            'mb_per_s': round(megabytes / wall, 3) if wall > 0 else None,
+            'headings_per_s': round(corpus['headings'] / wall, 1) if wall > 0 else None,
+        }
+    return {'config': config.to_dict(), 'corpus': corpus, 'stages': results}
+
+
+def build_scenarios(axes, base):
+    """
+    该函数用于生成所有测试场景：基准场景，以及每次只改变一个坐标轴的场景
+    :param axes:    需要测试的坐标轴名称列表
+    :param base:    基准场景的参数（CorpusConfig）
+    :return:        (坐标轴名称, 参数) 的列表
+    """
+    scenarios = [('base', base)]
+    for axis in axes:
+        for value in AXES[axis]:
+            if value == getattr(base, axis):
+                continue
+            config = CorpusConfig(**base.to_dict())
+            setattr(config, axis, value)
+            scenarios.append((axis, config))
+    return scenarios
+
+
+def get_version():
+    """
+    该函数用于获取当前代码的版本，便于比较不同版本之间的结果
+    :return:    git describe 的结果，如果不可用则返回 None
+    """
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark each pipeline stage on synthetic Docsify trees')
+    parser.add_argument('--axes', type=str, nargs='*', default=list(AXES), choices=list(AXES),
+                        help='Axes to vary one at a time around the base scenario, none for the base scenario only')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--output', type=str, default=None, help='Path of the JSON result, stdout if omitted')
+    parser.add_argument('--dir', type=str, default=None, help='Directory to build the trees in')
+    parser.add_argument('--log_level', type=str, default='WARNING',
+                        help='Logging level during the benchmark, INFO includes the cost of the per-item logs')
+    defaults = CorpusConfig()
+    for name, value in defaults.to_dict().items():
+        parser.add_argument(f'--{name}', type=type(value), default=value, help='Base scenario parameter')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, stream=sys.stderr)
+    log.logger = logging.getLogger()
+
+    base = CorpusConfig(**{name: getattr(args, name) for name in defaults.to_dict()})
+    report = {
+        'version': get_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scenarios': [],
+    }
+    for axis, config in build_scenarios(args.axes, base):
+        with tempfile.TemporaryDirectory(dir=args.dir) as root_path:
+            result = run_scenario(root_path, config, repeat=args.repeat, workers=args.workers)
+        result['axis'] = axis
+        report['scenarios'].append(result)
+        stages = ' '.join(f"{name}={stage['wall_seconds'] * 1000:.1f}ms" for name, stage in result['stages'].items())
+        print(f"{axis:<16} {getattr(config, axis, '') if axis != 'base' else '':<6} "
+              f"{result['corpus']['bytes'] / 1024 / 1024:7.2f}MB {stages}", file=sys.stderr)
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,9 @@ import sys
 
 from src.log import init_logging
 from src.merger_markdown import merge
-from src.renumber_title import remove_title_serial, renumber_title, SerialNumberType
+from src.renumber_title import renumber_titles, SerialNumberType
 from src.renumber_title import SerialNumberConfig, SerialTitleStrategy
+from src.serial_number_matcher import compile_serial_number_matcher
 import src.i18n as i18n
 
 
@@ -68,11 +69,11 @@ def main():
     handle_title_greater_than_level_six = SerialTitleStrategy.cite
     output_file_path = os.path.join(get_os_path(), "./merged.md")
 
-    lines = merge(docsify_root_path=docsify_path, homepage=homepage)
-    lines = remove_title_serial(lines, serial_number_regex_list=serial_number_regex_list)
-    lines = renumber_title(lines, serial_number_config_array=serial_number_config_array,
-                           handel_unserial_number_title=handel_unserial_number_title,
-                           handle_title_greater_than_level_six=handle_title_greater_than_level_six)
+    tokens = merge(docsify_root_path=docsify_path, homepage=homepage,
+                   serial_number_matcher=compile_serial_number_matcher(serial_number_regex_list))
+    lines = renumber_titles(tokens, serial_number_config_array=serial_number_config_array,
+                            handel_unserial_number_title=handel_unserial_number_title,
+                            handle_title_greater_than_level_six=handle_title_greater_than_level_six)
     with open(output_file_path, 'w', encoding='utf-8') as file:
         file.writelines(lines)
 
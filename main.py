@@ -1,12 +1,21 @@
+import cProfile
 import json
+import multiprocessing
 import os
 import re
 import sys
+import time
 
 from src.log import init_logging, get_logger
-from src.merger_markdown import merge
-from src.renumber_title import remove_title_serial, renumber_title
-from src.renumber_title import SerialNumberConfig, SerialTitleStrategy
+from src.report import init_report, get_report
+from src.batch import load_manifest, load_job_configs, run_batch, summarize
+from src.docsify_merger import DocsifyMerger
+from src.output_writer import is_writable_output
+from src.fragment_cache import FragmentCache
+from src.renumber_title import SerialNumberConfig, SerialNumberGenerator, SerialTitleStrategy
+from src.serial_number_matcher import SerialNumberMatcher
+from src.server import parse_address, serve
+from src.watcher import WatchSession
 from src.arg import parser
 import src.i18n as i18n
 from src.i18n import translate as t
@@ -45,9 +54,10 @@ def load_application_config():
     i18n.set_language(language)
 
 
-def parse_args():
-    args = parser.parse_args()
-    serial_number_regex_list = None
+def parse_args(args=None):
+    if args is None:
+        args = parser.parse_args()
+    serial_number_matcher = None
     serial_number_config_array = None
     serial_number_remove_config_file = args.serial_number_remove_config_file
     serial_number_generate_config_file = args.serial_number_generate_config_file
@@ -56,6 +66,9 @@ def parse_args():
     homepage = args.homepage
     handel_unserial_number_title_strategy = args.handel_unserial_number_title_strategy
     handle_title_greater_than_level_six_strategy = args.handle_title_greater_than_level_six_strategy
+    prefetch_workers = args.prefetch_workers
+    cache_dir = args.cache_dir
+    cache_size = args.cache_size
     logger = get_logger()
     # 从json文件中读取配置
     if serial_number_remove_config_file is not None:
@@ -67,15 +80,16 @@ def parse_args():
             serial_number_remove_regex_list = json.load(file)
             # 检查每一个正则是否合法
             if serial_number_remove_regex_list is not None:
-                serial_number_regex_list = []
+                serial_number_patterns = []
                 for regex in serial_number_remove_regex_list:
                     try:
-                        re.compile(regex)
-                        serial_number_regex_list.append(regex)
+                        serial_number_patterns.append(re.compile(regex))
                     except Exception as e:
                         logger.error(f"{t('Regex')} '{regex}' {t('is invalid')}")
                         print(f"{t('Regex')} '{regex}' {t('is invalid')}")
                         sys.exit(1)
+                # 编译后的正则直接用于构建匹配器，之后处理每个标题时不再重复编译
+                serial_number_matcher = SerialNumberMatcher(serial_number_patterns)
 
     # 检查配置文件是否合法
     if serial_number_generate_config_file is not None:
@@ -94,6 +108,13 @@ def parse_args():
                         logger.error(f"{t('Config')} '{item}' {t('is invalid')}")
                         print(f"{t('Config')} '{item}' {t('is invalid')}")
                         sys.exit(1)
+                # 在合并之前检查编号类型与起始索引，而不是在写入输出文件时才发现超出范围
+                try:
+                    SerialNumberGenerator(serial_number_config_array).check_config()
+                except ValueError as e:
+                    logger.error(f"{t('Config')} '{serial_number_generate_config_file}' {t('is invalid')}: {e}")
+                    print(f"{t('Config')} '{serial_number_generate_config_file}' {t('is invalid')}: {e}")
+                    sys.exit(1)
 
     # 检查输出文件路径是否合法
     if output_file_path is None:
@@ -104,10 +125,8 @@ def parse_args():
     # 如果没有文件夹，创建文件夹
     if not os.path.exists(os.path.dirname(output_file_path)):
         os.makedirs(os.path.dirname(output_file_path))
-    try:
-        with open(output_file_path, 'w', encoding='utf-8') as file:
-            pass
-    except Exception as e:
+    # 只检查输出文件是否可以写入，不在这里截断已有的输出文件，合并失败时原来的输出文件保持不变
+    if not is_writable_output(output_file_path):
         logger.error(f"{t('Output path')} '{output_file_path}' {t('is invalid')}")
         print(f"{t('Output path')} '{output_file_path}' {t('is invalid')}")
         sys.exit(1)
@@ -156,25 +175,283 @@ def parse_args():
     handle_title_greater_than_level_six = SerialTitleStrategy.get_strategy(handle_title_greater_than_level_six_strategy)
     logger.info(f"{t('Set Title strategy:')} '{handle_title_greater_than_level_six_strategy}'")
 
-    return serial_number_regex_list, serial_number_config_array, docsify_path, homepage, output_file_path, handel_unserial_number_title, handle_title_greater_than_level_six
+    # 检查预读取线程数是否合法
+    if prefetch_workers is None:
+        prefetch_workers = 4
+    if prefetch_workers < 1:
+        logger.error(f"{t('Prefetch workers')} '{prefetch_workers}' {t('is invalid')}")
+        print(f"{t('Prefetch workers')} '{prefetch_workers}' {t('is invalid')}")
+        sys.exit(1)
+    logger.info(f"{t('Set Prefetch workers:')} '{prefetch_workers}'")
 
+    # 检查片段缓存配置是否合法
+    if args.no_cache:
+        cache_dir = None
+        logger.info(f"{t('Fragment cache disabled')}")
+    else:
+        if cache_dir is None:
+            cache_dir = r'./.docsify-merger-cache'
+        # 如果是相对路径，则转换为绝对路径
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(get_os_path(), cache_dir)
+        logger.info(f"{t('Set Cache directory:')} '{cache_dir}'")
+    if cache_size is None:
+        cache_size = 512
+    if cache_size < 0:
+        logger.error(f"{t('Cache size')} '{cache_size}' {t('is invalid')}")
+        print(f"{t('Cache size')} '{cache_size}' {t('is invalid')}")
+        sys.exit(1)
 
-def main():
-    load_application_config()
+    # 检查内存映射的阈值是否合法
+    mmap_threshold = args.mmap_threshold
+    if mmap_threshold is not None:
+        if mmap_threshold < 0:
+            logger.error(f"{t('Mmap threshold')} '{mmap_threshold}' {t('is invalid')}")
+            print(f"{t('Mmap threshold')} '{mmap_threshold}' {t('is invalid')}")
+            sys.exit(1)
+        logger.info(f"{t('Set Mmap threshold:')} '{mmap_threshold}'")
+
+    # 检查服务地址是否合法
+    serve_address = None
+    if args.serve is not None:
+        try:
+            serve_address = parse_address(args.serve)
+        except ValueError:
+            logger.error(f"{t('Serve address')} '{args.serve}' {t('is invalid')}")
+            print(f"{t('Serve address')} '{args.serve}' {t('is invalid')}")
+            sys.exit(1)
+        logger.info(f"{t('Set Serve address:')} '{args.serve}'")
+
+    # 检查分章节输出的参数是否合法
+    split_size = args.split
+    if split_size is not None:
+        if split_size < 0:
+            logger.error(f"{t('Split size')} '{split_size}' {t('is invalid')}")
+            print(f"{t('Split size')} '{split_size}' {t('is invalid')}")
+            sys.exit(1)
+        if args.resolve_links:
+            logger.error(t('Resolving links is not supported when splitting the output'))
+            print(t('Resolving links is not supported when splitting the output'))
+            sys.exit(1)
+        # 监视模式每次只重新合并为一个文件
+        if args.watch:
+            logger.error(t('Splitting the output is not supported in watch mode'))
+            print(t('Splitting the output is not supported in watch mode'))
+            sys.exit(1)
+        if args.manifest_workers is not None and args.manifest_workers < 1:
+            logger.error(f"{t('Manifest workers')} '{args.manifest_workers}' {t('is invalid')}")
+            print(f"{t('Manifest workers')} '{args.manifest_workers}' {t('is invalid')}")
+            sys.exit(1)
+        logger.info(f"{t('Set Split size:')} '{split_size}'")
+
+    # 检查目录的层级是否合法
+    toc_depth = args.toc
+    if toc_depth is not None:
+        if not 1 <= toc_depth <= 6:
+            logger.error(f"{t('TOC depth')} '{toc_depth}' {t('is invalid')}")
+            print(f"{t('TOC depth')} '{toc_depth}' {t('is invalid')}")
+            sys.exit(1)
+        logger.info(f"{t('Set TOC depth:')} '{toc_depth}'")
+
+    # 检查图片收集的参数是否合法，只指定内联大小时使用默认的资源目录
+    assets_dir = args.assets_dir
+    inline_assets = args.inline_assets
+    if inline_assets is not None:
+        if inline_assets < 0:
+            logger.error(f"{t('Inline assets')} '{inline_assets}' {t('is invalid')}")
+            print(f"{t('Inline assets')} '{inline_assets}' {t('is invalid')}")
+            sys.exit(1)
+        if assets_dir is None:
+            assets_dir = 'assets'
+    if assets_dir is not None:
+        if split_size is not None:
+            logger.error(t('Collecting images is not supported when splitting the output'))
+            print(t('Collecting images is not supported when splitting the output'))
+            sys.exit(1)
+        # 服务模式只提供合并后的文档，资源目录中的图片无法通过 HTTP 访问
+        if serve_address is not None:
+            logger.error(t('Collecting images is not supported in serve mode'))
+            print(t('Collecting images is not supported in serve mode'))
+            sys.exit(1)
+        logger.info(f"{t('Set Assets folder:')} '{assets_dir}'")
+
+    # 前几项为运行方式，其余各项与 DocsifyMerger 的参数同名
+    return {
+        'output_file_path': output_file_path,
+        'watch': args.watch,
+        'serve_address': serve_address,
+        'split_size': split_size,
+        'processes': args.manifest_workers,
+        'docsify_path': docsify_path,
+        'homepage': homepage,
+        'serial_number_matcher': serial_number_matcher,
+        'serial_number_config_array': serial_number_config_array,
+        'handel_unserial_number_title_strategy': handel_unserial_number_title,
+        'handle_title_greater_than_level_six_strategy': handle_title_greater_than_level_six,
+        'workers': prefetch_workers,
+        'cache_dir': cache_dir,
+        'cache_size': cache_size,
+        'resolve_links': args.resolve_links,
+        'mmap_threshold': mmap_threshold,
+        'nested_sidebars': args.nested_sidebars,
+        'dedupe_pages': args.dedupe_pages,
+        'toc_depth': toc_depth,
+        'expand_includes': args.expand_includes,
+        'assets_dir': assets_dir,
+        'inline_assets': inline_assets,
+    }
+
+
+def merge_manifest(args):
+    """
+    批量模式：合并清单文件中描述的所有 Docsify 项目，命令行中的参数作为清单中各任务的默认值
+    """
+    logger = get_logger()
+    manifest = args.manifest
+    # 如果是相对路径，则转换为绝对路径
+    if not os.path.isabs(manifest):
+        manifest = os.path.join(get_os_path(), manifest)
+    logger.info(f"{t('Load manifest file:')} '{manifest}'")
+    defaults = {
+        'homepage': args.homepage,
+        'serial_number_remove_config_file': args.serial_number_remove_config_file,
+        'serial_number_generate_config_file': args.serial_number_generate_config_file,
+        'handel_unserial_number_title_strategy': args.handel_unserial_number_title_strategy,
+        'handle_title_greater_than_level_six_strategy': args.handle_title_greater_than_level_six_strategy,
+        'resolve_links': args.resolve_links,
+        'mmap_threshold': args.mmap_threshold,
+        'nested_sidebars': args.nested_sidebars,
+        'dedupe_pages': args.dedupe_pages,
+        'expand_includes': args.expand_includes,
+        'assets_dir': args.assets_dir if args.inline_assets is None else args.assets_dir or 'assets',
+        'inline_assets': args.inline_assets,
+        'toc_depth': args.toc,
+    }
+    # 命令行中的配置文件路径与单个项目模式一致，相对于程序所在目录
+    for key in ('serial_number_remove_config_file', 'serial_number_generate_config_file'):
+        if defaults[key] is not None and not os.path.isabs(defaults[key]):
+            defaults[key] = os.path.join(get_os_path(), defaults[key])
+    try:
+        jobs = load_manifest(manifest, defaults)
+    except (OSError, ValueError) as e:
+        logger.error(f"{t('Manifest')} '{manifest}' {t('is invalid')}: {e}")
+        print(f"{t('Manifest')} '{manifest}' {t('is invalid')}: {e}")
+        sys.exit(1)
+
+    manifest_workers = args.manifest_workers
+    if manifest_workers is not None and manifest_workers < 1:
+        logger.error(f"{t('Manifest workers')} '{manifest_workers}' {t('is invalid')}")
+        print(f"{t('Manifest workers')} '{manifest_workers}' {t('is invalid')}")
+        sys.exit(1)
+    prefetch_workers = args.prefetch_workers
+    if prefetch_workers is None:
+        prefetch_workers = 4
+    if prefetch_workers < 1:
+        logger.error(f"{t('Prefetch workers')} '{prefetch_workers}' {t('is invalid')}")
+        print(f"{t('Prefetch workers')} '{prefetch_workers}' {t('is invalid')}")
+        sys.exit(1)
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir
+        if cache_dir is None:
+            cache_dir = r'./.docsify-merger-cache'
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(get_os_path(), cache_dir)
+    cache_size = args.cache_size
+    if cache_size is None:
+        cache_size = 512
+    if cache_size < 0:
+        logger.error(f"{t('Cache size')} '{cache_size}' {t('is invalid')}")
+        print(f"{t('Cache size')} '{cache_size}' {t('is invalid')}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    load_job_configs(jobs)
+    # 工作进程只初始化一次日志与语言，之后依次执行分配给它的任务
+    results = run_batch(jobs, processes=manifest_workers, workers=prefetch_workers, cache_dir=cache_dir,
+                        initializer=load_application_config)
+    if cache_dir is not None:
+        FragmentCache(cache_dir, max_size=cache_size * 1024 * 1024).evict()
+    failed = summarize(results, time.perf_counter() - start)
+    if failed > 0:
+        sys.exit(1)
+
+
+def merge_docsify(args):
+    """
+    合并一个 Docsify 项目，或者在监视模式下持续合并，或者在服务模式下通过 HTTP 提供合并后的文档
+    """
     logger = get_logger()
-    serial_number_regex_list, serial_number_config_array, docsify_path, homepage, \
-        output_file_path, handel_unserial_number_title, handle_title_greater_than_level_six = parse_args()
-
-    lines = merge(docsify_root_path=docsify_path, homepage=homepage)
-    lines = remove_title_serial(lines, serial_number_regex_list=serial_number_regex_list)
-    lines = renumber_title(lines, serial_number_config_array=serial_number_config_array,
-                           handel_unserial_number_title=handel_unserial_number_title,
-                           handle_title_greater_than_level_six=handle_title_greater_than_level_six)
-    logger.info(f"{t('Write to output file:')} '{output_file_path}'")
-    with open(output_file_path, 'w', encoding='utf-8') as file:
-        file.writelines(lines)
+    report = get_report()
+    with report.stage('parse_args'):
+        options = parse_args(args)
+    output_file_path = options.pop('output_file_path')
+    watch = options.pop('watch')
+    serve_address = options.pop('serve_address')
+    split_size = options.pop('split_size')
+    processes = options.pop('processes')
+
+    # 各阶段均为生成器，边处理边写入，整本书不会同时驻留在内存中；需要解析内链时，
+    # 锚点索引在重新编号的同时填充，写入完成后再流式地将内链解析为文档内的锚点。
+    # 先写入临时文件，编号超出范围时不会留下只写了一半的输出文件，原来的输出文件保持不变
+    try:
+        merger = DocsifyMerger(**options)
+        # 服务模式本身会在文件变化后重新合并，同时指定时忽略监视模式
+        if watch and serve_address is None:
+            WatchSession(merger, output_file_path).run()
+            return
+        if serve_address is not None:
+            serve(merger, *serve_address)
+            return
+        if split_size is not None:
+            # 工作进程只初始化一次日志与语言，之后依次合并分配给它的章节
+            chapters = merger.merge_to_chapters(output_file_path, split_size, processes,
+                                                initializer=load_application_config)
+            report.count('chapters_written', len(chapters))
+            report.count('bytes_written', sum(chapter.size for chapter in chapters))
+        else:
+            merger.merge_to_path(output_file_path)
+    except ValueError as e:
+        # 包括编号超出范围（SerialNumberOverflowError）与侧边栏文件不存在
+        logger.error(str(e))
+        print(str(e))
+        sys.exit(1)
+    report.count('bytes_written', os.path.getsize(output_file_path))
     logger.info(f"{t('Processing Successful!')}")
 
 
+def main():
+    args = parser.parse_args()
+    # 运行报告与性能分析覆盖整个运行过程，包括加载配置
+    report = init_report() if args.report is not None else None
+    profiler = None
+    if args.profile is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with get_report().stage('load_config'):
+            load_application_config()
+        if args.manifest is not None:
+            merge_manifest(args)
+        else:
+            merge_docsify(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile_path = args.profile
+            if not os.path.isabs(profile_path):
+                profile_path = os.path.join(get_os_path(), profile_path)
+            get_logger().info(f"{t('Write profile to:')} '{profile_path}'")
+            profiler.dump_stats(profile_path)
+        if report is not None:
+            report_path = args.report
+            if not os.path.isabs(report_path):
+                report_path = os.path.join(get_os_path(), report_path)
+            get_logger().info(f"{t('Write report to:')} '{report_path}'")
+            report.dump(report_path)
+
+
 if __name__ == '__main__':
+    # 打包成可执行文件后，批量模式的工作进程需要通过该函数启动
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-21 10:42
+# Author  : Jiang Liu
+# Desc    : 锚点索引：在重新编号的同一遍中记录 (源文件, 原标题锚点) 到合并后标题锚点的映射，
+#           合并完成后再流式地将指向文档内部的链接改写为文档内的锚点链接
+import os
+import posixpath
+import re
+from urllib.parse import parse_qs, unquote
+
+from src.i18n import translate as t
+from src.log import get_logger, is_debug_enabled
+from src.report import get_report
+
+# 内链在片段中的占位标记：\ue000源文件\ue001链接\ue002描述\ue003，使用私有区字符，不会与正文冲突
+MARKER_START = '\ue000'
+_MARKER = re.compile('\ue000([^\ue001]*)\ue001([^\ue002]*)\ue002([^\ue003]*)\ue003')
+
+# Docsify 生成锚点时去除的字符，与 Docsify 的 slugify 一致
+_DOCSIFY_SLUG_REMOVE = re.compile(r'[\u2000-\u206F\u2E00-\u2E7F\\\'!"#$%&()*+,./:;<=>?@\[\]^`{|}~]')
+_HTML_TAG = re.compile(r'<[^>]+>')
+# Docsify 标题中自定义锚点的配置，例如 "## 标题 :id=custom"
+_DOCSIFY_ID = re.compile(r'(?:^|\s):id=(\S+)')
+# 合并后的标题锚点与 GitHub、Typora、Pandoc(gfm) 的规则一致：只保留文字、数字、空格、"-" 与 "_"
+_SLUG_REMOVE = re.compile(r'[^\w\- ]')
+
+
+def docsify_slugify(text):
+    """
+    该函数用于按照 Docsify 的规则生成标题的锚点，用于匹配源文档中 "other.md#section" 形式的链接
+    :param text:    标题的内容
+    :return:        锚点（未去重）
+    """
+    match = _DOCSIFY_ID.search(text)
+    if match:
+        return match.group(1)
+    slug = re.sub(r'[A-Z]+', lambda m: m.group(0).lower(), text.strip())
+    slug = _DOCSIFY_SLUG_REMOVE.sub('', _HTML_TAG.sub('', slug))
+    slug = re.sub(r'-+', '-', re.sub(r'\s', '-', slug))
+    return re.sub(r'^(\d)', r'_\1', slug)
+
+
+def github_slugify(text):
+    """
+    该函数用于生成合并后标题的锚点
+    :param text:    标题的内容
+    :return:        锚点（未去重）
+    """
+    return _SLUG_REMOVE.sub('', _HTML_TAG.sub('', text.strip().lower())).replace(' ', '-')
+
+
+def unique_slug(slug, counts):
+    """
+    该函数用于为重复的锚点添加序号，第一个保持不变，之后依次为 "-1"、"-2"、...
+    :param slug:    锚点
+    :param counts:  已经出现过的锚点及其次数
+    :return:        去重后的锚点
+    """
+    count = counts.get(slug)
+    counts[slug] = 0 if count is None else count + 1
+    return slug if count is None else f"{slug}-{count + 1}"
+
+
+def strip_link_markers(text):
+    """
+    该函数用于将文本中的内链占位标记替换为链接的描述
+    :param text:    文本
+    :return:        替换后的文本
+    """
+    return _MARKER.sub(lambda match: match.group(3), text) if MARKER_START in text else text
+
+
+def page_key(docsify_root_path, path):
+    """
+    该函数用于将源文件的路径转换为相对于 Docsify 根目录、以 "/" 分隔的路径，作为源文件在锚点索引中的键
+    :param docsify_root_path:   Docsify的根目录
+    :param path:                源文件的路径
+    :return:                    源文件的键
+    """
+    return posixpath.normpath(os.path.relpath(path, docsify_root_path).replace(os.sep, '/'))
+
+
+def make_link_marker(page, url, description):
+    """
+    该函数用于生成内链的占位标记，标记中保留了链接所在的源文件，最后一遍时才能确定链接指向的锚点
+    :param page:            链接所在源文件的键
+    :param url:             链接
+    :param description:     链接的描述
+    :return:                占位标记
+    """
+    return f"\ue000{page}\ue001{url or ''}\ue002{description}\ue003"
+
+
+class AnchorIndex:
+    """
+    该类用于记录合并后的每个标题的锚点。重新编号时每遇到一个标题就写入一次哈希表，不需要再次扫描文档
+    """
+
+    def __init__(self, homepage='README.md'):
+        """
+        该函数用于初始化锚点索引
+        :param homepage:    主页文件的键，链接 "/" 指向该文件
+        """
+        self.homepage = homepage
+        # (源文件的键, 原标题的 Docsify 锚点) -> 合并后的锚点
+        self.anchors = {}
+        # 源文件的键 -> 该文件第一个标题合并后的锚点，用于不带锚点的链接
+        self.pages = {}
+        # 合并后的锚点出现的次数，用于去重
+        self.counts = {}
+        self.resolved = 0
+        self.unresolved = 0
+
+    def add_heading(self, anchor, line):
+        """
+        该函数用于记录一个重新编号后的标题
+        :param anchor:  标题的来源：(源文件的键, 原标题的 Docsify 锚点)，由侧边栏生成的标题为 None
+        :param line:    重新编号后的行，不是标题（例如被转换为引用的七级标题）时忽略
+        """
+        if not line.startswith('#'):
+            return
+        slug = unique_slug(github_slugify(line.lstrip('#')), self.counts)
+        if anchor is None:
+            return
+        self.anchors.setdefault(anchor, slug)
+        self.pages.setdefault(anchor[0], slug)
+
+    def resolve_page(self, page, path):
+        """
+        该函数用于确定链接指向的源文件：先相对于链接所在的文件查找，再相对于根目录查找
+        :param page:    链接所在源文件的键
+        :param path:    链接中的路径部分
+        :return:        源文件的键，如果不是合并后文档中的文件，则返回 None
+        """
+        if not path:
+            return page
+        path = unquote(path)
+        candidates = [path] if path.startswith('/') else [posixpath.join(posixpath.dirname(page), path), path]
+        for candidate in candidates:
+            candidate = candidate.lstrip('/')
+            if not candidate:
+                key = self.homepage
+            else:
+                if candidate.endswith('/'):
+                    candidate += 'README.md'
+                key = posixpath.normpath(candidate)
+                if not key.endswith('.md'):
+                    key += '.md'
+            if key in self.pages:
+                return key
+        return None
+
+    def resolve(self, page, url):
+        """
+        该函数用于确定链接在合并后文档中指向的锚点，支持 "other.md#section"、"other.md?id=section"、
+        "/guide/"、"#/guide?id=section" 与 "#section" 等形式
+        :param page:    链接所在源文件的键
+        :param url:     链接
+        :return:        锚点，无法确定时返回 None
+        """
+        # Docsify 的哈希路由
+        if url.startswith('#/'):
+            url = url[1:]
+        path, _, fragment = url.partition('#')
+        path, _, query = path.partition('?')
+        if not fragment and query:
+            fragment = parse_qs(query).get('id', [''])[0]
+        target = self.resolve_page(page, path)
+        if target is None:
+            return None
+        if not fragment:
+            return self.pages.get(target)
+        fragment = unquote(fragment)
+        slug = self.anchors.get((target, fragment))
+        if slug is None:
+            slug = self.anchors.get((target, docsify_slugify(fragment)))
+        return slug
+
+    def resolve_line(self, line):
+        """
+        该函数用于改写一行中的所有内链占位标记：能确定锚点的改写为文档内的锚点链接，否则与原来一样只保留描述
+        :param line:    行
+        :return:        改写后的行
+        """
+        debug = is_debug_enabled()
+
+        def replacer(match):
+            page, url, description = match.groups()
+            slug = self.resolve(page, url) if url else None
+            if slug is None:
+                self.unresolved += 1
+                if debug:
+                    get_logger().debug(f'{t("Unresolved link:")} {page}: "{url}"')
+                return description
+            self.resolved += 1
+            return f"[{description}](#{slug})"
+
+        return _MARKER.sub(replacer, line)
+
+    def resolve_lines(self, lines):
+        """
+        该函数用于逐行改写内链占位标记
+        :param lines:   合并后的Markdown文件的行迭代器
+        :return:        改写后的行迭代器（生成器）
+        """
+        for line in lines:
+            yield self.resolve_line(line) if MARKER_START in line else line
+        self.report_resolved()
+
+    def resolve_buffer(self, buffer):
+        """
+        该函数用于改写行缓冲中的内链占位标记，只有包含占位标记的行被解码与改写，并作为修改保存在行缓冲中
+        :param buffer:  合并后的Markdown文件的行缓冲（LineBuffer）
+        """
+        for index in buffer.find_lines(MARKER_START):
+            buffer[index] = self.resolve_line(buffer[index])
+        self.report_resolved()
+
+    def report_resolved(self):
+        """
+        该函数用于在改写完成后输出统计
+        """
+        report = get_report()
+        report.count('links_resolved', self.resolved)
+        report.count('links_unresolved', self.unresolved)
+        get_logger().info(f'{t("Resolved links:")} {self.resolved}, {t("unresolved")} {self.unresolved}')
@@ -80,10 +80,10 @@ The configuration file is a JSON file with the following structure:
                                     # - "number": "0", "1", "2", "3". Range: Unlimited
                                     # - "roman_lower_case": "i", "ii", "iii". Range: 1 to 3999
                                     # - "roman_upper_case": "I", "II", "III". Range: 1 to 3999
-                                    # - "alphabet_lower_case": "a", "b", "c". Range: 1 to 26
-                                    # - "alphabet_upper_case": "A", "B", "C". Range: 1 to 26
-                                    # - "chinese_lower_case": "〇", "一", "二", "三". Range: 0 to 9999
-                                    # - "chinese_upper_case": "零", "壹", "贰", "叁". Range: 0 to 9999
+                                    # - "alphabet_lower_case": "a", "b", "c", ..., "z", "aa", "ab". Range: Unlimited
+                                    # - "alphabet_upper_case": "A", "B", "C", ..., "Z", "AA", "AB". Range: Unlimited
+                                    # - "chinese_lower_case": "〇", "一", "二", "三". Range: 0 to 9999999999999999
+                                    # - "chinese_upper_case": "零", "壹", "贰", "叁". Range: 0 to 9999999999999999
         "start_index": 1            # Starting index of the sequence number, Roman numerals and alphanumerics are not supported 0
     },
     ...
@@ -108,10 +108,10 @@ The configuration file is a JSON file with the following structure:
                                     # - "number"： "0", "1", "2", "3". 范围： 无限制
                                     # - "roman_lower_case"： "i", "ii", "iii"。范围： 无限制 1 至 3999
                                     # - "roman_upper_case"： "I", "II", "III"。范围： 1 至 3999 1 至 3999
-                                    # - "alphabet_lower_case"： a", "b", "c"。范围： 1 至 26 1 至 26
-                                    # - "alphabet_upper_case"： A", "B", "C"。范围： 1 至 26 1 至 26
-                                    # - "chinese_lower_case"： "〇", "一", "二", "三"。范围： 0 至 9999
-                                    # - "chinese_upper_case"： "零", "一", "贰", "叁"。范围： 0 至 9999
+                                    # - "alphabet_lower_case"： "a", "b", "c", ..., "z", "aa", "ab"。范围： 无限制
+                                    # - "alphabet_upper_case"： "A", "B", "C", ..., "Z", "AA", "AB"。范围： 无限制
+                                    # - "chinese_lower_case"： "〇", "一", "二", "三"。范围： 0 至 9999999999999999
+                                    # - "chinese_upper_case"： "零", "壹", "贰", "叁"。范围： 0 至 9999999999999999
         "start_index"：1             # 序列号的起始索引，罗马数字和字母数字不支持 0
     },
     ...
@@ -147,10 +147,15 @@ Docsify 项目主页的相对或绝对路径，默认为"./README.md"。
 o_help_text = t({
     "en": r"""
 The output path of the merged Markdown file, the default value is "./merged.md".
+A path ending with ".gz" is written gzip-compressed. The output is written to a temporary file in the same folder first
+and then atomically renamed, so a failed merge keeps the previous output. If the content did not change,
+the output file is left untouched and keeps its modification time.
 
 """,
     "zh": r"""
 合并后的 Markdown 文件的输出路径，默认值为 "./merged.md"。
+以 ".gz" 结尾时使用 gzip 压缩。输出先写入同一文件夹下的临时文件，再原子地替换输出文件，因此合并失败时原来的输出文件保持不变。
+内容没有变化时不替换输出文件，保留其修改时间。
 
 """,
 })
@@ -195,6 +200,339 @@ The default value is "title", and the following values are supported:
 """
 })
 
+j_help_text = t({
+    "en": r"""
+The number of threads used to prefetch the Markdown files referenced by the sidebar, the default value is 4.
+Files are read concurrently but are still merged in sidebar order. Set it to 1 to read files one by one.
+Increasing this value helps on network or container file systems where each file read has a high latency.
+
+""",
+    "zh": r"""
+预读取侧边栏所引用的 Markdown 文件的线程数，默认值为 4。
+文件会被并发读取，但仍然按照侧边栏的顺序合并。设置为 1 时将逐个读取文件。
+在网络文件系统或容器文件系统等单个文件读取延迟较高的环境中，增大该值可以加快合并速度。
+
+"""
+})
+
+c_help_text = t({
+    "en": r"""
+The directory of the fragment cache, the default value is "./.docsify-merger-cache".
+Each Markdown file is cached after its links, heading levels and title numbers have been processed, keyed by the file content, its sidebar level and the title number removal rules.
+Unchanged files are reused on the next run, only the global renumbering is executed again.
+
+""",
+    "zh": r"""
+片段缓存的目录，默认值为 "./.docsify-merger-cache"。
+每个 Markdown 文件在处理完链接、标题层级和标题编号后会被缓存，缓存的键由文件内容、其在侧边栏中的层级以及标题编号移除规则组成。
+下次运行时未修改的文件会被直接复用，只有全局的重新编号会被再次执行。
+
+"""
+})
+
+cs_help_text = t({
+    "en": r"""
+The maximum size of the fragment cache in MB, the default value is 512. The least recently used fragments are removed when the cache grows beyond this size.
+
+""",
+    "zh": r"""
+片段缓存的最大容量（MB），默认值为 512。缓存超过该容量时，最久未使用的片段将被删除。
+
+"""
+})
+
+nc_help_text = t({
+    "en": r"""
+Disable the fragment cache, every Markdown file will be processed again.
+
+""",
+    "zh": r"""
+禁用片段缓存，所有 Markdown 文件都将被重新处理。
+
+"""
+})
+
+w_help_text = t({
+    "en": r"""
+Watch mode: after the first merge, keep watching the Docsify root directory and merge again whenever a Markdown file changes.
+Only the changed files are read again, "_sidebar.md" is parsed again only if it has changed. Press Ctrl+C to exit.
+
+""",
+    "zh": r"""
+监视模式：第一次合并完成后持续监视 Docsify 根目录，每当 Markdown 文件发生变化时重新合并。
+只有发生变化的文件会被重新读取，只有 "_sidebar.md" 发生变化时才会重新解析侧边栏。按 Ctrl+C 退出。
+
+"""
+})
+
+m_help_text = t({
+    "en": r"""
+Batch mode: the path of a manifest file that describes many Docsify projects to merge in one run.
+The manifest is a JSON list, relative paths in it are relative to the directory of the manifest file:
+[
+    {
+        "name": "product-en",                                   # Optional, shown in the summary
+        "docsify_path": "./product/en",                         # Required
+        "output_file_path": "./out/product-en.md",              # Required
+        "homepage": "./README.md",                              # Optional
+        "serial_number_remove_config_file": "./remove.json",    # Optional
+        "serial_number_generate_config_file": "./generate.json",# Optional
+        "handel_unserial_number_title_strategy": "normal",      # Optional
+        "handle_title_greater_than_level_six_strategy": "cite", # Optional
+        "resolve_links": true,                                  # Optional
+        "mmap_threshold": 64,                                   # Optional
+        "nested_sidebars": true,                                # Optional
+        "dedupe_pages": true,                                   # Optional
+        "toc_depth": 3                                          # Optional
+    },
+    ...
+]
+Options given on the command line (-p, -r, -g, -hu, -hg, -rl, -mm, -ns, -dp, -toc, -j, -c, -cs, --no-cache) are used for the items that do not set them.
+The jobs are run in a process pool, configuration files shared by several jobs are loaded only once.
+A failing job does not stop the others, a summary of every job is printed at the end.
+
+""",
+    "zh": r"""
+批量模式：清单文件的路径，清单中描述了一次运行中需要合并的多个 Docsify 项目。
+清单是一个 JSON 列表，其中的相对路径相对于清单文件所在的目录：
+[
+    {
+        "name": "product-en",                                   # 可选，用于汇总信息
+        "docsify_path": "./product/en",                         # 必填
+        "output_file_path": "./out/product-en.md",              # 必填
+        "homepage": "./README.md",                              # 可选
+        "serial_number_remove_config_file": "./remove.json",    # 可选
+        "serial_number_generate_config_file": "./generate.json",# 可选
+        "handel_unserial_number_title_strategy": "normal",      # 可选
+        "handle_title_greater_than_level_six_strategy": "cite", # 可选
+        "resolve_links": true,                                  # 可选
+        "mmap_threshold": 64,                                   # 可选
+        "nested_sidebars": true,                                # 可选
+        "dedupe_pages": true,                                   # 可选
+        "toc_depth": 3                                          # 可选
+    },
+    ...
+]
+命令行中给出的参数（-p、-r、-g、-hu、-hg、-rl、-mm、-ns、-dp、-toc、-j、-c、-cs、--no-cache）会用于清单中没有设置这些字段的任务。
+所有任务在进程池中执行，多个任务共享的配置文件只会被加载一次。
+一个任务失败不会影响其他任务，最后会输出每个任务的汇总信息。
+
+"""
+})
+
+mj_help_text = t({
+    "en": r"""
+The number of processes used in batch mode and split mode (-sp), the default value is the number of CPU cores.
+
+""",
+    "zh": r"""
+批量模式与分章节输出（-sp）使用的进程数，默认值为 CPU 核心数。
+
+"""
+})
+
+report_help_text = t({
+    "en": r"""
+Write a JSON report of the run to the given path: wall and CPU time of each pipeline stage
+(parse_sidebar, read, decode, tokenize, remove_internal_link, transform, fragment_cache, renumber, write, ...),
+counters (files read, bytes read, copied and written, headings seen, serial numbers removed, headings renumbered,
+links stripped and kept, links resolved and unresolved, fragment cache hits and misses) and the slowest source files.
+The stages run interleaved, the time of each stage excludes the time of the stages nested in it.
+
+""",
+    "zh": r"""
+将本次运行的 JSON 报告写入指定路径，内容包括：各处理阶段的墙钟时间与 CPU 时间
+（parse_sidebar、read、decode、tokenize、remove_internal_link、transform、fragment_cache、renumber、write 等），
+计数（读取的文件数、读取、直接复制与写入的字节数、处理的标题数、去除的编号数、重新编号的标题数、去除与保留的链接数、解析与未能解析的内链数、片段缓存的命中与未命中次数）
+以及最慢的源文件。各阶段交错执行，每个阶段的耗时不包括嵌套在其中的阶段的耗时。
+
+"""
+})
+
+profile_help_text = t({
+    "en": r"""
+Profile the whole run with cProfile and dump the statistics to the given path, it can be read with pstats or snakeviz.
+
+""",
+    "zh": r"""
+使用 cProfile 分析整个运行过程，并将统计数据写入指定路径，可以使用 pstats 或 snakeviz 查看。
+
+"""
+})
+
+rl_help_text = t({
+    "en": r"""
+Resolve internal links instead of removing them: links to a page or a heading of the merged document,
+such as [text](other.md#section), [text](other.md?id=section) or [text](/guide/), are rewritten to [text](#anchor),
+where the anchor is the one of the renumbered heading in the merged document (GitHub style, as used by Typora and Pandoc).
+Links that cannot be resolved keep only their description, as without this option.
+
+""",
+    "zh": r"""
+解析内链而不是去除内链：指向合并后文档中的页面或标题的链接，例如 [text](other.md#section)、[text](other.md?id=section)
+或 [text](/guide/)，将被改写为 [text](#anchor)，其中的锚点为合并后重新编号的标题的锚点（GitHub 风格，与 Typora、Pandoc 一致）。
+无法解析的链接与不使用该参数时一样，只保留描述。
+
+"""
+})
+
+mm_help_text = t({
+    "en": r"""
+Memory-map the Markdown files of at least this size in MB instead of reading them, for example very large generated pages.
+Only the paragraphs that may change (headings, code blocks, indented lines and paragraphs with links) are decoded and processed,
+all other bytes are copied straight to the output file. The output is the same as without this option.
+Mapped files are not stored in the fragment cache, and this option is ignored in watch mode.
+
+""",
+    "zh": r"""
+对不小于该大小（MB）的Markdown文件使用内存映射而不是读入，例如自动生成的很大的页面。
+只有可能发生变化的段落（标题、代码块、有缩进的行以及包含链接的段落）会被解码并处理，其余的字节直接复制到输出文件，输出与不使用该参数时完全相同。
+被映射的文件不会写入片段缓存，监视模式下忽略该参数。
+
+"""
+})
+
+ns_help_text = t({
+    "en": r"""
+Also load the _sidebar.md of every sub folder, like the loadSidebar option of Docsify.
+An entry that links to a folder ("guide/" or "guide/README.md") with its own _sidebar.md becomes a chapter:
+the homepage of the folder followed by every entry of that sidebar, one level deeper.
+Links in a nested sidebar are looked up relative to its folder first, then relative to the Docsify root.
+Nested sidebars are parsed concurrently with the prefetch workers (-j). A sidebar that links back to one of its parents (a cycle)
+or that has already been included elsewhere (a duplicate) is not expanded again and a warning is logged.
+
+""",
+    "zh": r"""
+同时解析各个子文件夹下的 _sidebar.md，与 Docsify 的 loadSidebar 配置一致。
+指向一个包含 _sidebar.md 的文件夹（"guide/" 或 "guide/README.md"）的条目会成为一个章节：
+其中依次为该文件夹的主页以及子侧边栏中的所有条目，层级加深一级。
+子侧边栏中的链接先相对于其所在的文件夹查找，再相对于 Docsify 的根目录查找。
+子侧边栏由预读取的线程（-j）并发解析。指向其祖先侧边栏的条目（循环）与已经在其他位置展开过的侧边栏（重复）不会再次展开，并输出警告。
+
+"""
+})
+
+dp_help_text = t({
+    "en": r"""
+Output a page that the sidebar references several times (for example a shared glossary) only where it first appears.
+Every later occurrence is replaced with a one-line quote of its sidebar name, which links to the first occurrence with -rl.
+Without this option repeated pages are still read and processed only once, but their content is output every time.
+
+""",
+    "zh": r"""
+侧边栏中多次出现的页面（例如共用的术语表）只在第一次出现的位置输出。
+之后的每次出现都替换为一行引用，内容为该页面在侧边栏中的名称，使用 -rl 时该引用链接到第一次出现的位置。
+不使用该参数时，重复的页面同样只会被读取并处理一次，但每次出现都会输出其内容。
+
+"""
+})
+
+s_help_text = t({
+    "en": r"""
+Serve mode: start a local HTTP server that answers "GET /merged.md" with the merged document instead of writing -o.
+The optional address is "host:port", ":port" or "port", the default value is "127.0.0.1:8000".
+The result is cached until a Markdown file of the Docsify root directory changes (checked by modification time and size
+on every request). Responses carry an ETag, and a matching "If-None-Match" is answered with "304 Not Modified".
+Requests that arrive while the document is being merged wait for that merge instead of starting their own.
+Press Ctrl+C to exit.
+
+""",
+    "zh": r"""
+服务模式：启动本地 HTTP 服务，"GET /merged.md" 返回合并后的文档，不写入 -o 指定的输出文件。
+可选的地址为 "主机:端口"、":端口" 或 "端口"，默认值为 "127.0.0.1:8000"。
+合并结果被缓存，直到 Docsify 根目录中的 Markdown 文件发生变化（每次请求时比较文件的修改时间与大小）。
+响应包含 ETag，请求头 "If-None-Match" 与之一致时返回 "304 Not Modified"。
+合并期间到达的请求等待这次合并的结果，而不是各自重新合并。按 Ctrl+C 退出。
+
+"""
+})
+
+sp_help_text = t({
+    "en": r"""
+Split mode: write every top-level entry of the sidebar to its own file next to -o, named after it with a chapter
+number (for example book-01.md, book-02.md, ...), and write an index to -o that lists the chapter files in order with
+their sizes in bytes. With the optional size in MB, consecutive top-level entries are packed into one file until the
+next one would exceed it; an entry larger than the size gets a file of its own.
+Chapters are merged in parallel in -mj processes, and title numbering continues from one chapter to the next,
+so the chapter files concatenated are identical to the merged document. Cannot be combined with -rl or -w.
+
+""",
+    "zh": r"""
+分章节输出：侧边栏的每个顶级条目写入 -o 所在目录下的一个文件，文件名为 -o 的文件名加上章节序号（例如 book-01.md、book-02.md……），
+-o 写入索引文件，按顺序列出所有章节文件及其大小（字节）。指定可选的大小（MB）时，相邻的顶级条目被合并到同一个文件中，
+直到再加入下一个条目就会超过该大小；超过该大小的单个条目单独成为一个文件。
+各章节在 -mj 个进程中并行合并，标题编号在章节之间保持连续，因此章节文件依次拼接后与合并后的文档完全一致。不能与 -rl 或 -w 同时使用。
+
+"""
+})
+
+toc_help_text = t({
+    "en": r"""
+Prepend a table of contents to the merged document: a nested list of the renumbered headings up to the given level
+(1 to 6, the default value is 3), each linking to the heading's anchor (GitHub style, as used by Typora and Pandoc).
+The entries are collected while the headings are renumbered, so the document is not parsed a second time.
+With -sp, every chapter file starts with the table of contents of that chapter.
+
+""",
+    "zh": r"""
+在合并后的文档开头添加目录：由重新编号后的标题组成的嵌套列表，包含的最大标题层级为指定的值（1 到 6，默认值为 3），
+每一项链接到标题的锚点（GitHub 风格，与 Typora、Pandoc 一致）。目录项在重新编号的同时收集，不需要再次解析文档。
+使用 -sp 时，每个章节文件的开头是该章节的目录。
+
+"""
+})
+
+ei_help_text = t({
+    "en": r"""
+Expand docsify embeds that stand on a line of their own, such as [label](_media/snippet.md ':include'),
+instead of keeping only their label. Markdown files are embedded recursively, with their headings moved below the
+heading the embed sits under and YAML front matter removed; other text files (or ':type=code') become a code block,
+':fragment=name' keeps only the lines between "/// [name]" or "### [name]". Every embedded file is read and processed
+once per run however often it is embedded. Embed cycles and nesting deeper than 8 levels are reported and not expanded.
+Embedded iframes, audio, video and external URLs keep only their label, as without this option.
+
+""",
+    "zh": r"""
+展开单独成行的 Docsify 嵌入，例如 [label](_media/snippet.md ':include')，而不是只保留其描述。
+Markdown 文件被递归地嵌入，其中的标题下移到嵌入所在的标题之下，并去除 YAML front matter；
+其他文本文件（或指定了 ':type=code' 的文件）嵌入为代码块，':fragment=name' 只保留 "/// [name]" 或 "### [name]" 两行之间的内容。
+每个嵌入文件在一次运行中只读取并处理一次，不论被嵌入多少次。循环嵌入与超过 8 层的嵌套会被报告且不再展开。
+嵌入的 iframe、音频、视频与外部链接与不使用该参数时一样，只保留描述。
+
+"""
+})
+
+a_help_text = t({
+    "en": r"""
+Collect local images: every ![...](...) and <img src="..."> in the pages is resolved relative to its source file
+(or the docsify root), copied into this folder under a name derived from its content hash and linked from there,
+so images with the same content are stored once. The copies run in parallel while merging; images whose modification
+time and size are unchanged since the last run are neither read nor copied again. A relative folder is relative to the
+output file's folder (the default value is "assets"). Not supported with -sp or -s.
+
+""",
+    "zh": r"""
+收集本地图片：页面中的每个 ![...](...) 与 <img src="..."> 相对于其源文件（或 Docsify 根目录）查找，
+以其内容哈希命名后复制到该目录，并改写为指向该目录中的文件，因此内容相同的图片只保存一份。
+图片在合并的同时并行复制；与上次运行相比修改时间与大小都没有变化的图片不会再次读取与复制。
+相对路径相对于输出文件所在的目录（默认值为 "assets"）。不能与 -sp 或 -s 同时使用。
+
+"""
+})
+
+ai_help_text = t({
+    "en": r"""
+Inline images up to this size (KB) into the merged document as base64 data URIs instead of copying them,
+larger images are still copied into the assets folder (-a, "assets" when not given).
+
+""",
+    "zh": r"""
+将不超过该大小（KB）的图片以 base64 的 data URI 内联到合并后的文档中，而不是复制，
+更大的图片仍然复制到资源目录（-a，未指定时为 "assets"）。
+
+"""
+})
+
 parser = argparse.ArgumentParser(description=t(description_text), formatter_class=argparse.RawTextHelpFormatter)
 parser.add_argument('-v', '--version', action='version', version='%(prog)s v1.0.0')
 parser.add_argument('-r', '--serial_number_remove_config_file', type=str, help=r_help_text)
@@ -204,3 +542,22 @@ parser.add_argument('-d', '--docsify_path', type=str, help=d_help_text)
 parser.add_argument('-o', '--output_file_path', type=str, help=o_help_text)
 parser.add_argument('-hu', '--handel_unserial_number_title_strategy', type=str, help=hu_help_text)
 parser.add_argument('-hg', '--handle_title_greater_than_level_six_strategy', type=str, help=hg_help_text)
+parser.add_argument('-j', '--prefetch_workers', type=int, help=j_help_text)
+parser.add_argument('-c', '--cache_dir', type=str, help=c_help_text)
+parser.add_argument('-cs', '--cache_size', type=int, help=cs_help_text)
+parser.add_argument('--no_cache', '--no-cache', action='store_true', help=nc_help_text)
+parser.add_argument('-w', '--watch', action='store_true', help=w_help_text)
+parser.add_argument('-m', '--manifest', type=str, help=m_help_text)
+parser.add_argument('-mj', '--manifest_workers', type=int, help=mj_help_text)
+parser.add_argument('--report', type=str, help=report_help_text)
+parser.add_argument('--profile', type=str, help=profile_help_text)
+parser.add_argument('-rl', '--resolve_links', action='store_true', help=rl_help_text)
+parser.add_argument('-mm', '--mmap_threshold', type=float, help=mm_help_text)
+parser.add_argument('-ns', '--nested_sidebars', action='store_true', help=ns_help_text)
+parser.add_argument('-dp', '--dedupe_pages', action='store_true', help=dp_help_text)
+parser.add_argument('-s', '--serve', type=str, nargs='?', const='127.0.0.1:8000', help=s_help_text)
+parser.add_argument('-sp', '--split', type=float, nargs='?', const=0, help=sp_help_text)
+parser.add_argument('-toc', '--toc', type=int, nargs='?', const=3, help=toc_help_text)
+parser.add_argument('-ei', '--expand_includes', action='store_true', help=ei_help_text)
+parser.add_argument('-a', '--assets_dir', type=str, nargs='?', const='assets', help=a_help_text)
+parser.add_argument('-ai', '--inline_assets', type=float, help=ai_help_text)
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-27 10:40
+# Author  : Jiang Liu
+# Desc    : 图片资源的收集：页面中的图片路径相对于各自源文件所在的目录，合并为一个文件后不再有效。
+#           单文件处理时图片链接被替换为占位标记（与源文件的位置无关，因此可以被片段缓存复用），
+#           输出页面时解析为图片文件的路径，并在线程池中复制到资源目录；写入时改写为以内容哈希命名的文件或 base64 内联数据
+import base64
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+
+from src.i18n import translate as t
+from src.link_scanner import find_code_spans, scan_links
+from src.log import get_logger
+from src.markdown_lexer import LineKind, LineToken
+from src.output_writer import hash_file
+from src.report import get_report
+
+# 图片在片段中的占位标记：\ue004图片链接\ue005，输出页面后为 \ue004图片文件的路径\ue005。
+# 使用私有区字符，与内链的占位标记（\ue000 至 \ue003）不冲突
+ASSET_START = '\ue004'
+ASSET_END = '\ue005'
+_ASSET_MARKER = re.compile('\ue004([^\ue004\ue005]*)\ue005')
+# HTML 图片的 src 属性，只处理以引号包围的值
+_IMG_SRC = re.compile(r'''(<img\b[^>]*?\bsrc\s*=\s*)(["'])([^"'<>]*)\2''', re.IGNORECASE)
+# 带有协议（http:、data: 等）的链接不是本地文件
+_URL_SCHEME = re.compile(r'[A-Za-z][A-Za-z0-9+.\-]*:')
+# 资源目录中记录源文件与复制后的文件名的清单，源文件没有变化时不需要再次读取
+MANIFEST_FILE_NAME = '.assets.json'
+
+
+def is_local_image(url):
+    """
+    该函数用于判断图片链接是否指向本地文件
+    :param url:     图片链接
+    :return:        是否为本地文件
+    """
+    return bool(url) and not url.startswith(('//', '#')) and _URL_SCHEME.match(url) is None
+
+
+def mark_image_line(line):
+    """
+    该函数用于将一行中指向本地文件的图片链接 ![描述](链接) 与 <img src="链接"> 的链接替换为占位标记，
+    行内代码中的图片保持不变
+    :param line:    行
+    :return:        替换后的行，没有图片时返回原来的行
+    """
+    replacements = []
+    if '![' in line:
+        for start, end, description, url, title in scan_links(line):
+            if start > 0 and line[start - 1] == '!' and is_local_image(url):
+                url_start = line.index(url, start + len(description) + 3)
+                replacements.append((url_start, url_start + len(url), url))
+    if '<img' in line or '<IMG' in line:
+        code_spans = find_code_spans(line)
+        for match in _IMG_SRC.finditer(line):
+            url = match.group(3)
+            if is_local_image(url) and not any(start <= match.start() < end for start, end in code_spans):
+                replacements.append((match.start(3), match.end(3), url))
+    if not replacements:
+        return line
+    result = []
+    position = 0
+    for start, end, url in sorted(replacements):
+        result.append(line[position:start])
+        result.append(f"{ASSET_START}{url}{ASSET_END}")
+        position = end
+    result.append(line[position:])
+    return ''.join(result)
+
+
+def mark_images(tokens):
+    """
+    该函数用于将正文中指向本地文件的图片链接替换为占位标记。被标记的图片链接在去除内链时保留，
+    标题中的图片与原来一样只保留描述
+    :param tokens:  分类后的行列表
+    :return:        替换后的行列表
+    """
+    for token in tokens:
+        if token.kind is LineKind.TEXT and ('![' in token.line or '<img' in token.line or '<IMG' in token.line):
+            token.line = mark_image_line(token.line)
+    return tokens
+
+
+class AssetCollector:
+    """
+    该类用于收集一次合并中的图片：每个图片文件只读取一次，按内容哈希命名后复制到资源目录，
+    内容相同的图片只保留一份。源文件的修改时间与大小没有变化、且资源目录中已有对应的文件时，不再读取与复制
+    """
+
+    def __init__(self, docsify_root_path, assets_dir, base_folder, workers=1, inline_limit=None):
+        """
+        该函数用于初始化图片收集器
+        :param docsify_root_path:   Docsify的根目录，以 "/" 开头的图片路径相对于该目录
+        :param assets_dir:          资源目录的路径，相对路径相对于 base_folder
+        :param base_folder:         合并后的文档所在的目录，改写后的图片链接相对于该目录
+        :param workers:             复制图片的线程数
+        :param inline_limit:        内联图片的最大大小（字节），不超过该大小的图片以 base64 的 data URI 内联到文档中，
+                                    为 None 时不内联
+        """
+        self.docsify_root_path = docsify_root_path
+        self.base_folder = os.path.abspath(base_folder)
+        self.assets_dir = os.path.join(self.base_folder, assets_dir)
+        self.inline_limit = inline_limit
+        self.prefix = quote(os.path.relpath(self.assets_dir, self.base_folder).replace(os.sep, '/'))
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # 图片文件的路径 -> Future，结果为 (改写后的链接, 处理方式, 清单中的记录)
+        self.futures = {}
+        self.missing = 0
+        self.manifest_path = os.path.join(self.assets_dir, MANIFEST_FILE_NAME)
+        self.manifest = {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                self.manifest = json.load(file)
+        except (OSError, ValueError):
+            pass
+        if not isinstance(self.manifest, dict):
+            self.manifest = {}
+
+    def locate_path(self, url, path):
+        """
+        该函数用于查找图片文件：先相对于图片所在的源文件的目录查找，找不到时再相对于 Docsify 的根目录查找
+        :param url:     图片链接
+        :param path:    图片所在的源文件的路径
+        :return:        图片文件的路径，找不到时返回 None
+        """
+        url = unquote(url.split('?')[0].split('#')[0])
+        if url.startswith('/'):
+            candidates = [os.path.join(self.docsify_root_path, url.lstrip('/'))]
+        else:
+            candidates = [os.path.join(os.path.dirname(path), url), os.path.join(self.docsify_root_path, url)]
+        for candidate in candidates:
+            candidate = os.path.normpath(candidate)
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def locate(self, tokens, path):
+        """
+        该函数用于将片段中图片的占位标记改写为图片文件的路径，并提交复制图片的任务；
+        找不到的图片恢复为原来的链接。片段可能被缓存或复用，因此改写时生成新的行而不修改原来的行
+        :param tokens:  分类后的行迭代器
+        :param path:    片段的源文件路径
+        :return:        改写后的分类行迭代器（生成器）
+        """
+        def replacer(match):
+            url = match.group(1)
+            source = self.locate_path(url, path)
+            if source is None:
+                self.missing += 1
+                get_logger().warning(f"{t('Image not found:')} {url} ({path})")
+                return url
+            if source not in self.futures:
+                self.futures[source] = self.executor.submit(self.collect, source)
+            return f"{ASSET_START}{source}{ASSET_END}"
+
+        for token in tokens:
+            if token.kind is LineKind.TEXT and ASSET_START in token.line:
+                token = LineToken(token.kind, _ASSET_MARKER.sub(replacer, token.line), token.indent)
+            yield token
+
+    def collect(self, source):
+        """
+        该函数用于处理一个图片文件（在线程池中执行）：内联，或按内容哈希命名后复制到资源目录
+        :param source:  图片文件的路径
+        :return:        (改写后的链接, 处理方式, 清单中的记录 [修改时间, 大小, 文件名])，处理方式为
+                        "inlined"、"copied" 或 "unchanged"
+        """
+        stat = os.stat(source)
+        if self.inline_limit is not None and stat.st_size <= self.inline_limit:
+            with open(source, 'rb') as file:
+                data = base64.b64encode(file.read()).decode('ascii')
+            mime = mimetypes.guess_type(source)[0] or 'application/octet-stream'
+            return f"data:{mime};base64,{data}", 'inlined', None
+        entry = self.manifest.get(source)
+        if (entry is not None and entry[:2] == [stat.st_mtime_ns, stat.st_size]
+                and os.path.isfile(os.path.join(self.assets_dir, entry[2]))):
+            return f"{self.prefix}/{entry[2]}", 'unchanged', entry
+        name = hash_file(source).hex() + os.path.splitext(source)[1].lower()
+        target = os.path.join(self.assets_dir, name)
+        # 文件名由内容决定，同名且大小相同的文件即为相同的图片
+        if os.path.isfile(target) and os.path.getsize(target) == stat.st_size:
+            state = 'unchanged'
+        else:
+            os.makedirs(self.assets_dir, exist_ok=True)
+            # 内容相同的图片可能同时被复制，各自写入临时文件后原子地替换
+            temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                shutil.copyfile(source, temp_path)
+                os.replace(temp_path, target)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            state = 'copied'
+        return f"{self.prefix}/{name}", state, [stat.st_mtime_ns, stat.st_size, name]
+
+    def resolve_line(self, line):
+        """
+        该函数用于将一行中图片文件的路径改写为资源目录中的文件或内联数据，需要时等待图片处理完成
+        :param line:    行
+        :return:        改写后的行
+        """
+        return _ASSET_MARKER.sub(lambda match: self.futures[match.group(1)].result()[0], line)
+
+    def resolve_lines(self, lines):
+        """
+        该函数用于逐行改写图片，全部改写后保存清单并输出统计。内存映射模式下的原始字节中没有占位标记，直接产出
+        :param lines:   合并后的Markdown文件的行迭代器
+        :return:        改写后的行迭代器（生成器）
+        """
+        try:
+            for line in lines:
+                yield self.resolve_line(line) if isinstance(line, str) and ASSET_START in line else line
+        finally:
+            self.executor.shutdown()
+        counts = {'inlined': 0, 'copied': 0, 'unchanged': 0}
+        names = set()
+        changed = False
+        for source, future in self.futures.items():
+            _, state, entry = future.result()
+            counts[state] += 1
+            if entry is not None:
+                names.add(entry[2])
+                changed = changed or self.manifest.get(source) != entry
+                self.manifest[source] = entry
+        if changed:
+            self.save_manifest()
+        report = get_report()
+        report.count('assets_copied', counts['copied'])
+        report.count('assets_unchanged', counts['unchanged'])
+        report.count('assets_inlined', counts['inlined'])
+        report.count('assets_missing', self.missing)
+        report.count('assets_deduplicated', counts['copied'] + counts['unchanged'] - len(names))
+        get_logger().info(f"{t('Images:')} {counts['copied']} {t('copied')}, {counts['unchanged']} {t('unchanged')}, "
+                          f"{counts['inlined']} {t('inlined')}, {self.missing} {t('not found')}")
+
+    def save_manifest(self):
+        """
+        该函数用于原子地保存清单
+        """
+        temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.manifest, file, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
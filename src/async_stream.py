@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-25 15:20
+# Author  : Jiang Liu
+# Desc    : 异步接口：在线程中运行流式的合并（读取文件、去除编号、重新编号），以异步迭代器的方式按顺序产出结果，
+#           事件循环不会被文件读写与正则处理阻塞。消费者来不及处理时，合并线程最多领先 max_pending 个结果
+import asyncio
+import contextlib
+import threading
+
+from src.i18n import translate as t
+
+# 合并线程结束的标记
+_DONE = object()
+
+
+async def iter_in_thread(function, max_pending=4, executor=None):
+    """
+    该函数用于在线程中迭代同步的迭代器，并以异步迭代器的方式产出其中的元素，顺序不变。
+    迭代器只在一个线程中被使用，因此其中的生成器（例如合并的各个阶段）不需要是线程安全的。
+    迭代器抛出的异常在消费者取到它之前的所有元素后抛出；消费者提前停止迭代时，合并线程在产出下一个元素前结束
+    :param function:        返回同步迭代器的函数，在线程中调用
+    :param max_pending:     已产出但尚未被消费的元素的最大数量，用于限制合并线程领先的程度
+    :param executor:        线程池（concurrent.futures.ThreadPoolExecutor），为 None 时使用事件循环的默认线程池。
+                            迭代器的状态无法在进程之间传递，因此不支持进程池
+    :return:                异步迭代器
+    """
+    if max_pending < 1:
+        raise ValueError(f"{t('Max pending chunks')} '{max_pending}' {t('is invalid')}")
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    # 每个已产出但尚未被消费的元素占用一个名额，名额用完时合并线程等待
+    slots = threading.Semaphore(max_pending)
+    stopped = threading.Event()
+
+    def produce():
+        iterator = None
+        try:
+            iterator = iter(function())
+            for item in iterator:
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        finally:
+            # 在合并线程中关闭生成器，预读取的线程池等资源随之释放
+            if iterator is not None and hasattr(iterator, 'close'):
+                iterator.close()
+            loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+    future = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            slots.release()
+            yield item
+        # 合并线程已经结束，如果合并失败，这里抛出其异常
+        await future
+    finally:
+        if not future.done():
+            # 消费者提前停止：通知合并线程，并释放一个名额，使等待中的合并线程能够看到通知
+            stopped.set()
+            slots.release()
+            # 等待合并线程结束后再返回，保证合并器不会同时被下一次调用使用，此时合并的异常已经无关紧要
+            with contextlib.suppress(Exception):
+                await asyncio.shield(future)
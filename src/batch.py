@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-17 20:05
+# Author  : Jiang Liu
+# Desc    : 批量模式：根据清单文件在一个进程池中合并多个 Docsify 项目，共享的配置文件只加载一次
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.docsify_merger import DocsifyMerger, load_serial_number_generate_config, load_serial_number_remove_config
+from src.i18n import translate as t
+from src.log import get_logger
+
+
+class BatchJob:
+    """
+    该类用于描述清单中的一个合并任务，字段名与命令行参数的长名称一致
+    """
+
+    def __init__(self, name, docsify_path, output_file_path, homepage=None,
+                 serial_number_remove_config_file=None, serial_number_generate_config_file=None,
+                 handel_unserial_number_title_strategy=None, handle_title_greater_than_level_six_strategy=None,
+                 resolve_links=False, mmap_threshold=None, nested_sidebars=False, dedupe_pages=False,
+                 expand_includes=False, assets_dir=None, inline_assets=None, toc_depth=None):
+        """
+        该函数用于初始化合并任务
+        :param name:                                            任务名称，用于输出汇总信息
+        :param docsify_path:                                    Docsify项目根目录的路径
+        :param output_file_path:                                输出文件的路径
+        :param homepage:                                        Docsify主页的路径，相对路径相对于Docsify根目录
+        :param serial_number_remove_config_file:                标题序号移除规则的配置文件路径
+        :param serial_number_generate_config_file:              标题序号生成规则的配置文件路径
+        :param handel_unserial_number_title_strategy:           未处理标题的策略
+        :param handle_title_greater_than_level_six_strategy:    大于六级标题的策略
+        :param resolve_links:                                   是否将内链改写为合并后文档内的锚点链接
+        :param mmap_threshold:                                  使用内存映射的最小文件大小（MB），为 None 时不使用内存映射
+        :param nested_sidebars:                                 是否同时解析各个子文件夹下的侧边栏文件并合并为一棵树
+        :param dedupe_pages:                                    是否只在页面第一次出现时输出其内容，之后的出现只输出一行引用
+        :param expand_includes:                                 是否将单独成行的 Docsify 嵌入替换为嵌入文件的内容
+        :param assets_dir:                                      资源目录，相对路径相对于输出文件所在的目录，为 None 时不收集图片
+        :param inline_assets:                                   内联图片的最大大小（KB），为 None 时不内联
+        :param toc_depth:                                       在文档开头添加的目录包含的最大标题层级，为 None 时不添加目录
+        """
+        self.name = name
+        self.docsify_path = docsify_path
+        self.output_file_path = output_file_path
+        self.homepage = homepage
+        self.serial_number_remove_config_file = serial_number_remove_config_file
+        self.serial_number_generate_config_file = serial_number_generate_config_file
+        self.handel_unserial_number_title_strategy = handel_unserial_number_title_strategy
+        self.handle_title_greater_than_level_six_strategy = handle_title_greater_than_level_six_strategy
+        self.resolve_links = resolve_links
+        self.mmap_threshold = mmap_threshold
+        self.nested_sidebars = nested_sidebars
+        self.dedupe_pages = dedupe_pages
+        self.expand_includes = expand_includes
+        self.assets_dir = assets_dir
+        self.inline_assets = inline_assets
+        self.toc_depth = toc_depth
+        # 由 load_job_configs 填充：已加载的配置，以及加载配置时发生的错误
+        self.serial_number_regex_list = None
+        self.serial_number_config_array = None
+        self.error = None
+
+
+class BatchResult:
+    """
+    该类用于描述一个合并任务的执行结果
+    """
+
+    def __init__(self, name, output_file_path, elapsed, error=None):
+        """
+        该函数用于初始化执行结果
+        :param name:                任务名称
+        :param output_file_path:    输出文件的路径
+        :param elapsed:             耗时（秒）
+        :param error:               错误信息，为 None 时表示成功
+        """
+        self.name = name
+        self.output_file_path = output_file_path
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def load_manifest(manifest_path, defaults=None):
+    """
+    该函数用于读取清单文件。清单是一个 JSON 列表，每一项描述一个合并任务，
+    其中的相对路径相对于清单文件所在的目录，未指定的字段使用 defaults 中的值
+    :param manifest_path:   清单文件的路径
+    :param defaults:        各字段的默认值，通常来自命令行参数
+    :return:                合并任务（BatchJob）的列表
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        items = json.load(file)
+    if not isinstance(items, list):
+        raise ValueError(f"{t('Manifest')} '{manifest_path}' {t('is invalid')}")
+    base_path = os.path.dirname(os.path.abspath(manifest_path))
+
+    def resolve(path):
+        if path is None or os.path.isabs(path):
+            return path
+        return os.path.join(base_path, path)
+
+    jobs = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get('docsify_path') is None or item.get('output_file_path') is None:
+            raise ValueError(f"{t('Manifest item')} '{item}' {t('is invalid')}")
+        options = dict(defaults or {})
+        options.update({key: value for key, value in item.items() if value is not None})
+        jobs.append(BatchJob(
+            name=options.get('name', str(index)),
+            docsify_path=resolve(options['docsify_path']),
+            output_file_path=resolve(options['output_file_path']),
+            homepage=options.get('homepage'),
+            serial_number_remove_config_file=resolve(options.get('serial_number_remove_config_file')),
+            serial_number_generate_config_file=resolve(options.get('serial_number_generate_config_file')),
+            handel_unserial_number_title_strategy=options.get('handel_unserial_number_title_strategy'),
+            handle_title_greater_than_level_six_strategy=options.get('handle_title_greater_than_level_six_strategy'),
+            resolve_links=bool(options.get('resolve_links', False)),
+            mmap_threshold=options.get('mmap_threshold'),
+            nested_sidebars=bool(options.get('nested_sidebars', False)),
+            dedupe_pages=bool(options.get('dedupe_pages', False)),
+            expand_includes=bool(options.get('expand_includes', False)),
+            assets_dir=options.get('assets_dir'),
+            inline_assets=options.get('inline_assets'),
+            toc_depth=options.get('toc_depth'),
+        ))
+    return jobs
+
+
+def load_job_configs(jobs):
+    """
+    该函数用于加载所有任务用到的配置文件，多个任务共享的配置文件只会被读取和检查一次。
+    配置文件不合法的任务会被标记为失败，不影响其他任务
+    :param jobs:    合并任务（BatchJob）的列表
+    """
+    logger = get_logger()
+    loaded = {}
+
+    def load(loader, path, label):
+        key = (loader, path)
+        if key not in loaded:
+            logger.info(f"{t(label)} '{path}'")
+            try:
+                loaded[key] = (loader(path), None)
+            except (OSError, ValueError) as e:
+                loaded[key] = (None, f"{type(e).__name__}: {e}")
+        return loaded[key]
+
+    for job in jobs:
+        if job.serial_number_remove_config_file is not None:
+            job.serial_number_regex_list, job.error = load(
+                load_serial_number_remove_config, job.serial_number_remove_config_file,
+                'Load serial number remove config file:')
+        if job.error is None and job.serial_number_generate_config_file is not None:
+            job.serial_number_config_array, job.error = load(
+                load_serial_number_generate_config, job.serial_number_generate_config_file,
+                'Load serial number generate config file:')
+
+
+def run_job(job, workers=1, cache_dir=None):
+    """
+    该函数用于执行一个合并任务，在进程池的工作进程中调用。任务失败时不抛出异常，而是返回错误信息
+    :param job:         合并任务（BatchJob）
+    :param workers:     预读取Markdown文件的线程数
+    :param cache_dir:   片段缓存目录，为 None 时不使用缓存
+    :return:            执行结果（BatchResult）
+    """
+    logger = get_logger()
+    start = time.perf_counter()
+    try:
+        # 匹配器在每个工作进程中只会编译一次，之后使用相同移除规则的任务直接复用；
+        # 多个进程共享同一个缓存目录，缓存的整理在所有任务完成后统一进行一次
+        merger = DocsifyMerger(
+            job.docsify_path, homepage=job.homepage, serial_number_regex_list=job.serial_number_regex_list,
+            serial_number_config_array=job.serial_number_config_array,
+            handel_unserial_number_title_strategy=job.handel_unserial_number_title_strategy,
+            handle_title_greater_than_level_six_strategy=job.handle_title_greater_than_level_six_strategy,
+            workers=workers, cache_dir=cache_dir, resolve_links=job.resolve_links, mmap_threshold=job.mmap_threshold,
+            nested_sidebars=job.nested_sidebars, dedupe_pages=job.dedupe_pages, expand_includes=job.expand_includes,
+            assets_dir=job.assets_dir, inline_assets=job.inline_assets, toc_depth=job.toc_depth)
+        # 先写入临时文件，任务失败时不会留下只写了一半的输出文件
+        merger.merge_to_path(job.output_file_path)
+    except Exception as e:
+        logger.error(f"{t('Job')} '{job.name}' {t('failed:')} {e}")
+        return BatchResult(job.name, job.output_file_path, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+    return BatchResult(job.name, job.output_file_path, time.perf_counter() - start)
+
+
+def run_batch(jobs, processes=None, workers=1, cache_dir=None, initializer=None, initargs=()):
+    """
+    该函数用于在进程池中执行所有合并任务，一个任务失败不会影响其他任务
+    :param jobs:            合并任务（BatchJob）的列表
+    :param processes:       进程数，为 None 时使用 CPU 核心数
+    :param workers:         每个任务预读取Markdown文件的线程数
+    :param cache_dir:       片段缓存目录，为 None 时不使用缓存
+    :param initializer:     工作进程的初始化函数，用于在每个进程中初始化日志与语言
+    :param initargs:        初始化函数的参数
+    :return:                执行结果（BatchResult）的列表，顺序与 jobs 一致
+    """
+    results = [None] * len(jobs)
+    pending = {}
+    for index, job in enumerate(jobs):
+        if job.error is not None:
+            results[index] = BatchResult(job.name, job.output_file_path, 0.0, job.error)
+    runnable = [index for index, job in enumerate(jobs) if results[index] is None]
+    if not runnable:
+        return results
+    processes = min(processes or os.cpu_count() or 1, len(runnable))
+    with ProcessPoolExecutor(max_workers=processes, initializer=initializer, initargs=initargs) as executor:
+        for index in runnable:
+            pending[executor.submit(run_job, jobs[index], workers, cache_dir)] = index
+        for future in as_completed(pending):
+            index = pending[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # 工作进程意外退出等情况，同样只记为该任务失败
+                job = jobs[index]
+                result = BatchResult(job.name, job.output_file_path, 0.0, f"{type(e).__name__}: {e}")
+            results[index] = result
+            print(format_result(result))
+    return results
+
+
+def format_result(result):
+    """
+    该函数用于格式化一个任务的执行结果
+    :param result:  执行结果（BatchResult）
+    :return:        格式化后的字符串
+    """
+    status = 'OK' if result.ok else 'FAILED'
+    message = result.output_file_path if result.ok else result.error
+    return f"[{status:<6}] {result.elapsed:8.3f}s  {result.name}: {message}"
+
+
+def summarize(results, elapsed):
+    """
+    该函数用于输出所有任务的执行汇总
+    :param results:     执行结果（BatchResult）的列表
+    :param elapsed:     总耗时（秒）
+    :return:            失败的任务数量
+    """
+    logger = get_logger()
+    failed = sum(1 for result in results if not result.ok)
+    print(t('Batch summary:'))
+    for result in results:
+        line = format_result(result)
+        print(line)
+        if result.ok:
+            logger.info(line)
+        else:
+            logger.error(line)
+    summary = f"{len(results) - failed} {t('succeeded')}, {failed} {t('failed')}, {elapsed:.3f}s"
+    print(summary)
+    logger.info(f"{t('Batch summary:')} {summary}")
+    return failed
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-24 15:10
+# Author  : Jiang Liu
+# Desc    : 可在进程内复用的合并器：配置文件的读取与检查、标题编号匹配器与编号生成器的编译、标题处理策略、
+#           片段缓存与日志都只在创建时完成一次，之后的每次合并只处理文档本身
+import json
+import os
+import re
+
+import src.i18n as i18n
+import src.log as log
+from src.anchor_index import AnchorIndex, page_key
+from src.asset_collector import AssetCollector
+from src.async_stream import iter_in_thread
+from src.fragment_cache import FragmentCache, hash_transform_config
+from src.i18n import translate as t
+from src.line_buffer import LineBuffer
+from src.mapped_markdown import RawLineWriter
+from src.merger_markdown import merge
+from src.output_writer import write_output
+from src.renumber_title import DEFAULT_SERIAL_NUMBER_CONFIG_ARRAY, DEFAULT_SERIAL_NUMBER_REGEX_LIST
+from src.renumber_title import SerialNumberConfig, SerialNumberGenerator, SerialTitleStrategy
+from src.renumber_title import renumber_titles
+from src.serial_number_matcher import compile_serial_number_matcher
+from src.sidebar_resolver import SIDEBAR_FILE_NAME
+from src.split_output import merge_to_chapters
+from src.table_of_contents import TableOfContents
+
+# merge_to_chunks 产出的文本块的大致大小（字符数）
+CHUNK_SIZE = 64 * 1024
+
+
+def load_serial_number_remove_config(path):
+    """
+    该函数用于读取并检查标题序号移除规则的配置文件
+    :param path:    配置文件的路径
+    :return:        正则表达式的元组，配置文件为空时返回 None
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        regex_list = json.load(file)
+    if regex_list is None:
+        return None
+    for regex in regex_list:
+        try:
+            re.compile(regex)
+        except Exception:
+            raise ValueError(f"{t('Regex')} '{regex}' {t('is invalid')}")
+    return tuple(regex_list)
+
+
+def load_serial_number_generate_config(path):
+    """
+    该函数用于读取并检查标题序号生成规则的配置文件
+    :param path:    配置文件的路径
+    :return:        标题编号配置（SerialNumberConfig）的列表，配置文件为空时返回 None
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        config = json.load(file)
+    if config is None:
+        return None
+    serial_number_config_array = []
+    for item in config:
+        try:
+            serial_number_config_array.append(SerialNumberConfig(**item))
+        except Exception:
+            raise ValueError(f"{t('Config')} '{item}' {t('is invalid')}")
+    SerialNumberGenerator(serial_number_config_array).check_config()
+    return serial_number_config_array
+
+
+def get_title_strategy(strategy, default):
+    """
+    该函数用于检查并获取标题处理策略
+    :param strategy:    标题策略字符串或标题策略函数，为 None 时使用默认值
+    :param default:     默认的标题策略字符串
+    :return:            标题策略函数
+    """
+    if callable(strategy):
+        return strategy
+    if strategy is None:
+        strategy = default
+    if strategy not in SerialTitleStrategy.all_strategies():
+        raise ValueError(f"{t('Title strategy')} '{strategy}' {t('is invalid')}")
+    return SerialTitleStrategy.get_strategy(strategy)
+
+
+def decode_raw_lines(lines):
+    """
+    该函数用于将内存映射模式下直接复制的原始字节解码为文本，使行迭代器中只有 str
+    :param lines:   行迭代器，每一行为 str 或 bytes
+    :return:        文本行的迭代器（生成器）
+    """
+    for line in lines:
+        yield line if type(line) is str else line.decode('utf-8')
+
+
+class DocsifyMerger:
+    """
+    该类用于在进程内多次合并同一个 Docsify 项目，例如由文档站点的构建脚本或服务直接调用。
+    所有参数在创建时检查，不合法时抛出 ValueError；匹配器、编号生成器、标题策略与片段缓存只创建一次，
+    每次合并时重新读取侧边栏与文档，因此文档修改后再次调用即可得到新的结果。
+    同一个对象不能在多个线程中同时使用
+    """
+
+    def __init__(self, docsify_path, homepage=None, serial_number_regex_list=None, serial_number_config_array=None,
+                 handel_unserial_number_title_strategy=None, handle_title_greater_than_level_six_strategy=None,
+                 workers=1, cache_dir=None, cache_size=None, resolve_links=False, mmap_threshold=None,
+                 nested_sidebars=False, dedupe_pages=False, serial_number_matcher=None, logger=None, language=None,
+                 toc_depth=None, expand_includes=False, assets_dir=None, inline_assets=None):
+        """
+        该函数用于初始化合并器
+        :param docsify_path:                                    Docsify项目根目录的路径
+        :param homepage:                                        Docsify主页的路径，相对路径相对于Docsify根目录
+        :param serial_number_regex_list:                        标题序号移除规则的正则表达式列表
+        :param serial_number_config_array:                      标题编号配置（SerialNumberConfig）的列表
+        :param handel_unserial_number_title_strategy:           未处理标题的策略，可以是策略字符串或策略函数
+        :param handle_title_greater_than_level_six_strategy:    大于六级标题的策略，可以是策略字符串或策略函数
+        :param workers:                                         并发读取Markdown文件的线程数
+        :param cache_dir:                                       片段缓存的目录，为 None 时不使用缓存
+        :param cache_size:                                      片段缓存的最大大小（MB），为 None 时不限制
+        :param resolve_links:                                   是否将内链改写为合并后文档内的锚点链接
+        :param mmap_threshold:                                  使用内存映射的最小文件大小（MB），为 None 时不使用内存映射
+        :param nested_sidebars:                                 是否同时解析各个子文件夹下的侧边栏文件并合并为一棵树
+        :param dedupe_pages:                                    是否只在页面第一次出现时输出其内容
+        :param serial_number_matcher:                           已编译的标题序号匹配器，如果提供，则忽略 serial_number_regex_list
+        :param logger:                                          日志对象，为 None 且尚未初始化日志时使用名为 "docsify_merger" 的日志对象
+        :param language:                                        日志与错误信息的语言，为 None 时保持当前设置
+        :param toc_depth:                                       在文档开头添加的目录包含的最大标题层级（1 到 6），为 None 时不添加目录
+        :param expand_includes:                                 是否将单独成行的 Docsify 嵌入 [label](path ':include') 替换为嵌入文件的内容
+        :param assets_dir:                                      资源目录，正文中的本地图片以内容哈希命名后复制到该目录，为 None 时不收集图片。
+                                                                相对路径相对于输出文件所在的目录（不写入文件时相对于当前目录）
+        :param inline_assets:                                   内联图片的最大大小（KB），不超过该大小的图片以 base64 内联到文档中，
+                                                                为 None 时不内联，需要同时指定 assets_dir
+        """
+        # 设置语言时会输出日志，因此先初始化日志
+        if logger is not None:
+            log.set_logger(logger)
+        else:
+            log.use_default_logger()
+        if language is not None:
+            i18n.set_language(language)
+
+        # 合并时页面的路径由根目录与侧边栏中的链接拼接而成，相对路径需要先转换为绝对路径
+        docsify_path = os.path.abspath(docsify_path)
+        if not os.path.isdir(docsify_path):
+            raise ValueError(f"{t('Docsify path')} '{docsify_path}' {t('does not exist')}")
+        if homepage is None:
+            homepage = r'./README.md'
+        if not os.path.isabs(homepage):
+            homepage = os.path.join(docsify_path, homepage)
+        if not os.path.exists(homepage):
+            raise ValueError(f"{t('Homepage')} '{homepage}' {t('does not exist')}")
+        if workers < 1:
+            raise ValueError(f"{t('Prefetch workers')} '{workers}' {t('is invalid')}")
+        if mmap_threshold is not None:
+            if not isinstance(mmap_threshold, (int, float)) or mmap_threshold < 0:
+                raise ValueError(f"{t('Mmap threshold')} '{mmap_threshold}' {t('is invalid')}")
+            mmap_threshold = int(mmap_threshold * 1024 * 1024)
+        if cache_size is not None and cache_size < 0:
+            raise ValueError(f"{t('Cache size')} '{cache_size}' {t('is invalid')}")
+        if toc_depth is not None and toc_depth not in range(1, 7):
+            raise ValueError(f"{t('TOC depth')} '{toc_depth}' {t('is invalid')}")
+        if inline_assets is not None:
+            if not isinstance(inline_assets, (int, float)) or inline_assets < 0 or assets_dir is None:
+                raise ValueError(f"{t('Inline assets')} '{inline_assets}' {t('is invalid')}")
+            inline_assets = int(inline_assets * 1024)
+
+        self.docsify_path = docsify_path
+        self.homepage = homepage
+        self.workers = workers
+        self.resolve_links = resolve_links
+        self.mmap_threshold = mmap_threshold
+        self.nested_sidebars = nested_sidebars
+        self.dedupe_pages = dedupe_pages
+        self.toc_depth = toc_depth
+        self.expand_includes = expand_includes
+        self.assets_dir = assets_dir
+        self.inline_assets = inline_assets
+        self.handel_unserial_number_title = get_title_strategy(handel_unserial_number_title_strategy, 'normal')
+        self.handle_title_greater_than_level_six = get_title_strategy(handle_title_greater_than_level_six_strategy,
+                                                                      'cite')
+        # 显式传入的空列表表示不去除任何编号（或不生成任何编号），只有为 None 时才使用默认配置
+        if serial_number_matcher is None:
+            if serial_number_regex_list is None:
+                serial_number_regex_list = DEFAULT_SERIAL_NUMBER_REGEX_LIST
+            serial_number_matcher = compile_serial_number_matcher(serial_number_regex_list)
+        self.serial_number_matcher = serial_number_matcher
+        if serial_number_config_array is None:
+            serial_number_config_array = DEFAULT_SERIAL_NUMBER_CONFIG_ARRAY
+        # 编号格式只解析一次，每次合并前清空计数器
+        self.serial_number_generator = SerialNumberGenerator(serial_number_config_array)
+        self.serial_number_generator.check_config()
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = FragmentCache(cache_dir, max_size=None if cache_size is None else cache_size * 1024 * 1024,
+                                       config_hash=hash_transform_config(serial_number_matcher, resolve_links,
+                                                                         expand_includes, assets_dir is not None))
+
+    @classmethod
+    def from_config_files(cls, docsify_path, serial_number_remove_config_file=None,
+                          serial_number_generate_config_file=None, **options):
+        """
+        该函数用于根据配置文件创建合并器，配置文件的格式与命令行参数 -r、-g 一致
+        :param docsify_path:                            Docsify项目根目录的路径
+        :param serial_number_remove_config_file:        标题序号移除规则的配置文件路径
+        :param serial_number_generate_config_file:      标题序号生成规则的配置文件路径
+        :param options:                                 其余参数，与 DocsifyMerger 的参数一致
+        :return:                                        合并器
+        """
+        if serial_number_remove_config_file is not None:
+            options['serial_number_regex_list'] = load_serial_number_remove_config(serial_number_remove_config_file)
+        if serial_number_generate_config_file is not None:
+            options['serial_number_config_array'] = load_serial_number_generate_config(
+                serial_number_generate_config_file)
+        return cls(docsify_path, **options)
+
+    def new_anchor_index(self):
+        """
+        该函数用于为一次合并创建锚点索引
+        :return:    锚点索引（AnchorIndex），不解析内链时返回 None
+        """
+        return AnchorIndex(page_key(self.docsify_path, self.homepage)) if self.resolve_links else None
+
+    def new_table_of_contents(self):
+        """
+        该函数用于为一次合并创建目录
+        :return:    目录（TableOfContents），不添加目录时返回 None
+        """
+        return TableOfContents(self.toc_depth) if self.toc_depth is not None else None
+
+    def new_asset_collector(self, base_folder=None):
+        """
+        该函数用于为一次合并创建图片收集器
+        :param base_folder:     合并后的文档所在的目录，为 None 时使用当前目录
+        :return:                图片收集器（AssetCollector），不收集图片时返回 None
+        """
+        if self.assets_dir is None:
+            return None
+        return AssetCollector(self.docsify_path, self.assets_dir, base_folder or os.getcwd(), workers=self.workers,
+                              inline_limit=self.inline_assets)
+
+    def iter_merged_lines(self, anchor_index=None, toc=None, base_folder=None):
+        """
+        该函数用于合并文档并重新编号，是其余合并函数的基础
+        :param anchor_index:    锚点索引（AnchorIndex），在重新编号的同时填充
+        :param toc:             目录（TableOfContents），在重新编号的同时填充，需要由调用方添加到文档的开头
+        :param base_folder:     合并后的文档所在的目录，收集图片时改写后的图片链接相对于该目录，为 None 时使用当前目录
+        :return:                重新编号后的行迭代器（生成器），内存映射模式下可能包含原始字节
+        """
+        assets = self.new_asset_collector(base_folder)
+        tokens = merge(docsify_root_path=self.docsify_path, homepage=self.homepage, workers=self.workers,
+                       serial_number_matcher=self.serial_number_matcher, cache=self.cache,
+                       resolve_links=self.resolve_links, mmap_threshold=self.mmap_threshold,
+                       nested_sidebars=self.nested_sidebars, dedupe_pages=self.dedupe_pages,
+                       expand_includes=self.expand_includes, assets=assets)
+        if tokens is None:
+            raise ValueError(f"{t('The sidebar file is not exists')}: "
+                             f"{os.path.join(self.docsify_path, SIDEBAR_FILE_NAME)}")
+        lines = renumber_titles(tokens, handel_unserial_number_title=self.handel_unserial_number_title,
+                                handle_title_greater_than_level_six=self.handle_title_greater_than_level_six,
+                                anchor_index=anchor_index, serial_number_generator=self.serial_number_generator,
+                                toc=toc)
+        # 图片在输出页面时已经提交复制，改写时通常已经处理完成，因此边合并边改写
+        return lines if assets is None else assets.resolve_lines(lines)
+
+    def merge_to_buffer(self):
+        """
+        该函数用于合并文档并保存在紧凑的行缓冲中：内链在缓冲中改写，目录保存为缓冲的开头，
+        内存映射模式下的原始字节不经解码直接保存
+        :return:    合并后的文档的行缓冲（LineBuffer）
+        """
+        anchor_index = self.new_anchor_index()
+        toc = self.new_table_of_contents()
+        buffer = LineBuffer(self.iter_merged_lines(anchor_index, toc))
+        if anchor_index is not None:
+            anchor_index.resolve_buffer(buffer)
+        if toc is not None:
+            buffer.head = toc.lines()
+        return buffer
+
+    def merge_to_lines(self):
+        """
+        该函数用于合并文档并返回合并后的行。不解析内链且不添加目录时边合并边产出；
+        否则需要先为所有标题编号，因此合并后的行会先保存在行缓冲中（见 merge_to_buffer）
+        :return:    合并后的文本行的迭代器
+        """
+        if self.resolve_links or self.toc_depth is not None:
+            return self.merge_to_buffer().lines()
+        return decode_raw_lines(self.iter_merged_lines())
+
+    def merge_to_chunks(self, chunk_size=CHUNK_SIZE):
+        """
+        该函数用于合并文档，并将合并后的行按顺序拼接为大小约为 chunk_size 的文本块，
+        适合作为 HTTP 响应逐块发送（单行超过 chunk_size 时，该行单独成为一块）
+        :param chunk_size:  文本块的大致大小（字符数）
+        :return:            文本块的迭代器（生成器）
+        """
+        if chunk_size < 1:
+            raise ValueError(f"{t('Chunk size')} '{chunk_size}' {t('is invalid')}")
+        chunk = []
+        size = 0
+        for line in self.merge_to_lines():
+            chunk.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield ''.join(chunk)
+
+    def merge_to_async_chunks(self, chunk_size=CHUNK_SIZE, max_pending=4, executor=None):
+        """
+        该函数用于在异步代码中合并文档：合并在线程中进行，文本块按顺序以异步迭代器的方式产出，不会阻塞事件循环。
+        消费者来不及处理时（例如客户端接收得较慢），合并线程最多领先 max_pending 个文本块，随后暂停读取与处理。
+        在上一次迭代结束（或提前停止）之前，不能开始下一次迭代
+        :param chunk_size:      文本块的大致大小（字符数）
+        :param max_pending:     已产出但尚未被消费的文本块的最大数量
+        :param executor:        线程池，为 None 时使用事件循环的默认线程池
+        :return:                文本块的异步迭代器，例如 async for chunk in merger.merge_to_async_chunks(): ...
+        """
+        return iter_in_thread(lambda: self.merge_to_chunks(chunk_size), max_pending=max_pending, executor=executor)
+
+    def merge_to_stream(self, stream):
+        """
+        该函数用于合并文档并写入以文本方式打开的流，例如 sys.stdout 或 io.StringIO
+        :param stream:  以文本方式打开的流，换行符的转换由流自身决定
+        """
+        if (self.mmap_threshold is not None and not self.resolve_links and self.toc_depth is None
+                and hasattr(stream, 'buffer')):
+            # 流有底层的二进制缓冲时，原始字节不解码直接写入
+            RawLineWriter(stream).writelines(self.iter_merged_lines())
+        else:
+            stream.writelines(self.merge_to_lines())
+        stream.flush()
+
+    def merge_to_path(self, output_file_path):
+        """
+        该函数用于合并文档并原子地写入输出文件，内容与已有的输出文件相同时不替换
+        :param output_file_path:    输出文件的路径，以 ".gz" 结尾时使用 gzip 压缩
+        :return:                    输出文件是否发生了变化
+        """
+        output_folder = os.path.dirname(output_file_path)
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
+        anchor_index = self.new_anchor_index()
+        toc = self.new_table_of_contents()
+        lines = self.iter_merged_lines(anchor_index, toc, os.path.dirname(os.path.abspath(output_file_path)))
+        log.get_logger().info(f"{t('Write to output file:')} '{output_file_path}'")
+        return write_output(output_file_path, lines, raw=self.mmap_threshold is not None, anchor_index=anchor_index,
+                            toc=toc)
+
+    def merge_to_chapters(self, output_file_path, split_size=None, processes=None, initializer=None, initargs=()):
+        """
+        该函数用于分章节合并文档：侧边栏的每个顶级节点（或按大小合并的若干个相邻顶级节点）写入一个章节文件，
+        各章节在进程池中并行合并，标题编号在章节之间保持连续；output_file_path 写入按顺序列出所有章节文件的索引文件。
+        不支持 resolve_links 与收集图片；添加目录时，每个章节文件的开头是该章节的目录
+        :param output_file_path:    索引文件的路径，章节文件位于同一目录，文件名加上章节序号，例如 book-01.md
+        :param split_size:          每个章节的大致大小上限（MB），为 None 或 0 时每个顶级节点为一个章节
+        :param processes:           进程数，为 None 时使用 CPU 核心数
+        :param initializer:         工作进程的初始化函数，用于在每个进程中初始化日志与语言
+        :param initargs:            初始化函数的参数
+        :return:                    章节（Chapter）的列表，包括章节文件的路径与大小
+        """
+        if split_size is not None:
+            if not isinstance(split_size, (int, float)) or split_size < 0:
+                raise ValueError(f"{t('Split size')} '{split_size}' {t('is invalid')}")
+            split_size = int(split_size * 1024 * 1024)
+        if processes is not None and processes < 1:
+            raise ValueError(f"{t('Processes')} '{processes}' {t('is invalid')}")
+        return merge_to_chapters(self, output_file_path, split_size, processes, initializer, initargs)
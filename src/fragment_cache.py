@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-14 20:31
+# Author  : Jiang Liu
+# Desc    : 按内容寻址的片段缓存：缓存每个Markdown文件经过单文件处理（去除内链、标题平移、去除序号）后的结果
+import hashlib
+import json
+import marshal
+import os
+
+from src.i18n import translate as t
+from src.log import get_logger
+from src.markdown_lexer import LineKind, LineToken
+
+# 片段格式的版本号，单文件处理逻辑发生变化时需要递增，以使旧的缓存失效
+FRAGMENT_FORMAT_VERSION = 4
+
+# 片段文件的扩展名。之前的版本使用 pickle 保存片段（扩展名为 .pickle），这些文件不再读取，只在整理缓存时删除
+FRAGMENT_EXTENSION = '.fragment'
+LEGACY_EXTENSIONS = ('.pickle',)
+
+# 行类别与整数之间的映射，用于压缩缓存文件
+_KINDS = tuple(LineKind)
+_KIND_INDEXES = {kind: index for index, kind in enumerate(_KINDS)}
+
+
+def tokens_to_records(tokens):
+    """
+    该函数用于将分类后的行转换为便于序列化的元组，行类别被压缩为整数
+    :param tokens:  分类后的行迭代器（LineToken）
+    :return:        元组的列表
+    """
+    return [(_KIND_INDEXES[token.kind], token.line, token.level, token.text, token.anchor) for token in tokens]
+
+
+def records_to_tokens(records):
+    """
+    该函数用于将 tokens_to_records 的结果还原为分类后的行
+    :param records:     元组的列表
+    :return:            分类后的行列表（LineToken）
+    """
+    return [LineToken(_KINDS[kind], line, 0, level, text, anchor) for kind, line, level, text, anchor in records]
+
+
+def hash_transform_config(serial_number_matcher, resolve_links=False, expand_includes=False, collect_assets=False):
+    """
+    该函数用于计算单文件处理配置的哈希值，配置不同的片段不会相互复用
+    :param serial_number_matcher:   标题编号匹配器
+    :param resolve_links:           是否保留内链的占位标记以便解析为文档内的锚点
+    :param expand_includes:         是否保留 Docsify 的嵌入以便展开
+    :param collect_assets:          是否保留本地图片的占位标记以便收集图片
+    :return:                        配置的哈希值
+    """
+    config = {
+        'version': FRAGMENT_FORMAT_VERSION,
+        'serial_number_patterns': [[pattern.pattern, pattern.flags] for pattern in serial_number_matcher.patterns],
+        'resolve_links': resolve_links,
+    }
+    # 不展开嵌入且不收集图片时哈希值与之前相同，已有的缓存仍然有效
+    if expand_includes:
+        config['expand_includes'] = True
+    if collect_assets:
+        config['collect_assets'] = True
+    return hashlib.blake2b(json.dumps(config, sort_keys=True).encode('utf-8'), digest_size=8).hexdigest()
+
+
+class FragmentCache:
+    """
+    该类用于在磁盘上缓存单文件处理后的片段，键由 (文件内容哈希, 侧边栏层级, 处理配置哈希) 组成，
+    缓存总大小超过上限时，按最近使用时间淘汰最旧的片段。
+    片段以 marshal 保存为只包含基本类型的元组，缓存目录可能被共享，读取时不会像 pickle 那样执行任意代码；
+    截断或不是本程序写入的片段视为不存在并被删除。
+    缓存只用于加速：缓存目录无法创建或写入时（例如程序安装在只读目录中）输出警告，之后不再写入，合并照常进行
+    """
+
+    def __init__(self, cache_dir, max_size=512 * 1024 * 1024, config_hash=''):
+        """
+        该函数用于初始化片段缓存
+        :param cache_dir:       缓存目录
+        :param max_size:        缓存的最大字节数，为 None 时不限制（由调用方另行整理缓存）
+        :param config_hash:     单文件处理配置的哈希值，由 hash_transform_config 计算
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.config_hash = config_hash
+        self.hits = 0
+        self.misses = 0
+        self.folders = set()
+        # 缓存目录是否可以写入，第一次写入失败后不再尝试
+        self.writable = True
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            self.disable(e)
+
+    def disable(self, error):
+        """
+        该函数用于在缓存目录无法写入时停止写入片段
+        :param error:   写入时发生的错误
+        """
+        self.writable = False
+        get_logger().warning(f"{t('Fragment cache is not writable:')} '{self.cache_dir}' ({error})")
+
+    def key(self, data, level, page=None):
+        """
+        该函数用于计算片段的键
+        :param data:    Markdown文件的原始内容
+        :param level:   Markdown文件在侧边栏中的层级
+        :param page:    源文件的键，解析内链时片段中包含源文件，因此相同内容的不同文件不能相互复用
+        :return:        片段的键
+        """
+        content_hash = hashlib.blake2b(data, digest_size=16)
+        if page is not None:
+            content_hash.update(b'\0' + page.encode('utf-8'))
+        content_hash = content_hash.hexdigest()
+        return f"{content_hash}-{level}-{self.config_hash}"
+
+    def path(self, key):
+        """
+        该函数用于获取片段在磁盘上的路径，按键的前两位分目录存放，避免单个目录中文件过多
+        :param key:     片段的键
+        :return:        片段文件的路径
+        """
+        return os.path.join(self.cache_dir, key[:2], key + FRAGMENT_EXTENSION)
+
+    def get(self, key):
+        """
+        该函数用于读取缓存的片段
+        :param key:     片段的键
+        :return:        (片段的行列表（LineToken）, 处理该文件时的统计)，如果不存在或已损坏，则返回 None
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            summary, records = marshal.loads(data)
+            summary = tuple(int(count) for count in summary)
+            if len(summary) != 3:
+                raise ValueError(summary)
+            tokens = records_to_tokens(records)
+        except Exception:
+            # 片段已损坏，解码时可能抛出任意异常
+            self.misses += 1
+            self.remove_file(path)
+            return None
+        # 更新修改时间，作为最近使用时间供淘汰时参考
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return tokens, summary
+
+    def put(self, key, tokens, summary):
+        """
+        该函数用于写入片段。先写入临时文件再重命名，因此并发运行时也不会读到写了一半的片段
+        :param key:         片段的键
+        :param tokens:      片段的行列表（LineToken）
+        :param summary:     处理该文件时的统计：(去除的内链数, 保留的外链数, 去除的标题编号数)，复用片段时计入报告
+        """
+        if not self.writable:
+            return
+        path = self.path(key)
+        folder = os.path.dirname(path)
+        # 临时文件名包含进程号，不同进程同时写入同一个片段时互不干扰
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            if folder not in self.folders:
+                os.makedirs(folder, exist_ok=True)
+                self.folders.add(folder)
+            with open(temp_path, 'wb') as file:
+                marshal.dump((tuple(summary), tokens_to_records(tokens)), file)
+            os.replace(temp_path, path)
+        except OSError as e:
+            self.remove_file(temp_path)
+            self.disable(e)
+        except BaseException:
+            self.remove_file(temp_path)
+            raise
+
+    @staticmethod
+    def remove_file(path):
+        """
+        该函数用于删除写入失败时留下的临时文件或已损坏的片段，文件不存在或无法删除时忽略
+        :param path:    文件的路径
+        """
+        try:
+            if os.path.exists(path):
+                os.unlink(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """
+        该函数用于在缓存总大小超过上限时，按最近使用时间从旧到新删除片段
+        :return:    删除的片段数量
+        """
+        if self.max_size is None:
+            return 0
+        entries = []
+        total_size = 0
+        removed = 0
+        for folder, _, file_names in os.walk(self.cache_dir):
+            for file_name in file_names:
+                path = os.path.join(folder, file_name)
+                if file_name.endswith(LEGACY_EXTENSIONS):
+                    self.remove_file(path)
+                    removed += 1
+                    continue
+                if not file_name.endswith(FRAGMENT_EXTENSION):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+        if total_size <= self.max_size:
+            return removed
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            removed += 1
+        return removed
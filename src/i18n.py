@@ -55,6 +55,81 @@ translations = {
         'Set Docsify path:': '设置Docsify路径:',
         'Set Homepage:': '设置主页:',
         'Set Title strategy:': '设置标题策略:',
+        'Prefetch workers': '预读取线程数',
+        'Set Prefetch workers:': '设置预读取线程数:',
+        'Set Cache directory:': '设置缓存目录:',
+        'Cache size': '缓存容量',
+        'Fragment cache disabled': '片段缓存已禁用',
+        'Fragment cache:': '片段缓存:',
+        'Fragment cache is not writable:': '片段缓存目录无法写入:',
+        'hits': '次命中',
+        'misses': '次未命中',
+        'evicted': '个被淘汰',
+        'Watching:': '正在监视:',
+        'Rebuilt in': '重新合并耗时',
+        'files reloaded': '个文件被重新读取',
+        'files changed': '个文件发生变化',
+        'Rebuild failed:': '重新合并失败:',
+        'Stop watching': '停止监视',
+        'Manifest': '清单',
+        'Manifest item': '清单项',
+        'Manifest workers': '批量模式进程数',
+        'Load manifest file:': '加载清单文件:',
+        'Job': '任务',
+        'failed:': '失败:',
+        'Batch summary:': '批量合并汇总:',
+        'succeeded': '个成功',
+        'failed': '个失败',
+        'Write report to:': '写入运行报告:',
+        'from fragment cache': '来自片段缓存',
+        'links removed': '个内链被去除',
+        'links kept': '个外链被保留',
+        'title serial numbers removed': '个标题编号被去除',
+        'Serial number out of range:': '标题编号超出范围:',
+        'level': '层级',
+        'Write profile to:': '写入性能分析数据:',
+        'Unresolved link:': '无法解析的内链:',
+        'Resolved links:': '解析的内链:',
+        'unresolved': '个无法解析',
+        'Mmap threshold': '内存映射阈值',
+        'Set Mmap threshold:': '设置内存映射阈值:',
+        'Sidebar cycle:': '侧边栏存在循环:',
+        'Duplicate sidebar:': '侧边栏重复:',
+        'Nested sidebars:': '子侧边栏:',
+        'cycles': '循环',
+        'duplicates': '重复',
+        'Repeated pages:': '重复的页面:',
+        'reused': '次复用',
+        'replaced with a reference': '次替换为引用',
+        'Output file is unchanged:': '输出文件没有变化:',
+        'Serve address': '服务地址',
+        'Set Serve address:': '设置服务地址:',
+        'Serving:': '服务地址:',
+        'Stop serving': '停止服务',
+        'requests coalesced': '个请求复用了同一次合并',
+        'Max pending chunks': '最大待处理块数',
+        'Chunk size': '块大小',
+        'Split size': '分章节大小',
+        'Processes': '进程数',
+        'Set Split size:': '设置分章节大小:',
+        'Write chapter file:': '写入章节文件:',
+        'Resolving links is not supported when splitting the output': '分章节输出时不支持解析内链',
+        'TOC depth': '目录层级',
+        'Set TOC depth:': '设置目录层级:',
+        'Include cycle:': '循环嵌入:',
+        'Include depth exceeded:': '嵌入的嵌套层数超过上限:',
+        'Include file not found:': '嵌入的文件不存在:',
+        'Inline assets': '内联图片大小',
+        'Set Assets folder:': '设置资源目录:',
+        'Image not found:': '图片不存在:',
+        'Images:': '图片:',
+        'copied': '个已复制',
+        'unchanged': '个没有变化',
+        'inlined': '个已内联',
+        'not found': '个不存在',
+        'Collecting images is not supported when splitting the output': '分章节输出时不支持收集图片',
+        'Collecting images is not supported in serve mode': '服务模式下不支持收集图片',
+        'Splitting the output is not supported in watch mode': '监视模式下不支持分章节输出',
         'The path of Docsify is not exists.': 'Docsify路径不存在',
         'The sidebar file is not exists': '侧边栏文件不存在',
         'Load markdown file:': '加载Markdown文件:',
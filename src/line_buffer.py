@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-27 16:30
+# Author  : Jiang Liu
+# Desc    : 紧凑的行缓冲：需要在内存中保存整个合并后的文档时（解析内链、添加目录、服务模式），
+#           所有行按 UTF-8 拼接在一个 bytearray 中，并用 array('Q') 记录每一行的结束位置，代替数百万个 str 对象的列表；
+#           之后的阶段按位置读取，被修改的行单独保存，其余的行保持不变
+import itertools
+from array import array
+from bisect import bisect_right
+
+
+class LineBuffer:
+    """
+    该类用于保存大量的文本行。不论有多少行，都只有两个大对象，垃圾回收不需要跟踪每一行，
+    占用的内存约为文本的 UTF-8 字节数加上每行 8 字节。修改一行时只记录修改后的内容，不移动其他行
+    """
+
+    def __init__(self, lines=()):
+        """
+        该函数用于初始化行缓冲
+        :param lines:   初始的行迭代器，元素可以是 str 或内存映射模式下的原始字节（bytes，可以包含多行，添加时按换行符拆分）
+        """
+        self.data = bytearray()
+        # 每一行在 data 中的结束位置，第 i 行为 data[ends[i - 1]:ends[i]]
+        self.ends = array('Q')
+        # 被修改的行：行号 -> 修改后的文本
+        self.edits = {}
+        # 添加在所有行之前的行，例如目录。不计入行号与长度，只在 lines 与 to_bytes 中输出
+        self.head = []
+        self.extend(lines)
+
+    def __len__(self):
+        return len(self.ends)
+
+    def append(self, line):
+        """
+        该函数用于在末尾添加一行
+        :param line:    行，str 或原始字节
+        """
+        self.extend((line,))
+
+    def extend(self, lines):
+        """
+        该函数用于在末尾添加多行
+        :param lines:   行迭代器
+        """
+        data = self.data
+        ends = self.ends
+        for line in lines:
+            if not isinstance(line, bytes):
+                data += line.encode('utf-8')
+                ends.append(len(data))
+                continue
+            # 原始字节可能包含多行，按换行符拆分，使每个行号对应一行
+            data += line
+            position = data.find(b'\n', len(data) - len(line))
+            while position != -1 and position + 1 < len(data):
+                ends.append(position + 1)
+                position = data.find(b'\n', position + 1)
+            if line:
+                ends.append(len(data))
+
+    def start(self, index):
+        """
+        该函数用于获取一行在 data 中的开始位置
+        :param index:   行号
+        :return:        开始位置
+        """
+        return self.ends[index - 1] if index > 0 else 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.ends)
+        line = self.edits.get(index)
+        if line is not None:
+            return line
+        if not 0 <= index < len(self.ends):
+            raise IndexError(index)
+        return self.data[self.start(index):self.ends[index]].decode('utf-8')
+
+    def __setitem__(self, index, line):
+        if index < 0:
+            index += len(self.ends)
+        if not 0 <= index < len(self.ends):
+            raise IndexError(index)
+        self.edits[index] = line
+
+    def __iter__(self):
+        data = self.data
+        edits = self.edits
+        start = 0
+        for index, end in enumerate(self.ends):
+            line = edits.get(index) if edits else None
+            yield data[start:end].decode('utf-8') if line is None else line
+            start = end
+
+    def lines(self):
+        """
+        该函数用于按顺序获取整个文档的行，包括开头的行
+        :return:    文本行的迭代器
+        """
+        return itertools.chain(self.head, self)
+
+    def find_lines(self, text):
+        """
+        该函数用于查找包含指定文本的行。直接在拼接后的字节中查找，只有包含该文本的行需要解码，
+        因此只修改少数几行的阶段（例如解析内链）不需要解码每一行
+        :param text:    要查找的文本，不能包含换行符
+        :return:        行号的列表，按从小到大的顺序，被修改的行按修改后的内容判断
+        """
+        pattern = text.encode('utf-8')
+        ends = self.ends
+        edits = self.edits
+        found = [index for index, line in edits.items() if text in line]
+        position = self.data.find(pattern)
+        while position != -1:
+            index = bisect_right(ends, position)
+            if index not in edits:
+                found.append(index)
+            # 同一行中的其他匹配不需要再次查找
+            position = self.data.find(pattern, ends[index])
+        return sorted(found) if edits else found
+
+    def to_bytes(self):
+        """
+        该函数用于获取整个文档的 UTF-8 字节，没有被修改的部分直接复制，不需要解码
+        :return:    文档的字节
+        """
+        head = ''.join(self.head).encode('utf-8')
+        if not self.edits:
+            return head + self.data
+        parts = [head]
+        position = 0
+        for index in sorted(self.edits):
+            parts.append(self.data[position:self.start(index)])
+            parts.append(self.edits[index].encode('utf-8'))
+            position = self.ends[index]
+        parts.append(self.data[position:])
+        return b''.join(parts)
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-20 14:18
+# Author  : Jiang Liu
+# Desc    : 链接扫描器：手写的单遍扫描器，用于代替对整个文件执行的 DOTALL 正则，
+#           逐段落处理，跳过代码块与行内代码，耗时与输入长度成线性关系
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+_QUOTES = '"\''
+# 以下正则只包含单个字符类，不会回溯，仅用于以 C 的速度跳过普通字符
+_DESCRIPTION_SPECIAL = re.compile(r'[\\\[\]`]')
+_WHITESPACE = re.compile(r'\s*')
+_URL = re.compile(r'[^\s)]*')
+# 常见的简单链接：描述中没有特殊字符，链接中没有 "["，标题中没有引号与换行。各部分之间没有歧义，不会回溯；
+# 匹配失败时再由完整的扫描处理
+_SIMPLE_LINK = re.compile(r'\[([^\\\[\]`]*)\]\(\s*([^\s)\[]+)(?:\s+["\']([^"\'\n]*)["\'])?\s*\)')
+# 引号之后的空白只属于该引号，因此每个字符最多被检查两次
+_TITLE_CLOSE = re.compile(r'["\']\s*\)')
+
+
+def find_code_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    该函数用于查找行内代码的范围：由 n 个反引号开始，到下一个恰好 n 个反引号结束，没有结束的反引号按普通字符处理
+    :param text:    文本
+    :return:        行内代码的范围列表 [(开始位置, 结束位置)]，结束位置不包含在范围内
+    """
+    if '`' not in text:
+        return []
+    runs = []
+    i = text.find('`')
+    while i != -1:
+        j = i
+        while j < len(text) and text[j] == '`':
+            j += 1
+        runs.append((i, j - i))
+        i = text.find('`', j)
+    # 按长度分组，每组只向前移动，因此总耗时与反引号的数量成线性关系
+    by_length = {}
+    for index, (_, length) in enumerate(runs):
+        by_length.setdefault(length, []).append(index)
+    cursors = {length: 0 for length in by_length}
+    spans = []
+    index = 0
+    while index < len(runs):
+        start, length = runs[index]
+        candidates = by_length[length]
+        cursor = cursors[length]
+        while cursor < len(candidates) and candidates[cursor] <= index:
+            cursor += 1
+        cursors[length] = cursor
+        if cursor == len(candidates):
+            index += 1
+            continue
+        close = candidates[cursor]
+        spans.append((start, runs[close][0] + length))
+        index = close + 1
+    return spans
+
+
+def _find_title_close(text, start, cache):
+    """
+    该函数用于查找 start 之后第一个后面紧跟（可选的空白与）")" 的引号。
+    对于 [开始查找的位置, 结果] 之后、结果之前的位置，结果与缓存的相同，无需再次扫描
+    :param text:    文本
+    :param start:   开始查找的位置
+    :param cache:   缓存 [开始查找的位置, 结果]
+    :return:        (引号的位置, ")" 的位置)，找不到时返回 None
+    """
+    if cache[0] <= start and (cache[1] is None or start <= cache[1][0]):
+        return cache[1]
+    match = _TITLE_CLOSE.search(text, start)
+    found = (match.start(), match.end() - 1) if match else None
+    cache[0], cache[1] = start, found
+    return found
+
+
+def scan_links(text: str) -> List[Tuple[int, int, str, Optional[str], Optional[str]]]:
+    """
+    该函数用于查找文本中的所有链接 [description](url "title")，语义与原先的正则
+    \\[(?P<description>...)\\]\\(\\s*(?P<url>[^\\s\\)]+)?(?:\\s+["'](?P<title>.*?)["'])?\\s*\\) 一致，区别在于：
+    行内代码中的内容不会被当作链接，被反斜杠转义的 "[" 不会作为链接的开始。
+    每个字符最多被检查常数次，因此耗时与文本长度成线性关系，不会出现回溯
+    :param text:    文本
+    :return:        链接列表 [(开始位置, 结束位置, 描述, 链接, 标题)]
+    """
+    if '[' not in text:
+        return []
+    n = len(text)
+    spans = find_code_spans(text)
+    span_ends = {start: end for start, end in spans} if spans else {}
+    span_index = 0
+    links = []
+    # 缓存标题结束位置的查找结果 [开始查找的位置, (引号的位置, ")" 的位置)]，保证多次查找不会重复扫描同一段文本
+    title_cache = [n + 1, None]
+    # 缓存链接的范围：链接中可以包含 "["，之后从链接中间开始的链接，其结束位置与之相同
+    url_from, url_to, url_ws_to = n + 1, n + 1, n + 1
+
+    i = text.find('[')
+    while i != -1:
+        # 跳过行内代码中的 "["
+        while span_index < len(spans) and spans[span_index][1] <= i:
+            span_index += 1
+        if span_index < len(spans) and spans[span_index][0] <= i:
+            i = text.find('[', spans[span_index][1])
+            continue
+        # 跳过被转义的 "["
+        backslashes = 0
+        while i - backslashes - 1 >= 0 and text[i - backslashes - 1] == '\\':
+            backslashes += 1
+        if backslashes % 2 == 1:
+            i = text.find('[', i + 1)
+            continue
+
+        match = _SIMPLE_LINK.match(text, i)
+        if match is not None:
+            links.append((i, match.end(), match.group(1), match.group(2), match.group(3)))
+            i = text.find('[', match.end())
+            continue
+
+        # 解析描述，直到未转义的 "]"
+        k = i + 1
+        next_start = -1
+        while True:
+            match = _DESCRIPTION_SPECIAL.search(text, k)
+            if match is None:
+                k = n
+                break
+            k = match.start()
+            c = text[k]
+            if c == '\\':
+                k += 2
+            elif c == '`':
+                k = span_ends.get(k, k + 1)
+            elif c == '[':
+                next_start = k
+                break
+            else:
+                break
+        if next_start != -1:
+            i = next_start
+            continue
+        if k + 1 >= n:
+            break
+        description_end = k
+        if text[k + 1] != '(':
+            i = text.find('[', k + 1)
+            continue
+
+        # 解析链接与标题
+        a = k + 2
+        b = _WHITESPACE.match(text, a).end()
+        if not url_from <= b <= url_to:
+            url_from = b
+            url_to = _URL.match(text, b).end()
+            url_ws_to = _WHITESPACE.match(text, url_to).end()
+        c, d = url_to, url_ws_to
+        if d >= n:
+            break
+        url = text[b:c] if c > b else None
+        title = None
+        end = -1
+        if text[d] == ')':
+            end = d + 1
+        elif text[d] in _QUOTES and (d > c or (c == b and b > a)):
+            close = _find_title_close(text, d + 1, title_cache)
+            if close is not None:
+                title = text[d + 1:close[0]]
+                end = close[1] + 1
+        # 与正则的回溯一致：链接以引号开头时，也可以没有链接，而把引号作为标题的开始
+        if end == -1 and b > a and text[b] in _QUOTES:
+            close = _find_title_close(text, b + 1, title_cache)
+            if close is not None:
+                url = None
+                title = text[b + 1:close[0]]
+                end = close[1] + 1
+        if end == -1:
+            i = text.find('[', i + 1)
+            continue
+        links.append((i, end, text[i + 1:description_end], url, title))
+        i = text.find('[', end)
+    return links
+
+
+def replace_links(text: str, replacer: Callable[[str, Optional[str], Optional[str], str], str],
+                  links: Optional[List[Tuple[int, int, str, Optional[str], Optional[str]]]] = None) -> str:
+    """
+    该函数用于替换文本中的所有链接
+    :param text:        文本
+    :param replacer:    替换函数，参数为 (描述, 链接, 标题, 原始文本)，返回替换后的文本
+    :param links:       scan_links 的结果，为 None 时重新查找
+    :return:            替换后的文本，没有链接时返回原对象
+    """
+    if links is None:
+        links = scan_links(text)
+    if not links:
+        return text
+    result = []
+    last = 0
+    for start, end, description, url, title in links:
+        result.append(text[last:start])
+        result.append(replacer(description, url, title, text[start:end]))
+        last = end
+    result.append(text[last:])
+    return ''.join(result)
+
+
+def remove_links(items: Iterable[Tuple[str, bool, object]],
+                 replacer: Callable[[str, Optional[str], Optional[str], str], str]) -> Iterator[Tuple[str, object]]:
+    """
+    该函数用于逐块替换链接：连续的需要扫描的行组成一块（即一个段落），链接不会跨越空行、标题与代码块，
+    因此每一块只需扫描一次，跨越多行的链接也能被正确处理
+    :param items:       (行, 是否需要扫描, 附带的对象) 的迭代器，空行、标题与代码块中的行不需要扫描
+    :param replacer:    替换函数，参数为 (描述, 链接, 标题, 原始文本)
+    :return:            (行, 附带的对象) 的迭代器（生成器）。链接跨越多行导致行数变化时，重新拆分的行附带的对象为 None
+    """
+    block = []
+    for line, scannable, obj in items:
+        if scannable:
+            block.append((line, obj))
+            continue
+        if block:
+            yield from replace_block_links(block, replacer)
+            block = []
+        yield line, obj
+    if block:
+        yield from replace_block_links(block, replacer)
+
+
+def replace_block_links(block: List[Tuple[str, object]],
+                        replacer: Callable[[str, Optional[str], Optional[str], str], str]) -> List[Tuple[str, object]]:
+    """
+    该函数用于替换一块中的所有链接
+    :param block:       (行, 附带的对象) 的列表
+    :param replacer:    替换函数，参数为 (描述, 链接, 标题, 原始文本)
+    :return:            (行, 附带的对象) 的列表
+    """
+    if len(block) == 1:
+        line, obj = block[0]
+        return [(replace_links(line, replacer), obj)]
+    text = ''.join([line for line, _ in block])
+    links = scan_links(text)
+    if not links:
+        return block
+    lines = replace_links(text, replacer, links).splitlines(keepends=True)
+    # 替换只会去除链接与标题中的换行，行数不变时每一行与原来的行一一对应
+    if len(lines) == len(block):
+        return [(line, obj) for line, (_, obj) in zip(lines, block)]
+    return [(line, None) for line in lines]
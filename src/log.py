@@ -18,9 +18,33 @@ def init_logging(ini_file_path):
     logger = logging.getLogger()
 
 
+def set_logger(new_logger):
+    """
+    设置日志对象，用于在进程内调用时使用调用方的日志配置
+    """
+    global logger
+    logger = new_logger
+
+
+def use_default_logger():
+    """
+    尚未初始化日志时，使用名为 "docsify_merger" 的日志对象，不配置日志的输出，由调用方通过 logging 模块决定
+    """
+    global logger
+    if logger is None:
+        logger = logging.getLogger('docsify_merger')
+
+
 def get_logger():
     """
     获取日志对象
     """
     global logger
     return logger
+
+
+def is_debug_enabled():
+    """
+    判断是否需要输出逐项（每个链接、每个标题）的调试日志，未启用时调用方应跳过日志消息的格式化与翻译
+    """
+    return logger is not None and logger.isEnabledFor(logging.DEBUG)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-22 09:36
+# Author  : Jiang Liu
+# Desc    : 内存映射模式：对很大的Markdown文件，只在字节层面查找需要处理的段落，其余的字节不解码、直接复制到输出文件
+import mmap
+import os
+import re
+
+# 直接复制的原始字节按行切分为不超过该大小的块，以免一次性复制整个文件
+RAW_CHUNK_SIZE = 64 * 1024
+# 连续的若干段作为一组去除内链与标题编号，以减少逐段调用的开销，每组的原始字节与段落的总大小约为该值
+GROUP_SIZE = 1024 * 1024
+
+# 需要处理的行：行首为空白（包括 str.isspace 认为是空白的非 ASCII 字符）、"#" 或 "`"。
+# 这些行可能是标题、代码块的开始或结束、单行代码块，或者需要去除行首空白，其余的行在各个阶段中都保持不变。
+# 正则以字面量 "\n" 开头，查找时可以快速跳过不相关的字节
+_RELEVANT_LINE = re.compile(rb'\n(?:[\t\x0b\x0c\x1c-\x1f #`]|\xc2[\x85\xa0]|\xe1\x9a\x80|'
+                            rb'\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)')
+
+
+def map_markdown_file(path):
+    """
+    该函数用于以只读方式将Markdown文件映射到内存
+    :param path:    Markdown文件的路径
+    :return:        内存映射对象（mmap），文件为空时无法映射，返回 None
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        # 映射建立后即可关闭文件，映射本身保持有效
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def is_mapped(data):
+    """
+    该函数用于判断Markdown文件的原始内容是否为内存映射对象
+    :param data:    Markdown文件的原始内容
+    :return:        是否为内存映射对象
+    """
+    return isinstance(data, mmap.mmap)
+
+
+def iter_mapped_ranges(data):
+    """
+    该函数用于将文件划分为需要处理的范围与直接复制的范围。
+    链接可以跨越多行，行内代码也会影响链接的识别，因此需要处理的单位是以空行分隔的整个段落：
+    包含 "[" 或需要处理的行的段落都需要处理，第一个段落与最后一行（需要补充换行）也总是需要处理。
+    段落由 bytes.find/rfind 查找，每个字节只被检查常数次
+    :param data:    Markdown文件的原始内容（bytes 或 mmap），不能包含 "\\r"
+    :return:        (开始位置, 结束位置, 是否需要处理) 的迭代器（生成器），按顺序覆盖整个文件。
+                    需要处理的范围是完整的段落，直接复制的范围按行切分为不超过 RAW_CHUNK_SIZE 的块
+    """
+    size = len(data)
+    # 最后一行的开始位置
+    last_start = data.rfind(b'\n', 0, size - 1) + 1
+    position = 0
+    line_match = _RELEVANT_LINE.search(data)
+    bracket = data.find(b'[')
+    candidate = 0
+    while candidate is not None:
+        # 向前找到段落的开始：上一个空行之后，但不早于已经产出的位置
+        found = data.rfind(b'\n\n', max(position - 1, 0), candidate)
+        start = found + 2 if found != -1 else position
+        # 向后找到段落的结束：下一个空行之前
+        found = data.find(b'\n\n', candidate)
+        end = found + 1 if found != -1 else size
+        # 段落包含或紧邻最后一行时，一直处理到文件末尾
+        if end >= last_start:
+            end = size
+        if start > position:
+            yield from iter_raw_chunks(data, position, start)
+        yield start, end, True
+        position = end
+        if position >= size:
+            return
+        # 下一个需要处理的行或 "["
+        if line_match is not None and line_match.start() + 1 < position:
+            line_match = _RELEVANT_LINE.search(data, position - 1)
+        if bracket != -1 and bracket < position:
+            bracket = data.find(b'[', position)
+        candidate = None
+        if line_match is not None:
+            candidate = line_match.start() + 1
+        if bracket != -1 and (candidate is None or bracket < candidate):
+            candidate = bracket
+    if last_start > position:
+        yield from iter_raw_chunks(data, position, last_start)
+        position = last_start
+    yield position, size, True
+
+
+def iter_raw_chunks(data, start, end):
+    """
+    该函数用于将直接复制的范围按行切分为不超过 RAW_CHUNK_SIZE 的块（单行超过该大小时，该行单独成为一块）
+    :param data:    Markdown文件的原始内容
+    :param start:   范围的开始位置
+    :param end:     范围的结束位置，该位置之前的字节为换行符
+    :return:        (开始位置, 结束位置, False) 的迭代器（生成器）
+    """
+    while start < end:
+        stop = start + RAW_CHUNK_SIZE
+        if stop >= end:
+            stop = end
+        else:
+            cut = data.rfind(b'\n', start, stop)
+            stop = cut + 1 if cut != -1 else data.find(b'\n', stop, end) + 1
+        yield start, stop, False
+        start = stop
+
+
+def split_lines(text):
+    """
+    该函数用于按 "\\n" 将文本拆分为行，与以文本方式读取不包含 "\\r" 的文件时 readlines 的结果一致
+    （str.splitlines 还会在 "\\x0c"、"\\u2028" 等字符处拆分，因此不能使用）
+    :param text:    文本
+    :return:        行列表
+    """
+    lines = text.split('\n')
+    last = lines.pop()
+    lines = [line + '\n' for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+class RawLineWriter:
+    """
+    该类用于包装以文本方式打开的输出文件，使 writelines 既可以写入文本行，也可以写入内存映射模式下直接复制的原始字节
+    """
+
+    def __init__(self, file, linesep=os.linesep):
+        """
+        该函数用于初始化输出文件的包装
+        :param file:        以文本方式、UTF-8 编码打开的输出文件
+        :param linesep:     文本方式写入时 "\\n" 被转换成的换行符，原始字节同样需要转换
+        """
+        self.file = file
+        self.linesep = None if linesep == '\n' else linesep.encode('utf-8')
+
+    def writelines(self, lines):
+        """
+        该函数用于写入行：文本行被合并后一次编码，与原始字节一起直接写入底层的二进制缓冲
+        :param lines:   行的迭代器，每一行为 str 或 bytes
+        """
+        # 先刷新之前以文本方式写入的内容，保证写入的顺序
+        self.file.flush()
+        buffer = self.file.buffer
+        text = []
+        for line in lines:
+            if type(line) is str:
+                text.append(line)
+                continue
+            if text:
+                buffer.write(self.encode(text))
+                text = []
+            buffer.write(line if self.linesep is None else line.replace(b'\n', self.linesep))
+        if text:
+            buffer.write(self.encode(text))
+
+    def encode(self, text):
+        """
+        该函数用于将文本行编码为 UTF-8，并与以文本方式写入时一样转换换行符
+        :param text:    文本行列表
+        :return:        编码后的字节
+        """
+        data = ''.join(text).encode('utf-8')
+        return data if self.linesep is None else data.replace(b'\n', self.linesep)
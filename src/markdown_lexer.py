@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-12 10:37
+# Author  : Jiang Liu
+# Desc    : Markdown 行分类器：每一行只分类一次，供标题平移、序号移除与重新编号共用
+from enum import Enum, unique
+from typing import Iterable, Iterator
+
+
+@unique
+class LineKind(Enum):
+    """
+    该枚举类型用于表示Markdown行的类别
+    """
+    BLANK = 'blank'                   # 空行
+    INDENTED_CODE = 'indented_code'   # 前面有4个及以上空格的单行代码块
+    FENCE = 'fence'                   # "```" 代码块的开始或结束
+    FENCED_CODE = 'fenced_code'       # "```" 代码块内部的行
+    HEADING = 'heading'               # 标题
+    TEXT = 'text'                     # 其他普通行
+    RAW = 'raw'                       # 内存映射模式下不经处理、直接复制到输出的原始字节（line 为 bytes）
+    INCLUDE = 'include'               # 单独成行的 Docsify 嵌入 [label](path ':include')，由 recursion_parse 展开
+
+
+class LineToken:
+    """
+    该类用于表示一行分类后的Markdown文本
+    """
+    __slots__ = ('kind', 'line', 'indent', 'level', 'text', 'anchor')
+
+    def __init__(self, kind, line, indent=0, level=0, text='', anchor=None):
+        """
+        该函数用于初始化一行分类后的Markdown文本
+        :param kind:    行的类别，为 LineKind 的枚举类型
+        :param line:    该行输出时的文本（除空行与单行代码块外，均已去除行首空白）
+        :param indent:  该行行首空白的长度
+        :param level:   标题的层级（即井号的个数），仅对标题有效
+        :param text:    标题井号之后的内容（包括换行符），仅对标题有效；对嵌入为嵌入文件的路径
+        :param anchor:  标题的来源 (源文件的键, 原标题的 Docsify 锚点)，仅在需要解析内链时对标题有效；
+                        对嵌入为 (嵌入方式, 代码的语言, 代码片段的名称)
+        """
+        self.kind = kind
+        self.line = line
+        self.indent = indent
+        self.level = level
+        self.text = text
+        self.anchor = anchor
+
+
+def tokenize(lines: Iterable[str], shift: int = 0, in_code_block: bool = False) -> Iterator[LineToken]:
+    """
+    该函数用于对Markdown文件的每一行进行分类，代码块的状态只在这里维护一次
+    :param lines:           Markdown文件的行迭代器
+    :param shift:           标题需要下移的层级，用于将相对标题转换为绝对标题
+    :param in_code_block:   第一行是否位于代码块中，用于分段处理同一个文件
+    :return:                分类后的行迭代器（生成器）
+    """
+    for line in lines:
+        stripped = line.lstrip()
+        # 跳过空行
+        if not stripped:
+            yield LineToken(LineKind.BLANK, line)
+            continue
+        # 如果有4个及以上的空格，那么就是单行代码块
+        indent = len(line) - len(stripped)
+        if indent >= 4:
+            yield LineToken(LineKind.INDENTED_CODE, line, indent)
+            continue
+        # 如果是"```"，就是代码块的开始或结束
+        if stripped.startswith('```'):
+            in_code_block = not in_code_block
+            yield LineToken(LineKind.FENCE, stripped, indent)
+            continue
+        if in_code_block:
+            yield LineToken(LineKind.FENCED_CODE, stripped, indent)
+            continue
+        if stripped.startswith('#'):
+            text = stripped.lstrip('#')
+            level = len(stripped) - len(text) + shift
+            yield LineToken(LineKind.HEADING, '#' * level + text, indent, level, text)
+            continue
+        yield LineToken(LineKind.TEXT, stripped, indent)
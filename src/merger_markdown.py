@@ -3,135 +3,768 @@
 # Author  : Jiang Liu
 # Desc    : 实现对 Docsify 的侧边栏文件涉及到的所有Markdown文件的合并
 
+import logging
 import os
-import re
+import time
+from collections import Counter
+from urllib.parse import unquote
 
+from src.anchor_index import docsify_slugify, make_link_marker, page_key, unique_slug
+from src.asset_collector import ASSET_START, mark_images
 from src.i18n import translate as t
-from src.log import get_logger
-from src.sidebar_resolver import parse_sidebar
+from src.link_scanner import remove_links, replace_links, scan_links
+from src.log import get_logger, is_debug_enabled
+from src.mapped_markdown import GROUP_SIZE, is_mapped, iter_mapped_ranges, split_lines
+from src.markdown_lexer import LineKind, LineToken, tokenize
+from src.prefetch import iter_markdown_files, prefetch_markdown_files, read_markdown_source, resolve_markdown_path
+from src.prefetch import decode_markdown, iter_sidebar_pages, read_markdown_bytes
+from src.renumber_title import TitleTransformer
+from src.report import get_report
+from src.sidebar_resolver import load_nested_sidebars, parse_sidebar
 
+# 需要处理链接的行：连续的这些行组成一个段落，跨越多行的链接只在段落内处理（标题单独处理）
+TEXT_KINDS = (LineKind.TEXT, LineKind.INDENTED_CODE)
+# 嵌入的最大嵌套深度，超过时视为失控的嵌套而不再展开
+MAX_INCLUDE_DEPTH = 8
+# Docsify 按 Markdown 嵌入的文件扩展名；以 iframe、音频或视频嵌入的文件无法合并到文档中，与不展开嵌入时的处理方式一致
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+MEDIA_EXTENSIONS = ('.html', '.htm', '.mp3', '.mp4', '.ogg')
 
-def merge(docsify_root_path, homepage):
+
+class FragmentBuilder:
+    """
+    该类用于完成单个Markdown文件的处理：去除内部链接、将相对标题转换为绝对标题、去除标题编号。
+    处理结果（片段）只与文件内容、所在层级以及处理配置有关，因此可以被片段缓存复用，
+    只有全局的重新编号需要在每次运行时重新执行
+    """
+
+    def __init__(self, serial_number_matcher=None, cache=None, memo=None, resolve_links=False, mmap_threshold=None,
+                 repeats=None, dedupe_pages=False, expand_includes=False, assets=None):
+        """
+        该函数用于初始化片段构建器
+        :param serial_number_matcher:   标题编号匹配器，为 None 时使用默认的标题编号正则表达式列表
+        :param cache:                   片段缓存（FragmentCache），为 None 时不使用缓存
+        :param memo:                    内存中的片段字典，键为 (文件路径, 层级)，为 None 时不在内存中保留片段。
+                                        同一个字典可以跨多次合并复用，例如监视模式下只需使修改过的文件失效
+        :param resolve_links:           是否将内链替换为占位标记并记录标题的原锚点，以便最后解析为文档内的锚点
+        :param mmap_threshold:          使用内存映射的最小文件大小（字节），为 None 时不使用内存映射。
+                                        被映射的文件由 build_mapped 处理，不经过片段缓存与 memo
+        :param repeats:                 每个 (文件路径, 层级) 在侧边栏中出现的次数。如果提供，则 memo 只保留还会再次出现的片段，
+                                        并在最后一次出现后释放；为 None 时 memo 保留所有片段
+        :param dedupe_pages:            是否只在页面第一次出现时输出其内容，之后的出现只输出一行引用
+        :param expand_includes:         是否将单独成行的 Docsify 嵌入 [label](path ':include') 替换为嵌入文件的内容
+        :param assets:                  图片收集器（AssetCollector），如果提供，则正文中的本地图片被保留并复制到资源目录；
+                                        为 None 时图片与其他内链一样只保留描述
+        """
+        self.title_transformer = TitleTransformer(serial_number_matcher=serial_number_matcher, renumber=False)
+        self.cache = cache
+        self.memo = memo
+        self.resolve_links = resolve_links
+        self.mmap_threshold = mmap_threshold
+        self.repeats = repeats
+        self.dedupe_pages = dedupe_pages
+        self.expand_includes = expand_includes
+        self.assets = assets
+        # 本次合并中已经处理过的嵌入文件：(文件路径, 嵌入方式, 代码的语言, 代码片段的名称) -> 片段，
+        # 由 merge_tree 在每次合并开始时清空，因此每个嵌入文件在一次合并中只读取并处理一次，不论被嵌入多少次。
+        # Markdown 文件按一级标题处理，嵌入时再下移标题
+        self.includes = {}
+        # 本次合并中已经输出过的页面，以及复用 memo 与输出引用的次数，由 merge_tree 在每次合并开始时重置
+        self.emitted = set()
+        self.duplicate_hits = 0
+        self.duplicates_skipped = 0
+        # 最近一次处理的文件的统计：(去除的内链数, 保留的外链数, 去除的标题编号数)，以及是否复用了片段缓存
+        self.summary = None
+        self.cached = False
+
+    def remove_title_serial(self, tokens, page=None, counts=None):
+        """
+        该函数用于去除片段中所有标题的编号
+        :param tokens:  分类后的行列表
+        :param page:    源文件的键，如果提供，则在去除编号之前按 Docsify 的规则记录每个标题的原锚点
+        :param counts:  源文件中已经出现过的原锚点及其次数，分段处理同一个文件时传入同一个字典
+        :return:        去除标题编号后的行列表
+        """
+        if counts is None:
+            counts = {}
+        for token in tokens:
+            if token.kind is LineKind.HEADING:
+                if page is not None:
+                    token.anchor = (page, unique_slug(docsify_slugify(token.text), counts))
+                self.title_transformer.remove_title_serial(token)
+        return tokens
+
+    def build_heading(self, level, name, blank_line=False):
+        """
+        该函数用于根据侧边栏中的目录名称生成标题
+        :param level:       标题的层级
+        :param name:        标题的名称
+        :param blank_line:  是否在标题后添加一个空行
+        :return:            分类后的行列表
+        """
+        lines = [f"{'#' * level} {name}\n", "\n"] if blank_line else [f"{'#' * level} {name}\n"]
+        return self.remove_title_serial(list(tokenize(lines)))
+
+    def build_reference(self, name, page=None):
+        """
+        该函数用于生成重复页面的引用：页面只在第一次出现时输出，之后的出现只输出一行引用
+        :param name:    侧边栏中的名称，为 None 时（例如侧边栏中的空行）不输出引用
+        :param page:    源文件的键，如果提供，则引用为内链的占位标记，最后被解析为该页面第一次出现时的锚点
+        :return:        分类后的行列表
+        """
+        if not name:
+            return []
+        text = name if page is None else make_link_marker(page, f"/{page}", name)
+        return list(tokenize([f"> {text}\n"]))
+
+    def retain(self, key):
+        """
+        该函数用于记录一次片段的使用，并判断片段是否需要继续保留在 memo 中
+        :param key:     (文件路径, 层级)
+        :return:        之后是否还会再次使用该片段
+        """
+        if self.repeats is None:
+            return True
+        remaining = self.repeats.get(key, 1) - 1
+        if remaining <= 0:
+            self.repeats.pop(key, None)
+            return False
+        self.repeats[key] = remaining
+        return True
+
+    def build(self, data, level, page=None):
+        """
+        该函数用于处理一个Markdown文件，如果片段缓存中存在相同的片段，则直接复用
+        :param data:    Markdown文件的原始内容
+        :param level:   Markdown文件在侧边栏中的层级
+        :param page:    源文件的键，只在解析内链时需要
+        :return:        分类后的行列表
+        """
+        report = get_report()
+        cache = self.cache
+        if not self.resolve_links:
+            page = None
+        if cache is not None:
+            with report.stage('fragment_cache'):
+                key = cache.key(data, level, page)
+                entry = cache.get(key)
+            if entry is not None:
+                tokens, self.summary = entry
+                self.cached = True
+                # 复用片段时不再去除内链与标题编号，统计按缓存中记录的结果计入
+                report.count('links_stripped', self.summary[0])
+                report.count('links_kept', self.summary[1])
+                self.title_transformer.removed += self.summary[2]
+                return tokens
+        with report.stage('decode'):
+            lines = decode_markdown(data)
+        with report.stage('tokenize'):
+            # 在最后添加一个空行，以免和下一个文件的内容连在一起
+            tokens = list(tokenize(terminate_lines(lines), shift=level - 1))
+        links = [0, 0]
+        if self.expand_includes:
+            tokens = mark_includes(tokens)
+        if self.assets is not None:
+            tokens = mark_images(tokens)
+        with report.stage('remove_internal_link'):
+            tokens = remove_internal_link_tokens(tokens, links, shift=level - 1, page=page)
+        removed = self.title_transformer.removed
+        with report.stage('transform'):
+            tokens = self.remove_title_serial(tokens, page)
+        self.summary = (links[0], links[1], self.title_transformer.removed - removed)
+        self.cached = False
+        if cache is not None:
+            with report.stage('fragment_cache'):
+                cache.put(key, tokens, self.summary)
+        return tokens
+
+    def build_mapped(self, data, level, page=None):
+        """
+        该函数用于处理一个映射到内存的Markdown文件：只有 iter_mapped_ranges 找到的段落被解码并分类，
+        其余的字节作为 LineKind.RAW 直接复制到输出。连续的若干段（约 GROUP_SIZE 字节）为一组，
+        每组只去除一次内链与标题编号，RAW 行不会被扫描，同时作为段落的分隔。
+        代码块的状态、标题原锚点的计数与统计结果在各组之间延续，因此结果与 build 完全一致。处理结束后关闭内存映射
+        :param data:    内存映射对象（mmap）
+        :param level:   Markdown文件在侧边栏中的层级
+        :param page:    源文件的键，只在解析内链时需要
+        :return:        分类后的行迭代器（生成器）
+        """
+        report = get_report()
+        if not self.resolve_links:
+            page = None
+        try:
+            # 通用换行模式会将 "\r" 与 "\r\n" 转换为 "\n"，原始字节无法直接复制，因此按原来的方式处理
+            if data.find(b'\r') != -1:
+                yield from self.build(data[:], level, page)
+                return
+            shift = level - 1
+            links = [0, 0]
+            removed = self.title_transformer.removed
+            counts = {}
+            in_code_block = False
+            ranges = []
+            grouped = 0
+            copied = 0
+            size = len(data)
+            for start, end, relevant in iter_mapped_ranges(data):
+                ranges.append((start, end, relevant))
+                grouped += end - start
+                if not relevant:
+                    copied += end - start
+                if grouped < GROUP_SIZE and end < size:
+                    continue
+                group_in_code_block = in_code_block
+                tokens, in_code_block = tokenize_mapped_ranges(data, ranges, shift, in_code_block)
+                if self.expand_includes:
+                    tokens = mark_includes(tokens)
+                if self.assets is not None:
+                    tokens = mark_images(tokens)
+                with report.stage('remove_internal_link'):
+                    tokens = remove_internal_link_tokens(tokens, links, shift, page, group_in_code_block)
+                with report.stage('transform'):
+                    tokens = self.remove_title_serial(tokens, page, counts)
+                yield from tokens
+                ranges = []
+                grouped = 0
+            report.count('bytes_copied', copied)
+            self.summary = (links[0], links[1], self.title_transformer.removed - removed)
+            self.cached = False
+        finally:
+            data.close()
+
+    def expand(self, docsify_root_path, tokens, path, level):
+        """
+        该函数用于完成侧边栏中的页面的片段中与源文件的位置有关的处理：定位图片、展开嵌入
+        :param docsify_root_path:   Docsify的根目录
+        :param tokens:              片段
+        :param path:                页面的源文件路径
+        :param level:               页面在侧边栏中的层级
+        :return:                    分类后的行迭代器，不收集图片且不展开嵌入时直接返回片段
+        """
+        if self.assets is not None:
+            tokens = self.assets.locate(tokens, path)
+        if not self.expand_includes:
+            return tokens
+        return self.iter_expanded(docsify_root_path, tokens, path, level)
+
+    def iter_expanded(self, docsify_root_path, tokens, path, level, chain=()):
+        """
+        该函数用于展开片段中的嵌入。嵌入文件中的标题下移到嵌入所在的章节之下：
+        嵌入之前最近的标题为 n 级时，嵌入文件中的一级标题成为 n + 1 级标题；之前没有标题时，与该文件自身的标题一样下移
+        :param docsify_root_path:   Docsify的根目录，以 "/" 开头的嵌入路径相对于该目录
+        :param tokens:              分类后的行迭代器，其中的嵌入为 LineKind.INCLUDE
+        :param path:                片段的源文件路径，其他嵌入路径相对于该文件所在的目录
+        :param level:               片段的层级，即片段中一级标题的层级
+        :param chain:               嵌入了该片段的文件路径，从侧边栏中的页面开始，用于检测循环嵌入
+        :return:                    展开嵌入后的分类行迭代器（生成器）
+        """
+        chain = chain + (path,)
+        section_level = level - 1
+        for token in tokens:
+            if token.kind is LineKind.HEADING:
+                section_level = token.level
+            elif token.kind is LineKind.INCLUDE:
+                yield from self.expand_include(docsify_root_path, token, path, section_level, chain)
+                continue
+            yield token
+
+    def expand_include(self, docsify_root_path, token, path, shift, chain):
+        """
+        该函数用于展开一个嵌入，无法展开时只输出嵌入的描述，与不展开嵌入时一致
+        :param docsify_root_path:   Docsify的根目录
+        :param token:               嵌入（LineKind.INCLUDE）
+        :param path:                嵌入所在的文件路径
+        :param shift:               嵌入文件中的标题需要下移的层级
+        :param chain:               嵌入链，最后一项为 path
+        :return:                    嵌入文件的分类行迭代器（生成器）
+        """
+        logger = get_logger()
+        include_type, language, fragment = token.anchor
+        url = unquote(token.text.split('?')[0].split('#')[0])
+        if url.startswith('/'):
+            target = os.path.normpath(os.path.join(docsify_root_path, url.lstrip('/')))
+        else:
+            target = os.path.normpath(os.path.join(os.path.dirname(path), url))
+        if target in chain:
+            logger.warning(f"{t('Include cycle:')} {' -> '.join(chain + (target,))}")
+            yield LineToken(LineKind.TEXT, token.line)
+            return
+        if len(chain) > MAX_INCLUDE_DEPTH:
+            logger.warning(f"{t('Include depth exceeded:')} {' -> '.join(chain + (target,))}")
+            yield LineToken(LineKind.TEXT, token.line)
+            return
+        key = (target, include_type, language, fragment) if include_type == 'code' else (target, include_type)
+        tokens = self.includes.get(key)
+        if tokens is None:
+            report = get_report()
+            try:
+                with report.stage('read'):
+                    data = read_markdown_bytes(target)
+            except OSError:
+                logger.warning(f"{t('Include file not found:')} {target} ({path})")
+                yield LineToken(LineKind.TEXT, token.line)
+                return
+            report.count('include_files_read')
+            if include_type == 'code':
+                tokens = build_code_block(decode_markdown(data), language, fragment)
+            else:
+                page = page_key(docsify_root_path, target) if self.resolve_links else None
+                tokens = self.build(strip_front_matter(data), 1, page)
+            self.includes[key] = tokens
+        get_report().count('includes_expanded')
+        if include_type == 'code':
+            yield from tokens
+            return
+        tokens = shift_headings(tokens, shift)
+        if self.assets is not None:
+            # 嵌入文件中的图片相对于嵌入文件所在的目录
+            tokens = self.assets.locate(tokens, target)
+        yield from self.iter_expanded(docsify_root_path, tokens, target, shift + 1, chain)
+
+
+def parse_include(line):
+    """
+    该函数用于解析单独成行的 Docsify 嵌入，例如 [label](_media/example.md ':include') 与
+    [label](_media/example.js ':include :type=code :fragment=demo')
+    :param line:    已去除行首空白的行
+    :return:        (描述, 嵌入文件的路径, 嵌入方式, 代码的语言, 代码片段的名称)，嵌入方式为 "markdown" 或 "code"；
+                    不是可以合并到文档中的嵌入时返回 None
+    """
+    links = scan_links(line)
+    if len(links) != 1:
+        return None
+    start, end, description, url, title = links[0]
+    if start != 0 or line[end:].strip() or not url or not title:
+        return None
+    options = title.split()
+    if ':include' not in options or url.startswith(('http://', 'https://', '//')):
+        return None
+    include_type = None
+    language = None
+    fragment = None
+    for option in options:
+        if option.startswith(':type='):
+            include_type = option[len(':type='):]
+        elif option.startswith(':fragment='):
+            fragment = option[len(':fragment='):]
+        elif not option.startswith(':') and '=' not in option and language is None:
+            language = option
+    extension = os.path.splitext(url.split('?')[0].split('#')[0])[1].lower()
+    if include_type is None:
+        if extension in MARKDOWN_EXTENSIONS:
+            include_type = 'markdown'
+        elif extension not in MEDIA_EXTENSIONS:
+            include_type = 'code'
+    if include_type not in ('markdown', 'code'):
+        return None
+    if include_type == 'code' and language is None:
+        language = extension.lstrip('.')
+    return description, url, include_type, language, fragment
+
+
+def mark_includes(tokens):
+    """
+    该函数用于将单独成行的 Docsify 嵌入替换为 LineKind.INCLUDE，嵌入在 recursion_parse 中展开。
+    嵌入文件的内容不属于片段，因此片段缓存与 memo 中的片段在嵌入文件变化后仍然有效
+    :param tokens:  分类后的行列表
+    :return:        替换后的行列表
+    """
+    for index, token in enumerate(tokens):
+        if token.kind is LineKind.TEXT and ':include' in token.line:
+            include = parse_include(token.line)
+            if include is not None:
+                description, url, include_type, language, fragment = include
+                # 嵌入无法展开时只输出描述
+                tokens[index] = LineToken(LineKind.INCLUDE, f"{description}\n", token.indent, text=url,
+                                          anchor=(include_type, language, fragment))
+    return tokens
+
+
+def shift_headings(tokens, shift):
+    """
+    该函数用于将片段中的标题下移，片段本身保持不变，因此同一个片段可以以不同的层级多次嵌入
+    :param tokens:  分类后的行迭代器
+    :param shift:   标题需要下移的层级
+    :return:        分类后的行迭代器（生成器）
+    """
+    for token in tokens:
+        if shift and token.kind is LineKind.HEADING:
+            level = token.level + shift
+            token = LineToken(LineKind.HEADING, '#' * level + token.text, token.indent, level, token.text, token.anchor)
+        yield token
+
+
+def strip_front_matter(data):
+    """
+    该函数用于去除 Markdown 文件开头的 YAML front matter，与 Docsify 嵌入 Markdown 文件时的处理一致
+    :param data:    Markdown文件的原始内容
+    :return:        去除 front matter 后的原始内容
+    """
+    if not (data.startswith(b'---\n') or data.startswith(b'---\r\n')):
+        return data
+    end = data.find(b'\n---', 3)
+    if end == -1:
+        return data
+    line_end = data.find(b'\n', end + 4)
+    return b'' if line_end == -1 else data[line_end + 1:]
+
+
+def build_code_block(lines, language, fragment=None):
+    """
+    该函数用于将以代码方式嵌入的文件转换为代码块
+    :param lines:       嵌入文件的行列表
+    :param language:    代码块的语言，为空时不指定
+    :param fragment:    代码片段的名称，如果提供，则只保留 "/// [名称]" 或 "### [名称]" 两行之间的内容
+    :return:            分类后的行列表，最后是一个空行
+    """
+    if fragment is not None:
+        markers = (f"/// [{fragment}]", f"### [{fragment}]")
+        bounds = [index for index, line in enumerate(lines) if line.strip() in markers]
+        lines = lines[bounds[0] + 1:bounds[1]] if len(bounds) >= 2 else []
+    tokens = [LineToken(LineKind.FENCE, f"```{language or ''}\n")]
+    tokens.extend(LineToken(LineKind.FENCED_CODE, line if line.endswith('\n') else line + '\n') for line in lines)
+    tokens.append(LineToken(LineKind.FENCE, "```\n"))
+    tokens.append(LineToken(LineKind.BLANK, "\n"))
+    return tokens
+
+
+def merge(docsify_root_path, homepage, workers=1, serial_number_matcher=None, cache=None, resolve_links=False,
+          mmap_threshold=None, nested_sidebars=False, dedupe_pages=False, expand_includes=False, assets=None):
     """
     该函数用于实现对 Docsify 的侧边栏文件涉及到的所有Markdown文件的合并。同时为该模块的主函数
+    :param docsify_root_path:       Docsify的根目录
+    :param homepage:                Docsify的主页文件，用于解析 _sidebar.md 文件时，如果遇到路径为 "/"或空 时，将其替换为主页文件
+    :param workers:                 预读取Markdown文件的线程数，小于等于1时按顺序逐个读取
+    :param serial_number_matcher:   标题编号匹配器，为 None 时使用默认的标题编号正则表达式列表
+    :param cache:                   片段缓存（FragmentCache），为 None 时不使用缓存
+    :param resolve_links:           是否保留内链的占位标记，需要在 renumber_titles 中传入 AnchorIndex，
+                                    并在写入时由 write_output 将其解析为文档内的锚点
+    :param mmap_threshold:          使用内存映射的最小文件大小（字节），为 None 时不使用内存映射。
+                                    产出的行中可能包含 LineKind.RAW 的原始字节，写入时需要使用 RawLineWriter（write_output 的 raw 参数）
+    :param nested_sidebars:         是否同时解析各个子文件夹下的侧边栏文件（Docsify 的 loadSidebar）并合并为一棵树
+    :param dedupe_pages:            是否只在页面第一次出现时输出其内容，之后的出现只输出一行引用
+    :param expand_includes:         是否将单独成行的 Docsify 嵌入 [label](path ':include') 替换为嵌入文件的内容
+    :param assets:                  图片收集器（AssetCollector），如果提供，则正文中的本地图片被复制到资源目录，
+                                    产出的行中保留图片的占位标记，需要再经过 AssetCollector.resolve_lines 改写
+    :return:                        合并后的Markdown文件的分类行迭代器（生成器），按侧边栏顺序逐行产出 LineToken，
+                                    其中的标题已经去除了原有的编号，只需再经过 renumber_titles 重新编号
+    """
+    root = load_sidebar(docsify_root_path, homepage, nested_sidebars, workers)
+    if root is None:
+        return
+    # 侧边栏中重复出现的页面（例如每个章节下共同的术语表，以及替换空链接的主页）只读取并处理一次，
+    # 片段只在还会再次出现时保留在内存中
+    builder = FragmentBuilder(serial_number_matcher=serial_number_matcher, cache=cache, memo={},
+                              resolve_links=resolve_links, mmap_threshold=mmap_threshold,
+                              repeats=Counter(iter_sidebar_pages(docsify_root_path, root)), dedupe_pages=dedupe_pages,
+                              expand_includes=expand_includes, assets=assets)
+    paths = iter_markdown_files(docsify_root_path, root, builder.memo, dedupe_pages, mmap_threshold)
+    sources = prefetch_markdown_files(paths, workers, mmap_threshold)
+    return merge_tree(docsify_root_path, root, sources, builder)
+
+
+def load_sidebar(docsify_root_path, homepage, nested_sidebars=False, workers=1):
+    """
+    该函数用于检查 Docsify 的根目录并解析其侧边栏文件
     :param docsify_root_path:   Docsify的根目录
-    :param homepage:            Docsify的主页文件，用于解析 _sidebar.md 文件时，如果遇到路径为 "/"或空 时，将其替换为主页文件
-    :return:                    合并后的Markdown文件的行列表
+    :param homepage:            Docsify的主页文件
+    :param nested_sidebars:     是否同时解析各个子文件夹下的侧边栏文件并合并为一棵树
+    :param workers:             并发解析子侧边栏文件的线程数
+    :return:                    侧边栏文件的根节点，如果根目录或侧边栏文件不存在，则返回 None
     """
     logger = get_logger()
     # 首先检查该文件夹是否存在
     if not os.path.exists(docsify_root_path):
         logger.error(t("The path of Docsify is not exists."))
         print(t("The path of Docsify is not exists."))
-        return
+        return None
     # 然后检查该文件夹下是否存在侧边栏文件
     sidebar_path = os.path.join(docsify_root_path, '_sidebar.md')
     if not os.path.exists(sidebar_path):
         logger.error(t("The sidebar file is not exists") + f": {sidebar_path}")
         print(t("The sidebar file is not exists") + f": {sidebar_path}")
-        return
+        return None
     # 解析侧边栏文件
-    with open(sidebar_path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-    root = parse_sidebar(lines, homepage)
-    md = recursion_parse(docsify_root_path, root)
-    return md.splitlines(keepends=True)
+    with get_report().stage('parse_sidebar'):
+        if nested_sidebars:
+            return load_nested_sidebars(docsify_root_path, homepage, workers)
+        with open(sidebar_path, 'r', encoding='utf-8') as file:
+            lines = file.readlines()
+        return parse_sidebar(lines, homepage)
+
+
+def merge_tree(docsify_root_path, root, sources, builder, emitted=()):
+    """
+    该函数用于按侧边栏顺序产出合并后的行，并在结束后整理片段缓存
+    :param docsify_root_path:   Docsify的根目录
+    :param root:                侧边栏文件的根节点
+    :param sources:             按侧边栏顺序产出 (路径, 原始内容) 的迭代器
+    :param builder:             片段构建器
+    :param emitted:             在此之前已经输出过的页面，分章节合并时为前面的章节中出现过的页面
+    :return:                    合并后的Markdown文件的分类行迭代器（生成器）
+    """
+    builder.emitted.clear()
+    builder.emitted.update(emitted)
+    builder.includes.clear()
+    builder.duplicate_hits = 0
+    builder.duplicates_skipped = 0
+    yield from recursion_parse(docsify_root_path, root, sources, builder)
+    report = get_report()
+    report.count('serial_numbers_removed', builder.title_transformer.removed)
+    report.count('duplicate_hits', builder.duplicate_hits)
+    report.count('duplicates_skipped', builder.duplicates_skipped)
+    if builder.duplicate_hits or builder.duplicates_skipped:
+        get_logger().info(f'{t("Repeated pages:")} {builder.duplicate_hits} {t("reused")}, '
+                          f'{builder.duplicates_skipped} {t("replaced with a reference")}')
+    cache = builder.cache
+    if cache is not None:
+        with report.stage('cache_evict'):
+            evicted = cache.evict()
+        report.count('fragment_cache_hits', cache.hits)
+        report.count('fragment_cache_misses', cache.misses)
+        get_logger().info(f'{t("Fragment cache:")} {cache.hits} {t("hits")}, {cache.misses} {t("misses")}, '
+                          f'{evicted} {t("evicted")}')
 
 
-def recursion_parse(docsify_root_path, root):
+def recursion_parse(docsify_root_path, root, sources=None, builder=None):
     """
-    递归解析侧边栏文件
+    递归解析侧边栏文件，以生成器的方式逐个文件地产出合并后的行，
+    因此同一时刻只有一个源文件的内容驻留在内存中。每一行在这里被分类一次，标题同时被转换为绝对标题并去除原有的编号
     :param docsify_root_path:  Docsify的根目录
     :param root:               侧边栏文件的根节点
-    :return:                   合并后的Markdown文件的行列表
+    :param sources:            按侧边栏顺序产出 (路径, 原始内容) 的迭代器，通常由 prefetch_markdown_files 提供；
+                               如果为 None，则在遍历到文件时再读取
+    :param builder:            片段构建器，为 None 时使用默认配置且不使用缓存
+    :return:                   合并后的Markdown文件的分类行迭代器
     """
     logger = get_logger()
-    md = ""
+    report = get_report()
+    if builder is None:
+        builder = FragmentBuilder()
     # 如果有子节点，那么就是目录，需要添加标题
     if len(root.children) > 0:
         if root.level > 0:
-            md += f"{'#' * root.level} {root.name}\n\n"
+            yield from builder.build_heading(root.level, root.name, blank_line=True)
         for child in root.children:
-            md += recursion_parse(docsify_root_path, child) + "\n"
+            yield from recursion_parse(docsify_root_path, child, sources, builder)
+            yield LineToken(LineKind.BLANK, "\n")
     # 如果没有子节点，那么就是文件，需要添加文件内容
     else:
         # 但是也存在没有子节点，但又不是文件的情况
         if root.link is None:
-            return f"{'#' * root.level} {root.name}\n"
-        # 如果root.link是一个相对路径，那么就需要将其转换为绝对路径
-        link = root.link
-        if not os.path.isabs(link):
-            link = os.path.join(docsify_root_path, link)
-        logger.info(f'{t("Load markdown file:")} {link}')
-        with open(link, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-        lines = relative_heading_to_absolute_heading(lines, root.level)
-        lines = remove_internal_link(lines)
-        # 在最后添加一个空行，以免和下一个文件的内容连在一起
-        md += "".join(lines) + "\n"
-    return md
+            yield from builder.build_heading(root.level, root.name)
+            return
+        path = resolve_markdown_path(docsify_root_path, root.link)
+        if builder.dedupe_pages:
+            if path in builder.emitted:
+                builder.duplicates_skipped += 1
+                page = page_key(docsify_root_path, path) if builder.resolve_links else None
+                yield from builder.build_reference(root.name, page)
+                return
+            builder.emitted.add(path)
+        memo = builder.memo
+        if memo is not None:
+            key = (path, root.level)
+            tokens = memo.get(key)
+            if tokens is not None:
+                if builder.repeats is not None:
+                    builder.duplicate_hits += 1
+                if not builder.retain(key):
+                    del memo[key]
+                yield from builder.expand(docsify_root_path, tokens, path, root.level)
+                return
+        start = time.perf_counter()
+        with report.stage('read'):
+            if sources is None:
+                link = path
+                data = read_markdown_source(link, builder.mmap_threshold)
+            else:
+                link, data = next(sources)
+        size = len(data)
+        page = page_key(docsify_root_path, link) if builder.resolve_links else None
+        if is_mapped(data):
+            # 映射到内存的文件边处理边产出，不在内存中保留片段
+            tokens = None
+            yield from builder.expand(docsify_root_path, builder.build_mapped(data, root.level, page), path,
+                                      root.level)
+        else:
+            tokens = builder.build(data, root.level, page)
+        # 每个文件只输出一行汇总日志，逐个链接与标题的日志只在 DEBUG 级别输出
+        if logger.isEnabledFor(logging.INFO):
+            summary = builder.summary
+            if builder.cached:
+                logger.info(f'{t("Load markdown file:")} {link} ({t("from fragment cache")})')
+            else:
+                logger.info(f'{t("Load markdown file:")} {link} ({summary[0]} {t("links removed")}, '
+                            f'{summary[1]} {t("links kept")}, {summary[2]} {t("title serial numbers removed")})')
+        report.count('files_read')
+        report.count('bytes_read', size)
+        report.add_file(link, time.perf_counter() - start, size)
+        if tokens is None:
+            return
+        if memo is not None and builder.retain(key):
+            memo[key] = tokens
+        yield from builder.expand(docsify_root_path, tokens, path, root.level)
 
 
-def relative_heading_to_absolute_heading(lines, level):
+def terminate_lines(lines):
     """
-    将相对标题转换为绝对标题
+    在文件的最后添加一个换行符。如果最后一行没有换行符，则换行符会补在该行的末尾，否则会产生一个空行，
+    与把整个文件拼接后再追加 "\n" 并 splitlines 的结果完全一致
     :param lines:   Markdown文件的行列表
-    :param level:   当前Markdown文件的处于的层级
-    :return:        转换后的Markdown文件的行列表
+    :return:        补充换行后的行迭代器
     """
-    result = []
-    in_code_block = False
-    for line in lines:
-        # 跳过空行
-        if line.strip() == '':
-            result.append(line)
-            continue
-        # 计算该行前面有多少个空格
-        previous_spaces = len(line) - len(line.lstrip())
-        # 如果有4个及以上的空格，那么就是单行代码块
-        if previous_spaces >= 4:
-            result.append(line)
-            continue
-        # 如果有3个及以下的空格，那么就是普通行
-        line = line.lstrip()
-        # 如果是"```"，就是代码块的开始或结束
-        if line.startswith('```'):
-            in_code_block = not in_code_block
-            result.append(line)
-            continue
-        if line.startswith('#') and not in_code_block:
-            # 保留原格式，即保留原来的空格
-            line = " " * previous_spaces + "#" * (level - 1) + line
-        result.append(line)
-    return result
+    if not lines:
+        yield "\n"
+        return
+    yield from lines[:-1]
+    yield from (lines[-1] + "\n").splitlines(keepends=True)
 
 
-def remove_internal_link(lines):
+def tokenize_mapped_ranges(data, ranges, shift, in_code_block):
     """
-    移除内部链接，只保留[]中的内容
-    :param lines:   Markdown文件的行列表
-    :return:        移除内部链接后的Markdown文件的行列表
+    该函数用于对一组范围进行分类：直接复制的范围成为一行 LineKind.RAW；需要处理的段落之间只隔着不影响分类的行，
+    因此被拼接后一次解码、一次分类，再按每段的行数放回原来的位置
+    :param data:            内存映射对象（mmap）
+    :param ranges:          iter_mapped_ranges 产出的一组 (开始位置, 结束位置, 是否需要处理)
+    :param shift:           标题需要下移的层级
+    :param in_code_block:   第一段的第一行是否位于代码块中
+    :return:                (分类后的行列表, 下一组的第一行是否位于代码块中)
+    """
+    report = get_report()
+    with report.stage('read'):
+        chunks = [data[start:end] for start, end, _ in ranges]
+    with report.stage('decode'):
+        for chunk, (_, _, relevant) in zip(chunks, ranges):
+            # 与解码时一样，非 UTF-8 的内容会引发 UnicodeDecodeError
+            if not relevant and not chunk.isascii():
+                chunk.decode('utf-8')
+        lines = split_lines(str(b''.join([chunk for chunk, (_, _, relevant) in zip(chunks, ranges) if relevant]),
+                                'utf-8'))
+        if ranges[-1][1] == len(data):
+            # 在最后添加一个空行，以免和下一个文件的内容连在一起
+            lines = list(terminate_lines(lines))
+    with report.stage('tokenize'):
+        line_tokens = list(tokenize(lines, shift, in_code_block))
+        for token in line_tokens:
+            if token.kind is LineKind.FENCE:
+                in_code_block = not in_code_block
+        tokens = []
+        index = 0
+        for chunk, (_, _, relevant) in zip(chunks, ranges):
+            if not relevant:
+                tokens.append(LineToken(LineKind.RAW, chunk))
+                continue
+            # 除了文件的最后一段，每一段都以换行符结束
+            count = chunk.count(b'\n')
+            tokens.extend(line_tokens[index:index + count])
+            index += count
+        tokens.extend(line_tokens[index:])
+    return tokens, in_code_block
+
+
+def build_link_replacer(links, page=None):
+    """
+    该函数用于生成链接的替换函数：外链保留链接，内链只保留描述
+    :param links:   用于累加统计结果的列表：[去除的内链数, 保留的外链数]
+    :param page:    源文件的键，如果提供，则内链被替换为占位标记，之后再解析为文档内的锚点
+    :return:        替换函数，参数为 (描述, 链接, 标题, 原始文本)
     """
     logger = get_logger()
+    debug = is_debug_enabled()
 
-    def replacer(match):
-        description = match.group('description')
-        url = match.group('url')
-        title = match.group('title')
-        original_link = match.group(0)
+    def replacer(description, url, title, original_link):
+        # 由 AssetCollector 收集的图片保留链接，输出时改写为资源目录中的文件
+        if url and url.startswith(ASSET_START):
+            return original_link
         # 如果是外链，保留链接；否则，只保留描述
         if url and (url.startswith('http://') or url.startswith('https://')):
             new_link = f'[{description}]({url} "{title}")' if title else f'[{description}]({url})'
-            logger.info(f'{t("Handling links:")} "{original_link}" -> "{new_link}"')
+            if debug:
+                logger.debug(f'{t("Handling links:")} "{original_link}" -> "{new_link}"')
+            links[1] += 1
             return new_link
         else:
-            new_link = description
-            logger.info(f'{t("Handling links:")} "{original_link}" -> "{new_link}"')
-            return description
-
-    md = "".join(lines)
-    # 移除内部链接，只保留[]中的内容
-    # regex101: https://regex101.com/r/9xw49K/5
-    regex = r"\[(?P<description>(?:\\[\[\]]|[^\[\]])*)\]\(\s*(?P<url>[^\s\)]+)?(?:\s+[\"\'](?P<title>.*?)[\"\'])?\s*\)"
-    result = re.sub(regex, replacer, md, flags=re.DOTALL)
-    return result.splitlines(keepends=True)
+            links[0] += 1
+            if debug:
+                logger.debug(f'{t("Handling links:")} "{original_link}" -> "{description}"')
+            return description if page is None else make_link_marker(page, url, description)
+
+    return replacer
+
+
+def remove_internal_link(lines, links=None):
+    """
+    移除内部链接，只保留[]中的内容。代码块与行内代码中的链接保持不变
+    :param lines:   Markdown文件的行列表
+    :param links:   用于累加统计结果的列表：[去除的内链数, 保留的外链数]，为 None 时不返回统计结果
+    :return:        移除内部链接后的Markdown文件的行列表
+    """
+    if links is None:
+        links = [0, 0]
+    stripped, kept = links
+
+    def items():
+        # 缩进的行在代码块中同样被分类为单行代码块，因此需要单独维护代码块的状态
+        in_code_block = False
+        for line, token in zip(lines, tokenize(lines)):
+            if token.kind is LineKind.FENCE:
+                in_code_block = not in_code_block
+            yield line, not in_code_block and token.kind in TEXT_KINDS, token
+
+    replacer = build_link_replacer(links)
+    result = []
+    for line, token in remove_links(items(), replacer):
+        if token is not None and token.kind is LineKind.HEADING:
+            line = replace_links(line, replacer)
+        result.append(line)
+    # 统计被去除的内链与被保留的外链数量
+    report = get_report()
+    report.count('links_stripped', links[0] - stripped)
+    report.count('links_kept', links[1] - kept)
+    return result
+
+
+def remove_internal_link_tokens(tokens, links=None, shift=0, page=None, in_code_block=False):
+    """
+    移除分类后的行中的内部链接，只保留[]中的内容。代码块与行内代码中的链接保持不变，
+    连续的正文行组成一个段落，整段只扫描一次
+    :param tokens:          分类后的行列表
+    :param links:           用于累加统计结果的列表：[去除的内链数, 保留的外链数]，为 None 时不返回统计结果
+    :param shift:           标题需要下移的层级，用于对合并后被重新拆分的行重新分类
+    :param page:            源文件的键，如果提供，则正文中的内链被替换为占位标记（标题中的内链仍只保留描述）
+    :param in_code_block:   第一行是否位于代码块中，用于分段处理同一个文件
+    :return:                移除内部链接后的分类行列表
+    """
+    if links is None:
+        links = [0, 0]
+    stripped, kept = links
+    replacer = build_link_replacer(links)
+    text_replacer = replacer if page is None else build_link_replacer(links, page)
+
+    def items():
+        # 缩进的行在代码块中同样被分类为单行代码块，因此需要单独维护代码块的状态
+        nonlocal in_code_block
+        for token in tokens:
+            if token.kind is LineKind.FENCE:
+                in_code_block = not in_code_block
+            yield token.line, not in_code_block and token.kind in TEXT_KINDS, token
+
+    result = []
+    for line, token in remove_links(items(), text_replacer):
+        if token is None:
+            result.extend(tokenize([line], shift))
+            continue
+        if token.kind is LineKind.HEADING:
+            text = replace_links(token.text, replacer)
+            if text is not token.text:
+                token.text = text
+                token.line = '#' * token.level + text
+        elif line is not token.line:
+            token.line = line
+        result.append(token)
+    # 统计被去除的内链与被保留的外链数量
+    report = get_report()
+    report.count('links_stripped', links[0] - stripped)
+    report.count('links_kept', links[1] - kept)
+    return result
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-24 09:20
+# Author  : Jiang Liu
+# Desc    : 输出文件的写入：以较大的缓冲写入同一目录下的临时文件，同步到磁盘后原子地替换输出文件。
+#           内容与已有的输出文件完全相同时不替换，保留其修改时间，下游的 Pandoc/PDF 任务不会重新构建；
+#           输出路径以 ".gz" 结尾时使用 gzip 压缩
+import gzip
+import hashlib
+import io
+import os
+import shutil
+
+from src.i18n import translate as t
+from src.log import get_logger
+from src.mapped_markdown import RawLineWriter
+from src.report import get_report
+
+# 写入与比较输出文件时的缓冲大小
+BUFFER_SIZE = 1024 * 1024
+
+
+class HashingWriter(io.BufferedIOBase):
+    """
+    该类用于在写入文件的同时计算写入内容的哈希值与大小，不需要在写入后再次读取
+    """
+
+    def __init__(self, file):
+        """
+        该函数用于初始化
+        :param file:    以二进制方式打开的文件
+        """
+        super().__init__()
+        self.file = file
+        self.hash = hashlib.blake2b(digest_size=16)
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        # 底层文件由 AtomicOutputFile 负责关闭
+        if not self.closed:
+            self.flush()
+        super().close()
+
+
+def hash_file(path):
+    """
+    该函数用于计算文件内容的哈希值
+    :param path:    文件的路径
+    :return:        哈希值
+    """
+    content_hash = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(BUFFER_SIZE), b''):
+            content_hash.update(chunk)
+    return content_hash.digest()
+
+
+def is_writable_output(path):
+    """
+    该函数用于检查输出文件是否可以写入，不会创建或截断输出文件
+    :param path:    输出文件的路径
+    :return:        是否可以写入
+    """
+    if os.path.isdir(path):
+        return False
+    if os.path.exists(path) and not os.access(path, os.W_OK):
+        return False
+    return os.access(os.path.dirname(path) or '.', os.W_OK)
+
+
+class AtomicOutputFile:
+    """
+    该类用于原子地写入输出文件：with 语句中写入同一目录下的临时文件，正常退出时才替换输出文件，
+    发生异常时删除临时文件，原来的输出文件保持不变
+    """
+
+    def __init__(self, path, newline=None, buffer_size=BUFFER_SIZE):
+        """
+        该函数用于初始化输出文件
+        :param path:            输出文件的路径，以 ".gz" 结尾时使用 gzip 压缩
+        :param newline:         与 open 的 newline 参数一致，为 None 时 "\\n" 被转换为系统的换行符
+        :param buffer_size:     写入临时文件的缓冲大小
+        """
+        self.path = path
+        self.newline = newline
+        self.buffer_size = buffer_size
+        self.compress = path.endswith('.gz')
+        self.temp_path = f"{path}.{os.getpid()}.tmp"
+        self.file = None
+        self.hashing = None
+        self.gzip = None
+        self.text = None
+        # 提交后输出文件是否发生了变化
+        self.changed = None
+
+    def __enter__(self):
+        self.file = open(self.temp_path, 'wb', buffering=self.buffer_size)
+        self.hashing = HashingWriter(self.file)
+        buffer = self.hashing
+        if self.compress:
+            # 固定文件名与修改时间，相同的内容总是压缩为相同的字节，才能与已有的输出文件比较
+            name = os.path.basename(self.path)[:-len('.gz')]
+            self.gzip = buffer = gzip.GzipFile(filename=name, mode='wb', fileobj=self.hashing, mtime=0)
+        self.text = io.TextIOWrapper(buffer, encoding='utf-8', newline=self.newline)
+        return self.text
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            # 发生异常时，文本层中尚未写入的内容被丢弃到临时文件中，之后与临时文件一起删除
+            if not self.text.closed:
+                self.text.close()
+            self.file.close()
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+        return False
+
+    def commit(self):
+        """
+        该函数用于完成写入：内容与已有的输出文件相同时只删除临时文件，否则同步到磁盘后替换输出文件
+        """
+        self.text.close()
+        if self.gzip is not None:
+            self.gzip.close()
+        self.hashing.close()
+        digest = self.hashing.hash.digest()
+        self.changed = not (os.path.isfile(self.path) and os.path.getsize(self.path) == self.hashing.size
+                            and hash_file(self.path) == digest)
+        if not self.changed:
+            return
+        os.fsync(self.file.fileno())
+        self.file.close()
+        # 临时文件按 umask 创建，替换前沿用已有输出文件的权限，与直接覆盖写入时一致
+        if os.path.exists(self.path):
+            shutil.copymode(self.path, self.temp_path)
+        os.replace(self.temp_path, self.path)
+
+
+def write_output(path, lines, raw=False, anchor_index=None, toc=None):
+    """
+    该函数用于流式地写入合并后的行。需要解析内链或添加目录时，先写入一个中间文件，重新编号完成后，
+    再将目录写入输出文件的开头，之后是中间文件的内容（需要解析内链时，其中的内链被改写为锚点），正文不会被再次解析
+    :param path:            输出文件的路径，以 ".gz" 结尾时使用 gzip 压缩
+    :param lines:           合并后的行迭代器
+    :param raw:             行中是否可能包含内存映射模式下直接复制的原始字节
+    :param anchor_index:    锚点索引（AnchorIndex），在重新编号的同时填充
+    :param toc:             目录（TableOfContents），在重新编号的同时填充
+    :return:                输出文件是否发生了变化
+    """
+    report = get_report()
+    # 中间文件已经转换过换行符，之后复制或改写内链时不再转换
+    staged = anchor_index is not None or toc is not None
+    output = AtomicOutputFile(path, newline='' if staged else None)
+    if not staged:
+        with output as file:
+            # 内存映射模式下，未经处理的原始字节直接写入输出文件
+            report.write_lines(RawLineWriter(file) if raw else file, lines)
+    else:
+        temp_path = f"{path}.{os.getpid()}.body.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as file:
+                report.write_lines(RawLineWriter(file) if raw else file, lines)
+            with open(temp_path, 'r', encoding='utf-8', newline='') as source, output as file:
+                if toc is not None:
+                    # 目录与中间文件一样转换换行符
+                    file.write(''.join(toc.lines()).replace('\n', os.linesep))
+                if anchor_index is None:
+                    shutil.copyfileobj(source, file, BUFFER_SIZE)
+                else:
+                    with report.stage('resolve_links'):
+                        file.writelines(anchor_index.resolve_lines(source))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    if not output.changed:
+        report.count('output_unchanged')
+        get_logger().info(f"{t('Output file is unchanged:')} '{path}'")
+    return output.changed
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-13 09:42
+# Author  : Jiang Liu
+# Desc    : 预读取侧边栏涉及到的Markdown文件：使用有界线程池并发读取，并按侧边栏顺序产出
+import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.mapped_markdown import map_markdown_file
+
+
+def resolve_markdown_path(docsify_root_path, link):
+    """
+    该函数用于将侧边栏中的链接转换为绝对路径
+    :param docsify_root_path:   Docsify的根目录
+    :param link:                侧边栏中的链接
+    :return:                    Markdown文件的绝对路径
+    """
+    # 如果link是一个相对路径，那么就需要将其转换为绝对路径
+    if not os.path.isabs(link):
+        link = os.path.join(docsify_root_path, link)
+    return link
+
+
+def iter_sidebar_pages(docsify_root_path, root):
+    """
+    该函数用于按侧边栏顺序遍历所有页面，顺序与 recursion_parse 的遍历顺序一致
+    :param docsify_root_path:   Docsify的根目录
+    :param root:                侧边栏文件的根节点
+    :return:                    (Markdown文件的绝对路径, 层级) 的迭代器（生成器）
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if len(node.children) > 0:
+            stack.extend(reversed(node.children))
+        elif node.link is not None:
+            yield resolve_markdown_path(docsify_root_path, node.link), node.level
+
+
+def iter_markdown_files(docsify_root_path, root, memo=None, unique=False, mmap_threshold=None, emitted=()):
+    """
+    该函数用于按侧边栏顺序遍历所有需要读取的Markdown文件，顺序与 recursion_parse 的遍历顺序一致
+    :param docsify_root_path:   Docsify的根目录
+    :param root:                侧边栏文件的根节点
+    :param memo:                内存中的片段字典，键为 (文件路径, 层级)。如果提供，则跳过已经在其中的文件以及重复出现的文件，
+                                与 recursion_parse 只在片段不在 memo 中时才读取文件的行为保持一致
+    :param unique:              是否跳过重复出现的文件（不论层级），与 recursion_parse 只输出页面第一次出现的行为保持一致
+    :param mmap_threshold:      使用内存映射的最小文件大小（字节）。被映射的文件不会保留在 memo 中，重复出现时需要再次读取
+    :param emitted:             unique 为 True 时，在此之前已经输出过、同样需要跳过的文件，与 merge_tree 的 emitted 参数一致
+    :return:                    Markdown文件的绝对路径迭代器（生成器）
+    """
+    seen = set()
+    seen_paths = set(emitted)
+    for path, level in iter_sidebar_pages(docsify_root_path, root):
+        if unique:
+            if path in seen_paths:
+                continue
+            seen_paths.add(path)
+        if memo is not None and not is_mapped_source(path, mmap_threshold):
+            key = (path, level)
+            if key in memo or key in seen:
+                continue
+            seen.add(key)
+        yield path
+
+
+def read_markdown_file(path):
+    """
+    该函数用于读取一个Markdown文件
+    :param path:    Markdown文件的路径
+    :return:        Markdown文件的行列表
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.readlines()
+
+
+def read_markdown_bytes(path):
+    """
+    该函数用于以二进制方式读取一个Markdown文件，便于在解码前计算内容的哈希值
+    :param path:    Markdown文件的路径
+    :return:        Markdown文件的原始内容
+    """
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def read_markdown_source(path, mmap_threshold=None):
+    """
+    该函数用于读取一个Markdown文件，不小于 mmap_threshold 的文件被映射到内存而不是读入
+    :param path:            Markdown文件的路径
+    :param mmap_threshold:  使用内存映射的最小文件大小（字节），为 None 时总是读入
+    :return:                Markdown文件的原始内容（bytes），或者内存映射对象（mmap）
+    """
+    if is_mapped_source(path, mmap_threshold):
+        return map_markdown_file(path)
+    return read_markdown_bytes(path)
+
+
+def is_mapped_source(path, mmap_threshold=None):
+    """
+    该函数用于判断 read_markdown_source 是否会将Markdown文件映射到内存
+    :param path:            Markdown文件的路径
+    :param mmap_threshold:  使用内存映射的最小文件大小（字节），为 None 时总是读入
+    :return:                是否映射到内存，空文件无法映射，总是读入
+    """
+    return mmap_threshold is not None and os.path.getsize(path) >= max(mmap_threshold, 1)
+
+
+def decode_markdown(data):
+    """
+    该函数用于将Markdown文件的原始内容解码为行列表，结果与以文本方式打开文件后调用 readlines 完全一致
+    :param data:    Markdown文件的原始内容
+    :return:        Markdown文件的行列表
+    """
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').readlines()
+
+
+def prefetch_markdown_files(paths, workers=1, mmap_threshold=None):
+    """
+    该函数用于读取Markdown文件。当 workers 大于1时，使用有界线程池并发读取，
+    同时最多只有 workers * 2 个文件处于读取中或等待消费，因此内存占用仍然有界
+    :param paths:           Markdown文件的路径迭代器
+    :param workers:         读取文件的线程数，小于等于1时按顺序逐个读取
+    :param mmap_threshold:  使用内存映射的最小文件大小（字节），为 None 时总是读入
+    :return:                (路径, 原始内容) 的迭代器（生成器），顺序与 paths 一致
+    """
+    if workers is None or workers <= 1:
+        for path in paths:
+            yield path, read_markdown_source(path, mmap_threshold)
+        return
+
+    paths = iter(paths)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+    try:
+        for path in paths:
+            pending.append((path, executor.submit(read_markdown_source, path, mmap_threshold)))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            path, future = pending.popleft()
+            # 每消费一个文件，就补充一个新的读取任务
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(read_markdown_source, next_path, mmap_threshold)))
+            yield path, future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -2,12 +2,15 @@
 # Time    : 2023-08-04 15:58
 # Author  : Jiang Liu
 # Desc    : 重新编号标题：删去原来的编号，重新编号
-import re
 from enum import Enum, unique
-from typing import Callable, List
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List
 
-from src.log import get_logger
+from src.log import get_logger, is_debug_enabled
 from src.i18n import translate as t
+from src.markdown_lexer import LineKind, LineToken, tokenize
+from src.report import get_report
+from src.serial_number_matcher import SerialNumberMatcher, compile_serial_number_matcher
 
 
 @unique
@@ -59,9 +62,53 @@ class SerialNumberConfig:
         }
 
 
+class SerialNumberOverflowError(ValueError):
+    """
+    该异常表示标题编号超出了编号类型所能表示的范围
+    """
+
+    def __init__(self, level, serial_number_type, index):
+        """
+        :param level:               标题的层级
+        :param serial_number_type:  序号的类型
+        :param index:               超出范围的序号索引
+        """
+        self.level = level
+        self.serial_number_type = serial_number_type
+        self.index = index
+        low, high = SERIAL_NUMBER_RANGES[serial_number_type]
+        super().__init__(f"{t('Serial number out of range:')} {t('level')} {level}, {serial_number_type.value} "
+                         f"{index} ({low} - {high if high is not None else ''})")
+
+
+# 罗马数字的符号表，按数值从大到小排列
+ROMAN_NUMERALS = [
+    ("M", 1000), ("CM", 900), ("D", 500), ("CD", 400), ("C", 100),
+    ("XC", 90), ("L", 50), ("XL", 40), ("X", 10), ("IX", 9),
+    ("V", 5), ("IV", 4), ("I", 1)
+]
+CHINESE_LOWER_CASE_NUMERALS = ["〇", "一", "二", "三", "四", "五", "六", "七", "八", "九"]
+CHINESE_LOWER_CASE_UNITS = ["", "十", "百", "千"]
+CHINESE_UPPER_CASE_NUMERALS = ["零", "壹", "贰", "叁", "肆", "伍", "陆", "柒", "捌", "玖"]
+CHINESE_UPPER_CASE_UNITS = ["", "拾", "佰", "仟"]
+# 中文数字每四位一节，节的单位
+CHINESE_SECTION_UNITS = ["", "万", "亿", "万亿"]
+
+# 各编号类型能表示的序号索引范围 (最小值, 最大值)，最大值为 None 表示没有上限
+SERIAL_NUMBER_RANGES = {
+    SerialNumberType.NUMBER: (0, None),
+    SerialNumberType.ROMAN_LOWER_CASE: (1, 3999),
+    SerialNumberType.ROMAN_UPPER_CASE: (1, 3999),
+    SerialNumberType.ALPHABET_LOWER_CASE: (1, None),
+    SerialNumberType.ALPHABET_UPPER_CASE: (1, None),
+    SerialNumberType.CHINESE_LOWER_CASE: (0, 10 ** 16 - 1),
+    SerialNumberType.CHINESE_UPPER_CASE: (0, 10 ** 16 - 1),
+}
+
+
 class SerialNumberUtil:
     """
-    该类用于处理序号
+    该类用于处理序号。各类型的转换函数都经过缓存，同一个序号只会计算一次
     """
 
     @staticmethod
@@ -72,25 +119,18 @@ class SerialNumberUtil:
         :param index:                   序号的索引
         :return:                        序号
         """
-        # 如果serial_number_type是对象，则获取其值
-        if isinstance(serial_number_type, Enum):
-            serial_number_type = serial_number_type.value
-
-        if serial_number_type == SerialNumberType.NUMBER.value:
-            return str(index)
-        elif serial_number_type == SerialNumberType.ROMAN_LOWER_CASE.value:
-            return SerialNumberUtil.int_to_roman_upper_case(index).lower()
-        elif serial_number_type == SerialNumberType.ROMAN_UPPER_CASE.value:
-            return SerialNumberUtil.int_to_roman_upper_case(index).upper()
-        elif serial_number_type == SerialNumberType.ALPHABET_LOWER_CASE.value:
-            return SerialNumberUtil.int_to_alphabet_lower_case(index)
-        elif serial_number_type == SerialNumberType.ALPHABET_UPPER_CASE.value:
-            return SerialNumberUtil.int_to_alphabet_upper_case(index)
-        elif serial_number_type == SerialNumberType.CHINESE_LOWER_CASE.value:
-            return SerialNumberUtil.int_to_chinese_lower_case(index)
-        elif serial_number_type == SerialNumberType.CHINESE_UPPER_CASE.value:
-            return SerialNumberUtil.int_to_chinese_upper_case(index)
-        else:
+        return SerialNumberUtil.get_formatter(serial_number_type)(index)
+
+    @staticmethod
+    def get_formatter(serial_number_type) -> Callable[[int], str]:
+        """
+        该函数用于获取序号类型对应的转换函数，便于在处理大量标题时跳过类型的判断
+        :param serial_number_type:      序号的类型，可以是 SerialNumberType 或其值
+        :return:                        将序号索引转换为序号的函数
+        """
+        try:
+            return SERIAL_NUMBER_FORMATTERS[SerialNumberType(serial_number_type)]
+        except ValueError:
             raise ValueError(f'Invalid serial number type: {serial_number_type}')
 
     @staticmethod
@@ -106,124 +146,258 @@ class SerialNumberUtil:
 
         result = ""
         for roman, value in roman_numerals:
-            while n >= value:
-                result += roman
-                n -= value
+            count, n = divmod(n, value)
+            result += roman * count
 
         return result
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def int_to_roman_lower_case(n: int) -> str:
         """
         该函数用于将整数转换为罗马数字
         :param n:   整数
         :return:    罗马数字
         """
-        if n < 1 or n > 3999:
-            raise ValueError("Input must be between 1 and 3999")
-
-        roman_numerals = [
-            ("m", 1000), ("cm", 900), ("d", 500), ("cd", 400), ("c", 100),
-            ("xc", 90), ("l", 50), ("xl", 40), ("x", 10), ("ix", 9),
-            ("v", 5), ("iv", 4), ("i", 1)
-        ]
-
-        return SerialNumberUtil.int_to_roman(n, roman_numerals)
+        return SerialNumberUtil.int_to_roman_upper_case(n).lower()
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def int_to_roman_upper_case(n: int) -> str:
         """
         该函数用于将整数转换为罗马数字
         :param n:   整数
         :return:    罗马数字
         """
-        if n < 1 or n > 3999:
-            raise ValueError("Input must be between 1 and 3999")
-
-        roman_numerals = [
-            ("M", 1000), ("CM", 900), ("D", 500), ("CD", 400), ("C", 100),
-            ("XC", 90), ("L", 50), ("XL", 40), ("X", 10), ("IX", 9),
-            ("V", 5), ("IV", 4), ("I", 1)
-        ]
+        return SerialNumberUtil.int_to_roman(n, ROMAN_NUMERALS)
 
-        return SerialNumberUtil.int_to_roman(n, roman_numerals)
+    @staticmethod
+    def int_to_alphabet(n: int, first: str) -> str:
+        """
+        该函数用于将整数转换为字母序号（双射二十六进制），1 到 26 为单个字母，27 之后为 "aa", "ab", ...，与电子表格的列名一致
+        :param n:       整数
+        :param first:   第一个字母，"a" 或 "A"
+        :return:        字母
+        """
+        if n < 1:
+            raise ValueError("Input must be greater than 0")
+        letters = []
+        while n > 0:
+            n, remainder = divmod(n - 1, 26)
+            letters.append(chr(ord(first) + remainder))
+        return ''.join(reversed(letters))
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def int_to_alphabet_lower_case(n: int) -> str:
         """
-        该函数用于将整数转换为字母序号，a对应1，b对应2，以此类推
+        该函数用于将整数转换为字母序号，a对应1，b对应2，z对应26，aa对应27，以此类推
         :param n:   整数
         :return:    字母
         """
-        if n < 1 or n > 26:
-            raise ValueError("Input must be between 1 and 26")
-        return chr(n + 96)
+        return SerialNumberUtil.int_to_alphabet(n, 'a')
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def int_to_alphabet_upper_case(n: int) -> str:
         """
-        该函数用于将整数转换为字母序号，A对应1，B对应2，以此类推
+        该函数用于将整数转换为字母序号，A对应1，B对应2，Z对应26，AA对应27，以此类推
         :param n:   整数
         :return:    字母
         """
-        if n < 1 or n > 26:
-            raise ValueError("Input must be between 1 and 26")
-        return chr(n + 64)
+        return SerialNumberUtil.int_to_alphabet(n, 'A')
 
     @staticmethod
-    def int_to_chinese(n: int, chinese_numerals, units) -> str:
+    def int_to_chinese_section(n: int, chinese_numerals, units) -> str:
         """
-        该函数用于将整数转换为中文数字
+        该函数用于将 1 到 9999 的整数（一节）转换为中文数字，中间连续的零只读一个，末尾的零不读，例如 1010 为 "一千〇一十"
         :param n:                   整数
         :param chinese_numerals:    中文数字（大写或小写）
         :param units:               单位（大写或小写）
         :return:                    中文数字（大写或小写）
         """
-        if n < 0 or n > 9999:
-            raise ValueError("Input must be between 1 and 9999")
+        result = ""
+        zero = False
+        for i in range(3, -1, -1):
+            digit = n // 10 ** i % 10
+            if digit == 0:
+                zero = bool(result)
+                continue
+            if zero:
+                result += chinese_numerals[0]
+                zero = False
+            result += chinese_numerals[digit] + units[i]
+        return result
 
-        def convert_section(num: int) -> str:
-            section = ""
-            for i in range(len(str(num)) - 1, -1, -1):
-                digit = int(num % 10)
-                if digit != 0:
-                    section = chinese_numerals[digit] + units[i] + section
-                elif section and section[0] != chinese_numerals[0]:
-                    section = chinese_numerals[0] + section
-                num //= 10
-            return section
+    @staticmethod
+    def int_to_chinese(n: int, chinese_numerals, units) -> str:
+        """
+        该函数用于将整数转换为中文数字，每四位为一节，节的单位依次为万、亿、万亿，
+        以 "一十" 开头时省略 "一"，例如 10 为 "十"，100000 为 "十万"
+        :param n:                   整数
+        :param chinese_numerals:    中文数字（大写或小写）
+        :param units:               单位（大写或小写）
+        :return:                    中文数字（大写或小写）
+        """
+        if n < 0 or n >= 10 ** 16:
+            raise ValueError("Input must be between 0 and 9999999999999999")
+        if n == 0:
+            return chinese_numerals[0]
 
+        sections = []
+        while n > 0:
+            n, section = divmod(n, 10000)
+            sections.append(section)
         result = ""
-        if n >= 1000:
-            result += chinese_numerals[n // 1000] + units[3]
-            n %= 1000
-        if n >= 100:
-            result += convert_section(n)
-        else:
-            result += convert_section(n).lstrip(chinese_numerals[0])
-        return result.replace("一十", "十").replace("壹拾", "拾")
+        zero = False
+        for i in range(len(sections) - 1, -1, -1):
+            section = sections[i]
+            if section == 0:
+                # 中间的节为零时，只在下一个非零的节前补一个零
+                zero = bool(result)
+                continue
+            if result and (zero or section < 1000):
+                result += chinese_numerals[0]
+            result += SerialNumberUtil.int_to_chinese_section(section, chinese_numerals, units) + CHINESE_SECTION_UNITS[i]
+            zero = False
+        if result.startswith(chinese_numerals[1] + units[1]):
+            result = result[1:]
+        return result
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def int_to_chinese_lower_case(n: int) -> str:
         """
         该函数用于将整数转换为中文序号，一对应1，二对应2，以此类推
         :param n:   整数
         :return:    中文小写序号
         """
-        chinese_numerals = ["〇", "一", "二", "三", "四", "五", "六", "七", "八", "九"]
-        units = ["", "十", "百", "千"]
-        return SerialNumberUtil.int_to_chinese(n, chinese_numerals, units)
+        return SerialNumberUtil.int_to_chinese(n, CHINESE_LOWER_CASE_NUMERALS, CHINESE_LOWER_CASE_UNITS)
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def int_to_chinese_upper_case(n: int) -> str:
         """
         该函数用于将整数转换为中文序号，壹对应1，贰对应2，以此类推
         :param n:   整数
         :return:    中文大写序号
         """
-        chinese_numerals = ["零", "壹", "贰", "叁", "肆", "伍", "陆", "柒", "捌", "玖"]
-        units = ["", "拾", "佰", "仟"]
-        return SerialNumberUtil.int_to_chinese(n, chinese_numerals, units)
+        return SerialNumberUtil.int_to_chinese(n, CHINESE_UPPER_CASE_NUMERALS, CHINESE_UPPER_CASE_UNITS)
+
+
+# 编号类型到转换函数的映射，代替逐个比较类型的 if/elif
+SERIAL_NUMBER_FORMATTERS = {
+    SerialNumberType.NUMBER: str,
+    SerialNumberType.ROMAN_LOWER_CASE: SerialNumberUtil.int_to_roman_lower_case,
+    SerialNumberType.ROMAN_UPPER_CASE: SerialNumberUtil.int_to_roman_upper_case,
+    SerialNumberType.ALPHABET_LOWER_CASE: SerialNumberUtil.int_to_alphabet_lower_case,
+    SerialNumberType.ALPHABET_UPPER_CASE: SerialNumberUtil.int_to_alphabet_upper_case,
+    SerialNumberType.CHINESE_LOWER_CASE: SerialNumberUtil.int_to_chinese_lower_case,
+    SerialNumberType.CHINESE_UPPER_CASE: SerialNumberUtil.int_to_chinese_upper_case,
+}
+
+
+class SerialNumberGenerator:
+    """
+    该类根据标题编号配置生成层级编号。每一级的格式（转换函数、前缀、后缀）只在初始化时解析一次，
+    各级已经生成的编号前缀会被缓存，新的标题只需要生成它所在层级的编号，而不必从第一级开始重新拼接
+    """
+
+    def __init__(self, serial_number_config_array: list):
+        """
+        该函数用于初始化编号生成器
+        :param serial_number_config_array:  标题编号的配置
+        """
+        self.serial_number_config_array = serial_number_config_array
+        self.levels = []
+        for config in serial_number_config_array:
+            serial_number_type = SerialNumberType(config.serial_number_type)
+            self.levels.append((SERIAL_NUMBER_FORMATTERS[serial_number_type], serial_number_type,
+                                config.prefix, config.suffix, config.remove_last_suffix, config.independent,
+                                config.start_index - 1))
+        self.counters = [0] * len(self.levels)
+        # prefixes[i] 为第 i 级（包括后缀）及其上级的编号，None 表示需要重新生成
+        self.prefixes = [None] * len(self.levels)
+        # 自上次重置以来生成过编号的最小层级，分章节合并时用于推算下一章节开始时的计数器
+        self.lowest_level = None
+
+    def reset(self, counters=None):
+        """
+        该函数用于清空所有计数器，以便同一个编号生成器（及其解析好的格式）用于下一次合并
+        :param counters:    各级计数器的初始值，为 None 时全部为 0。分章节合并时为该章节开始时的计数器
+        """
+        self.counters = [0] * len(self.levels) if counters is None else list(counters)
+        self.prefixes = [None] * len(self.levels)
+        self.lowest_level = None
+
+    def format(self, level: int) -> str:
+        """
+        该函数用于生成某一级的编号（不包括上级的编号与后缀）
+        :param level:   层级，从 0 开始
+        :return:        该级的编号
+        """
+        formatter, serial_number_type, prefix, _, _, _, offset = self.levels[level]
+        index = self.counters[level] + offset
+        try:
+            return prefix + formatter(index)
+        except ValueError:
+            raise SerialNumberOverflowError(level + 1, serial_number_type, index)
+
+    def get_prefix(self, level: int) -> str:
+        """
+        该函数用于获取某一级（包括后缀）及其上级的编号，结果会被缓存直到该级的计数器发生变化
+        :param level:   层级，从 0 开始
+        :return:        编号前缀
+        """
+        if level < 0:
+            return ''
+        prefix = self.prefixes[level]
+        if prefix is None:
+            suffix, independent = self.levels[level][3], self.levels[level][5]
+            parent = '' if independent else self.get_prefix(level - 1)
+            prefix = self.prefixes[level] = parent + self.format(level) + suffix
+        return prefix
+
+    def count(self, level: int):
+        """
+        该函数用于为一个新的标题更新计数器，但不生成编号
+        :param level:   标题的层级，从 1 开始，不能大于配置的层级数
+        """
+        counters = self.counters
+        prefixes = self.prefixes
+        index = level - 1
+        if self.lowest_level is None or level < self.lowest_level:
+            self.lowest_level = level
+        counters[index] += 1
+        # 清空下级的计数器，同时使本级与下级缓存的编号失效
+        for i in range(index, len(counters)):
+            if i > index:
+                counters[i] = 0
+            prefixes[i] = None
+
+    def next(self, level: int) -> str:
+        """
+        该函数用于为一个新的标题生成编号
+        :param level:   标题的层级，从 1 开始，不能大于配置的层级数
+        :return:        标题的编号
+        """
+        self.count(level)
+        index = level - 1
+        _, _, _, suffix, remove_last_suffix, independent, _ = self.levels[index]
+        if remove_last_suffix:
+            parent = '' if independent else self.get_prefix(index - 1)
+            return parent + self.format(index)
+        return self.get_prefix(index)
+
+    def check_config(self):
+        """
+        该函数用于在处理标题之前检查配置：每一级的起始索引必须在编号类型的范围之内，
+        例如字母与罗马数字不支持 0，从而在合并之前而不是写入输出文件时发现错误
+        """
+        for level, (_, serial_number_type, _, _, _, _, offset) in enumerate(self.levels, start=1):
+            low, high = SERIAL_NUMBER_RANGES[serial_number_type]
+            if offset + 1 < low or (high is not None and offset + 1 > high):
+                raise SerialNumberOverflowError(level, serial_number_type, offset + 1)
 
 
 class SerialTitleStrategy:
@@ -260,7 +434,8 @@ class SerialTitleStrategy:
         :return:        普通标题
         """
         new_title = f"{hashes} {title}"
-        get_logger().info(f'{t("Renumbered titles(Title Strategy):")} {new_title}')
+        if is_debug_enabled():
+            get_logger().debug(f'{t("Renumbered titles(Title Strategy):")} {new_title}')
         return new_title
 
     @staticmethod
@@ -273,7 +448,8 @@ class SerialTitleStrategy:
         :return:        引用标题
         """
         new_title = f"\n> {title}\n"
-        get_logger().info(f'{t("Renumbered titles(Title Strategy):")} {new_title}')
+        if is_debug_enabled():
+            get_logger().debug(f'{t("Renumbered titles(Title Strategy):")} {new_title}')
         return new_title
 
     @staticmethod
@@ -285,156 +461,242 @@ class SerialTitleStrategy:
         :return:        标题
         """
         new_title = f"{title}\n"
-        get_logger().info(f'{t("Renumbered titles(Title Strategy):")} {new_title}')
+        if is_debug_enabled():
+            get_logger().debug(f'{t("Renumbered titles(Title Strategy):")} {new_title}')
         return new_title
 
 
-def remove_title_serial(lines: list, serial_number_regex_list: list = None) -> list:
+# 默认的标题编号正则表达式列表
+DEFAULT_SERIAL_NUMBER_REGEX_LIST = [
+    # 数字后跟一个点，例如 "1.", "1.1.", "1.1.1.", ...
+    r'^(\d+\.)+',
+
+    # 数字点数字，例如 "1.1", "1.1.1"
+    r'^\d+[\.\d+]*',
+
+    # 中文数字后跟“章”，例如 "第一章"
+    r'^第[零一二三四五六七八九十]+(章|节|小节|讲|部分)',
+
+    # 括号中的数字或字母，例如 "(1)", "[a]", "{A}", "1]", "A)", "a}", "(a1)", "(Aa)"
+    r'^[\(\[\{]?[a-zA-Z0-9]+[\)\]\}]'
+]
+
+# 默认的标题编号生成配置
+DEFAULT_SERIAL_NUMBER_CONFIG_ARRAY = [
+    SerialNumberConfig(prefix='', suffix='.', remove_last_suffix=True, independent=True,
+                       serial_number_type=SerialNumberType.NUMBER, start_index=1),
+    SerialNumberConfig(prefix='', suffix='.', remove_last_suffix=True, independent=False,
+                       serial_number_type=SerialNumberType.NUMBER, start_index=1),
+    SerialNumberConfig(prefix='', suffix='.', remove_last_suffix=True, independent=False,
+                       serial_number_type=SerialNumberType.NUMBER, start_index=1),
+    SerialNumberConfig(prefix='(', suffix=')', remove_last_suffix=False, independent=True,
+                       serial_number_type=SerialNumberType.ALPHABET_LOWER_CASE, start_index=1),
+    SerialNumberConfig(prefix='', suffix=')', remove_last_suffix=False, independent=True,
+                       serial_number_type=SerialNumberType.ROMAN_LOWER_CASE, start_index=1),
+]
+
+
+class TitleTransformer:
+    """
+    该类用于在一次遍历中完成标题序号的移除与重新编号，输入为 tokenize 分类后的行，
+    因此每一行只会被分类一次，各阶段对代码块的判断也始终一致
+    """
+
+    def __init__(self, serial_number_regex_list: list = None, serial_number_config_array: list = None,
+                 handel_unserial_number_title: Callable[[str, str], str] = SerialTitleStrategy.normal,
+                 handle_title_greater_than_level_six: Callable[[str, str], str] = SerialTitleStrategy.cite,
+                 remove_serial: bool = True, renumber: bool = True,
+                 serial_number_matcher: SerialNumberMatcher = None, anchor_index=None,
+                 serial_number_generator: SerialNumberGenerator = None, toc=None):
+        """
+        该函数用于初始化标题处理器
+        :param serial_number_regex_list:                标题编号与标题的分隔符正则表达式列表
+        :param serial_number_config_array:              标题编号的配置
+        :param handel_unserial_number_title:            处理未编号的标题的函数
+        :param handle_title_greater_than_level_six:     处理大于六级的标题的函数
+        :param remove_serial:                           是否移除原有的标题编号
+        :param renumber:                                是否为标题重新编号
+        :param serial_number_matcher:                   已编译的标题编号匹配器，如果提供，则忽略 serial_number_regex_list
+        :param anchor_index:                            锚点索引（AnchorIndex），如果提供，则在处理标题的同时记录标题的锚点
+        :param serial_number_generator:                 已创建的编号生成器，如果提供，则清空其计数器后使用，
+                                                        并忽略 serial_number_config_array
+        :param toc:                                     目录（TableOfContents），如果提供，则在处理标题的同时记录目录项
+        """
+        if serial_number_matcher is None:
+            if serial_number_regex_list is None:
+                serial_number_regex_list = DEFAULT_SERIAL_NUMBER_REGEX_LIST
+            serial_number_matcher = compile_serial_number_matcher(serial_number_regex_list)
+        if serial_number_generator is not None:
+            serial_number_config_array = serial_number_generator.serial_number_config_array
+        elif serial_number_config_array is None:
+            serial_number_config_array = DEFAULT_SERIAL_NUMBER_CONFIG_ARRAY
+        self.serial_number_matcher = serial_number_matcher
+        self.serial_number_config_array = serial_number_config_array
+        self.handel_unserial_number_title = handel_unserial_number_title
+        self.handle_title_greater_than_level_six = handle_title_greater_than_level_six
+        self.remove_serial = remove_serial
+        self.renumber = renumber
+        self.anchor_index = anchor_index
+        self.toc = toc
+        # 编号生成器中保存了每个级别的计数器
+        if renumber and serial_number_generator is not None:
+            serial_number_generator.reset()
+        elif renumber:
+            serial_number_generator = SerialNumberGenerator(serial_number_config_array)
+        self.serial_number_generator = serial_number_generator if renumber else None
+        # 用于运行报告的统计：处理过的标题数、去除的编号数、重新编号的标题数
+        self.headings = 0
+        self.removed = 0
+        self.renumbered = 0
+        # 逐个标题的日志只在 DEBUG 级别输出，未启用时跳过日志消息的格式化与翻译
+        self.debug = is_debug_enabled()
+
+    def remove_title_serial(self, token: LineToken):
+        """
+        该函数用于去除一个标题的编号，直接修改传入的标题
+        :param token:   分类为标题的行
+        """
+        # 只处理 "# 标题" 形式的标题
+        if not token.text.startswith(' '):
+            return
+        title_name = token.text.strip()
+        # 如果标题名中包含能被标题编号与标题分隔符正则表达式匹配的内容，那么就去除匹配到的内容
+        # 如果有多个，就去除最长的那个
+        max_length_match = self.serial_number_matcher.longest_match(title_name)
+        if max_length_match:
+            if self.debug:
+                get_logger().debug(f'{t("Remove the title sequence number:")} {max_length_match}')
+            title_name = title_name[len(max_length_match):].strip()
+            self.removed += 1
+        token.text = f" {title_name}\n"
+        token.line = '#' * token.level + token.text
+
+    def renumber_title(self, token: LineToken) -> str:
+        """
+        该函数用于为一个标题重新编号
+        :param token:   分类为标题的行
+        :return:        重新编号后的行
+        """
+        text = token.text
+        # 只处理 "# 标题" 形式且标题非空的标题
+        if len(text) < 2 or text[0] != ' ' or text[1] == '\n':
+            return token.line
+        hashes = '#' * token.level
+        title = text.strip()
+        level = token.level
+
+        # 如果标题的层级大于6，那么就执行handle_title_greater_than_level_six函数
+        if level > 6:
+            return self.handle_title_greater_than_level_six(hashes, title)
+
+        # 如果标题的层级大于配置的层级，那么就执行handel_unserial_number_title函数
+        if level > len(self.serial_number_config_array):
+            return self.handel_unserial_number_title(hashes, title)
+
+        # 为标题添加编号，上级的编号由编号生成器缓存
+        serial_number = self.serial_number_generator.next(level)
+
+        new_line = f"{hashes} {serial_number} {title}\n"
+        if self.debug:
+            get_logger().debug(f'{t("Renumbered titles:")} {new_line}')
+        self.renumbered += 1
+        return new_line
+
+    def count_title(self, token: LineToken):
+        """
+        该函数用于只更新编号生成器的计数器而不生成编号，哪些标题会被编号与 renumber_title 的判断一致。
+        分章节合并时，各章节先以此记录其标题对计数器的影响，之后才能确定每个章节开始时的计数器
+        :param token:   分类为标题的行
+        """
+        text = token.text
+        if len(text) < 2 or text[0] != ' ' or text[1] == '\n':
+            return
+        if token.level > 6 or token.level > len(self.serial_number_config_array):
+            return
+        self.serial_number_generator.count(token.level)
+
+    def transform(self, tokens: Iterable[LineToken]) -> Iterator[str]:
+        """
+        该函数用于在一次遍历中处理所有标题
+        :param tokens:  分类后的行迭代器
+        :return:        处理后的Markdown文件的行迭代器（生成器）
+        """
+        remove_serial = self.remove_serial
+        renumber = self.renumber
+        anchor_index = self.anchor_index
+        toc = self.toc
+        for token in tokens:
+            if token.kind is not LineKind.HEADING:
+                yield token.line
+                continue
+            self.headings += 1
+            if remove_serial:
+                self.remove_title_serial(token)
+            line = self.renumber_title(token) if renumber else token.line
+            if anchor_index is not None:
+                anchor_index.add_heading(token.anchor, line)
+            if toc is not None:
+                toc.add_heading(line)
+            yield line
+        report = get_report()
+        report.count('headings_seen', self.headings)
+        if remove_serial:
+            report.count('serial_numbers_removed', self.removed)
+            get_logger().info(f'{t("Remove the title sequence number:")} {self.removed}/{self.headings}')
+        if renumber:
+            report.count('headings_renumbered', self.renumbered)
+            get_logger().info(f'{t("Renumbered titles:")} {self.renumbered}/{self.headings}')
+
+
+def renumber_titles(tokens: Iterable[LineToken], serial_number_config_array: list = None,
+                    handel_unserial_number_title: Callable[[str, str], str] = SerialTitleStrategy.normal,
+                    handle_title_greater_than_level_six: Callable[[str, str], str] = SerialTitleStrategy.cite,
+                    anchor_index=None, serial_number_generator: SerialNumberGenerator = None,
+                    toc=None) -> Iterator[str]:
+    """
+    为已经去除编号的标题重新编号，通常用于处理 merge 的返回值
+    :param tokens:                                  分类后的行迭代器
+    :param serial_number_config_array:              标题编号的配置
+    :param handel_unserial_number_title:            处理未编号的标题的函数
+    :param handle_title_greater_than_level_six:     处理大于六级的标题的函数
+    :param anchor_index:                            锚点索引（AnchorIndex），如果提供，则在重新编号的同时记录标题的锚点
+    :param serial_number_generator:                 已创建的编号生成器，如果提供，则忽略 serial_number_config_array
+    :param toc:                                     目录（TableOfContents），如果提供，则在重新编号的同时记录目录项
+    :return:                                        重新编号后的Markdown文件的行迭代器（生成器）
+    """
+    transformer = TitleTransformer(serial_number_config_array=serial_number_config_array,
+                                   handel_unserial_number_title=handel_unserial_number_title,
+                                   handle_title_greater_than_level_six=handle_title_greater_than_level_six,
+                                   remove_serial=False, anchor_index=anchor_index,
+                                   serial_number_generator=serial_number_generator, toc=toc)
+    return transformer.transform(tokens)
+
+
+def remove_title_serial(lines: Iterable[str], serial_number_regex_list: list = None) -> Iterator[str]:
     """
     该函数用于将Markdown文件中的标题编号去除
     :param serial_number_regex_list:    标题编号与标题的分隔符正则表达式列表
-    :param lines:                       Markdown文件的行列表
-    :return:                            去除标题编号后的Markdown文件的行列表
+    :param lines:                       Markdown文件的行迭代器
+    :return:                            去除标题编号后的Markdown文件的行迭代器（生成器）
     """
-    logger = get_logger()
-    if serial_number_regex_list is None:
-        serial_number_regex_list = [
-            # 数字后跟一个点，例如 "1.", "1.1.", "1.1.1.", ...
-            r'^(\d+\.)+',
-
-            # 数字点数字，例如 "1.1", "1.1.1"
-            r'^\d+[\.\d+]*',
-
-            # 中文数字后跟“章”，例如 "第一章"
-            r'^第[零一二三四五六七八九十]+(章|节|小节|讲|部分)',
-
-            # 括号中的数字或字母，例如 "(1)", "[a]", "{A}", "1]", "A)", "a}", "(a1)", "(Aa)"
-            r'^[\(\[\{]?[a-zA-Z0-9]+[\)\]\}]'
-        ]
-    result = []
-    in_code_block = False
-    for line in lines:
-        # 计算该行前面有多少个空格
-        previous_spaces = len(line) - len(line.lstrip())
-        # 1. 跳过空行
-        # 2. 如果有4个及以上的空格，那么就是单行代码块
-        if previous_spaces >= 4 or line.strip() == '':
-            result.append(line)
-            continue
-
-        line = line.lstrip()
-        if line.startswith('```'):
-            in_code_block = not in_code_block
-            result.append(line)
-            continue
-
-        if line.startswith('#') and not in_code_block:
-            match = re.match(r'^(?P<title_level>#+) (?P<title_name>.*)$', line)
-            if match:
-                title_level = match.group('title_level')
-                title_name = match.group('title_name')
-                title_name = title_name.strip()
-                # 如果标题名中包含能被标题编号与标题分隔符正则表达式匹配的内容，那么就去除匹配到的内容
-                # 如果有多个，就去除最长的那个
-                max_length_match = ""
-                for serial_number_regex in serial_number_regex_list:
-                    match = re.match(serial_number_regex, title_name)
-                    if match and len(match.group()) > len(max_length_match):
-                        max_length_match = match.group()
-                if max_length_match:
-                    logger.info(f'{t("Remove the title sequence number:")} {max_length_match}')
-                    title_name = title_name.split(max_length_match, 1)[-1].strip()
-                line = f"{title_level} {title_name}\n"
-        result.append(line)
-    return result
-
-
-def renumber_title(lines: list, serial_number_config_array: list,
+    transformer = TitleTransformer(serial_number_regex_list=serial_number_regex_list, renumber=False)
+    return transformer.transform(tokenize(lines))
+
+
+def renumber_title(lines: Iterable[str], serial_number_config_array: list,
                    handel_unserial_number_title: Callable[[str, str], str] = SerialTitleStrategy.normal,
-                   handle_title_greater_than_level_six: Callable[[str, str], str] = SerialTitleStrategy.cite) -> list:
+                   handle_title_greater_than_level_six: Callable[[str, str], str] = SerialTitleStrategy.cite) -> Iterator[str]:
     """
     为标题重新编号
-    :param lines:                                   Markdown文件的行列表
+    :param lines:                                   Markdown文件的行迭代器
     :param serial_number_config_array:              标题编号的配置
     :param handel_unserial_number_title:            处理未编号的标题的函数，该函数接收两个参数，第一个参数是标题的级别，第二个参数是标题名称
     :param handle_title_greater_than_level_six:     处理大于六级的标题的函数（因为Markdown最多支持六级标题，第七级将当做普通文本）
                                                     该函数接收两个参数，第一个参数是标题的级别，第二个参数是标题名称
-    :return:                                        重新编号后的Markdown文件的行列表
+    :return:                                        重新编号后的Markdown文件的行迭代器（生成器）
     """
-    logger = get_logger()
-    if serial_number_config_array is None:
-        serial_number_config_array = [
-            SerialNumberConfig(prefix='', suffix='.', remove_last_suffix=True, independent=True,
-                               serial_number_type=SerialNumberType.NUMBER, start_index=1),
-            SerialNumberConfig(prefix='', suffix='.', remove_last_suffix=True, independent=False,
-                               serial_number_type=SerialNumberType.NUMBER, start_index=1),
-            SerialNumberConfig(prefix='', suffix='.', remove_last_suffix=True, independent=False,
-                               serial_number_type=SerialNumberType.NUMBER, start_index=1),
-            SerialNumberConfig(prefix='(', suffix=')', remove_last_suffix=False, independent=True,
-                               serial_number_type=SerialNumberType.ALPHABET_LOWER_CASE, start_index=1),
-            SerialNumberConfig(prefix='', suffix=')', remove_last_suffix=False, independent=True,
-                               serial_number_type=SerialNumberType.ROMAN_LOWER_CASE, start_index=1),
-        ]
-    counters = [0] * len(serial_number_config_array)  # 用于存储每个级别的计数器
-    result = []
-    in_code_block = False
-    for line in lines:
-        # 计算该行前面有多少个空格
-        previous_spaces = len(line) - len(line.lstrip())
-        # 1. 跳过空行
-        # 2. 如果有4个及以上的空格，那么就是单行代码块
-        if previous_spaces >= 4 or line.strip() == '':
-            result.append(line)
-            continue
-        line = line.lstrip()
-
-        if line.startswith('```'):
-            in_code_block = not in_code_block
-            result.append(line)
-            continue
-
-        match = re.match(r'^(#+) (.+)', line)
-        if match and not in_code_block:
-            hashes, title = match.groups()
-            title = title.strip()
-            level = len(hashes)
-
-            # 如果标题的层级大于6，那么就执行handle_title_greater_than_level_six函数
-            if level > 6:
-                line = handle_title_greater_than_level_six(hashes, title)
-                result.append(line)
-                continue
-
-            # 如果标题的层级大于配置的层级，那么就执行handel_unserial_number_title函数
-            if level > len(serial_number_config_array):
-                line = handel_unserial_number_title(hashes, title)
-                result.append(line)
-                continue
-
-            counters[level - 1] += 1
-            # 清空计数器
-            for i in range(level, len(counters)):
-                counters[i] = 0
-
-            # 为标题添加编号
-            serial_number = ''
-            for i in range(level):
-                serial_number_config = serial_number_config_array[i]
-                if serial_number_config.independent:
-                    serial_number = ''
-                current_serial_number = SerialNumberUtil.get_serial_number(
-                    serial_number_config.serial_number_type,
-                    counters[i] + serial_number_config.start_index - 1
-                )
-                if i == level - 1 and serial_number_config.remove_last_suffix:
-                    serial_number = f"{serial_number}{serial_number_config.prefix}{current_serial_number}"
-                else:
-                    serial_number = f"{serial_number}{serial_number_config.prefix}{current_serial_number}{serial_number_config.suffix}"
-
-            new_line = f"{hashes} {serial_number} {title}\n"
-            logger.info(f'{t("Renumbered titles:")} {new_line}')
-            result.append(new_line)
-        else:
-            result.append(line)
-
-    return result
+    transformer = TitleTransformer(serial_number_config_array=serial_number_config_array,
+                                   handel_unserial_number_title=handel_unserial_number_title,
+                                   handle_title_greater_than_level_six=handle_title_greater_than_level_six,
+                                   remove_serial=False)
+    return transformer.transform(tokenize(lines))
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-19 15:40
+# Author  : Jiang Liu
+# Desc    : 运行报告模块：统计每个处理阶段的耗时、处理过程中的计数以及最慢的源文件，并输出为 JSON
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+
+report = None
+
+
+class RunReport:
+    """
+    该类用于记录一次运行的报告。各阶段以生成器的方式交错执行，因此阶段的耗时按“独占时间”统计：
+    进入嵌套的阶段时，外层阶段暂停计时，所有阶段的耗时之和不会超过总耗时
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = Counter()
+        self.files = []
+        self.stack = []
+        self.start = (time.perf_counter(), time.process_time())
+
+    @contextmanager
+    def stage(self, name):
+        """
+        该函数用于统计一个阶段的耗时，可以嵌套使用
+        :param name:    阶段的名称
+        """
+        now = (time.perf_counter(), time.process_time())
+        if self.stack:
+            self.charge(self.stack[-1], now)
+        entry = [name, now]
+        self.stack.append(entry)
+        try:
+            yield
+        finally:
+            now = (time.perf_counter(), time.process_time())
+            self.charge(entry, now)
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1][1] = now
+            self.stages[name][2] += 1
+
+    def charge(self, entry, now):
+        """
+        该函数用于将从上次计时到现在的耗时计入一个阶段
+        :param entry:   阶段栈中的一项：[名称, (开始的墙钟时间, 开始的CPU时间)]
+        :param now:     (当前的墙钟时间, 当前的CPU时间)
+        """
+        stage = self.stages.get(entry[0])
+        if stage is None:
+            stage = self.stages[entry[0]] = [0.0, 0.0, 0]
+        stage[0] += now[0] - entry[1][0]
+        stage[1] += now[1] - entry[1][1]
+        entry[1] = now
+
+    def count(self, name, value=1):
+        """
+        该函数用于增加一个计数
+        :param name:    计数的名称
+        :param value:   增加的值
+        """
+        self.counters[name] += value
+
+    def add_file(self, path, seconds, size):
+        """
+        该函数用于记录一个源文件的处理耗时
+        :param path:        源文件的路径
+        :param seconds:     读取与处理该文件的耗时（秒）
+        :param size:        源文件的字节数
+        """
+        self.files.append((seconds, path, size))
+
+    def write_lines(self, file, lines, chunk_size=1024):
+        """
+        该函数用于分块写入输出文件，以便分别统计产生各行（重新编号及其上游阶段）与写入文件的耗时
+        :param file:        输出文件
+        :param lines:       输出的行迭代器
+        :param chunk_size:  每块的行数
+        """
+        lines = iter(lines)
+        while True:
+            with self.stage('renumber'):
+                chunk = list(islice(lines, chunk_size))
+            if not chunk:
+                return
+            with self.stage('write'):
+                file.writelines(chunk)
+
+    def collect(self):
+        """
+        该函数用于导出报告的原始数据，工作进程中记录的报告以此传回主进程，再由 merge 合并
+        :return:    (各阶段的耗时, 计数, 源文件的耗时)
+        """
+        return self.stages, dict(self.counters), self.files
+
+    def merge(self, data):
+        """
+        该函数用于合并工作进程中记录的报告。并行执行的各进程的耗时直接相加，因此这时各阶段的耗时之和可能超过总耗时
+        :param data:    工作进程中的报告的 collect 的结果
+        """
+        stages, counters, files = data
+        for name, (wall, cpu, calls) in stages.items():
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = [0.0, 0.0, 0]
+            stage[0] += wall
+            stage[1] += cpu
+            stage[2] += calls
+        self.counters.update(counters)
+        self.files.extend(files)
+
+    def to_dict(self, slowest=10):
+        """
+        该函数用于将报告转换为字典
+        :param slowest:     输出最慢的源文件的数量
+        :return:            报告的字典
+        """
+        wall = time.perf_counter() - self.start[0]
+        cpu = time.process_time() - self.start[1]
+        return {
+            'total': {'wall_seconds': round(wall, 6), 'cpu_seconds': round(cpu, 6)},
+            'stages': {name: {'wall_seconds': round(stage[0], 6), 'cpu_seconds': round(stage[1], 6),
+                              'calls': stage[2]}
+                       for name, stage in self.stages.items()},
+            'counters': dict(self.counters),
+            'slowest_files': [{'path': path, 'seconds': round(seconds, 6), 'bytes': size}
+                              for seconds, path, size in sorted(self.files, reverse=True)[:slowest]],
+        }
+
+    def dump(self, path, slowest=10):
+        """
+        该函数用于将报告写入 JSON 文件
+        :param path:        报告文件的路径
+        :param slowest:     输出最慢的源文件的数量
+        """
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(slowest), file, ensure_ascii=False, indent=2)
+
+
+class NullReport:
+    """
+    该类在未启用运行报告时使用，所有操作都不做任何事情，调用方因此无需判断是否启用了报告
+    """
+
+    def stage(self, name):
+        return nullcontext()
+
+    def count(self, name, value=1):
+        pass
+
+    def add_file(self, path, seconds, size):
+        pass
+
+    def write_lines(self, file, lines, chunk_size=1024):
+        file.writelines(lines)
+
+    def merge(self, data):
+        pass
+
+
+NULL_REPORT = NullReport()
+
+
+def init_report():
+    """
+    初始化运行报告，之后 get_report 将返回该报告
+    """
+    global report
+    report = RunReport()
+    return report
+
+
+def is_report_enabled():
+    """
+    判断是否启用了运行报告，用于决定工作进程是否需要记录报告并传回主进程
+    """
+    return report is not None
+
+
+def get_report():
+    """
+    获取运行报告，如果未启用运行报告，则返回不做任何事情的 NullReport
+    """
+    return report if report is not None else NULL_REPORT
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-12 16:05
+# Author  : Jiang Liu
+# Desc    : 标题编号匹配器：一次性编译所有正则，并按标题首字符预筛选，返回最长的编号
+import re
+from functools import lru_cache
+
+# 首字符预筛选需要知道正则可能以哪些字符开头，标准库没有公开的接口，只能使用 re 模块内部的解析器
+# （Python 3.11 起为 re._parser，之前为 sre_parse）。内部接口随版本变化时，预筛选只是失效，
+# 所有正则都会被尝试匹配，结果不变：无法导入或解析时该正则视为可能以任意字符开头
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python 3.10 及以下
+    try:
+        import sre_parse
+        import sre_constants
+    except ImportError:
+        sre_parse = sre_constants = None
+
+# 重复匹配的操作码，POSSESSIVE_REPEAT 仅在 Python 3.11 及以上存在
+_REPEAT_OPCODES = tuple(getattr(sre_constants, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                        if hasattr(sre_constants, name))
+
+
+def _set_contains(items, char):
+    """
+    该函数用于判断字符是否可能属于正则表达式中的字符集合（即 [...] 或 \\d 等）
+    :param items:   解析后的字符集合
+    :param char:    字符
+    :return:        True 表示可能属于，False 表示一定不属于
+    """
+    negate = False
+    member = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            member = member or ord(char) == av
+        elif op is sre_constants.RANGE:
+            member = member or av[0] <= ord(char) <= av[1]
+        elif op is sre_constants.CATEGORY and av is sre_constants.CATEGORY_DIGIT:
+            member = member or char.isdecimal()
+        elif op is sre_constants.CATEGORY and av is sre_constants.CATEGORY_NOT_DIGIT:
+            member = member or not char.isdecimal()
+        else:
+            # 无法精确判断的情况，保守地认为可能属于
+            return True
+    return member != negate
+
+
+def _can_start_with(data, char):
+    """
+    该函数用于判断解析后的正则表达式是否可能以指定字符开头
+    :param data:    解析后的正则表达式序列
+    :param char:    字符
+    :return:        (是否可能以该字符开头, 是否可能不消耗任何字符)
+    """
+    for op, av in data:
+        if op is sre_constants.LITERAL:
+            starts, empty = ord(char) == av, False
+        elif op is sre_constants.NOT_LITERAL:
+            starts, empty = ord(char) != av, False
+        elif op is sre_constants.IN:
+            starts, empty = _set_contains(av, char), False
+        elif op is sre_constants.AT:
+            starts, empty = False, True
+        elif op is sre_constants.SUBPATTERN:
+            group, add_flags, del_flags, pattern = av
+            if add_flags & (re.IGNORECASE | re.LOCALE):
+                return True, True
+            starts, empty = _can_start_with(pattern.data, char)
+        elif op is sre_constants.BRANCH:
+            starts, empty = False, False
+            for branch in av[1]:
+                branch_starts, branch_empty = _can_start_with(branch.data, char)
+                starts, empty = starts or branch_starts, empty or branch_empty
+        elif op in _REPEAT_OPCODES:
+            min_count, max_count, pattern = av
+            starts, empty = _can_start_with(pattern.data, char)
+            empty = empty or min_count == 0
+        else:
+            # 其他情况（任意字符、断言、引用等）保守地认为可能匹配
+            return True, True
+        if starts:
+            return True, empty
+        if not empty:
+            return False, False
+    return False, True
+
+
+def _parse(pattern):
+    """
+    该函数用于解析正则表达式，供首字符预筛选使用
+    :param pattern:     已编译的正则
+    :return:            解析后的正则表达式序列，不参与预筛选（带有忽略大小写等标志，或无法解析）时返回 None
+    """
+    # 带有忽略大小写等标志的正则不参与预筛选，始终尝试匹配
+    if sre_parse is None or pattern.flags & (re.IGNORECASE | re.LOCALE):
+        return None
+    try:
+        return sre_parse.parse(pattern.pattern, pattern.flags).data
+    except Exception:
+        return None
+
+
+def _may_start_with(parsed, char):
+    """
+    该函数用于判断正则是否可能匹配以指定字符开头的标题，分析失败时保守地认为可能匹配
+    :param parsed:  _parse 的结果
+    :param char:    标题的首字符
+    :return:        是否可能匹配
+    """
+    if parsed is None:
+        return True
+    try:
+        return _can_start_with(parsed, char)[0]
+    except Exception:
+        return True
+
+
+class SerialNumberMatcher:
+    """
+    该类用于匹配标题开头的编号。所有正则在构造时编译一次，并按标题首字符缓存可能匹配的正则，
+    因此每个标题只需尝试少数几个正则即可找到最长的编号
+    """
+
+    def __init__(self, serial_number_regex_list):
+        """
+        该函数用于初始化标题编号匹配器
+        :param serial_number_regex_list:    标题编号的正则表达式列表，元素可以是字符串或已编译的正则
+        """
+        self.patterns = [re.compile(regex) for regex in serial_number_regex_list]
+        self.parsed = [_parse(pattern) for pattern in self.patterns]
+        self.candidates = {}
+
+    def __reduce__(self):
+        # 解析后的正则与 match 方法无法序列化，传给其他进程时只传递正则，在目标进程中重新解析
+        return SerialNumberMatcher, (self.patterns,)
+
+    def get_candidates(self, char):
+        """
+        该函数用于获取可能匹配以指定字符开头的标题的正则
+        :param char:    标题的首字符
+        :return:        正则的 match 方法元组，顺序与配置中的顺序一致
+        """
+        candidates = self.candidates.get(char)
+        if candidates is None:
+            candidates = tuple(
+                pattern.match for pattern, parsed in zip(self.patterns, self.parsed)
+                if _may_start_with(parsed, char)
+            )
+            self.candidates[char] = candidates
+        return candidates
+
+    def longest_match(self, title_name: str) -> str:
+        """
+        该函数用于获取标题开头最长的编号
+        :param title_name:  标题名称
+        :return:            最长的编号，如果没有匹配到，则返回空字符串
+        """
+        max_length_match = ""
+        # 空标题只可能得到空的匹配结果
+        if not title_name:
+            return max_length_match
+        for match_function in self.get_candidates(title_name[0]):
+            match = match_function(title_name)
+            if match and len(match.group()) > len(max_length_match):
+                max_length_match = match.group()
+        return max_length_match
+
+
+@lru_cache(maxsize=32)
+def _compile_serial_number_matcher(serial_number_regex_tuple):
+    return SerialNumberMatcher(serial_number_regex_tuple)
+
+
+def compile_serial_number_matcher(serial_number_regex_list) -> SerialNumberMatcher:
+    """
+    该函数用于获取标题编号匹配器，相同的正则列表会复用同一个匹配器（包括其首字符缓存）
+    :param serial_number_regex_list:    标题编号的正则表达式列表
+    :return:                            标题编号匹配器
+    """
+    return _compile_serial_number_matcher(tuple(serial_number_regex_list))
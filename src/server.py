@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-25 10:40
+# Author  : Jiang Liu
+# Desc    : 服务模式：通过本地 HTTP 服务提供合并后的文档，供预览工具读取。合并结果按文档树的指纹缓存，
+#           指纹不变时直接返回缓存；客户端的 If-None-Match 与 ETag 一致时返回 304；
+#           重新合并期间到达的请求等待同一次合并的结果，而不是各自重新合并
+import hashlib
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from src.i18n import translate as t
+from src.log import get_logger
+from src.watcher import take_snapshot
+
+# 提供合并后文档的路径
+SERVE_PATH = '/merged.md'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+
+def parse_address(address):
+    """
+    该函数用于解析服务的监听地址
+    :param address:     "主机:端口"、":端口" 或 "端口"，省略主机时只监听本机
+    :return:            (主机, 端口)
+    """
+    host, _, port = address.rpartition(':')
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"{t('Serve address')} '{address}' {t('is invalid')}")
+    if not 0 <= port <= 65535:
+        raise ValueError(f"{t('Serve address')} '{address}' {t('is invalid')}")
+    return host.strip('[]') or DEFAULT_HOST, port
+
+
+def take_tree_fingerprint(root_path):
+    """
+    该函数用于计算文档树的指纹：所有 Markdown 文件（包括侧边栏文件）的路径、修改时间与大小的哈希值。
+    只读取目录与文件的元数据，不读取文件内容
+    :param root_path:   Docsify的根目录
+    :return:            指纹（十六进制字符串）
+    """
+    fingerprint = hashlib.blake2b(digest_size=16)
+    for path, (mtime, size) in sorted(take_snapshot(root_path).items()):
+        fingerprint.update(f"{path}\0{mtime}\0{size}\n".encode('utf-8', 'surrogateescape'))
+    return fingerprint.hexdigest()
+
+
+class MergedDocument:
+    """
+    该类用于保存一次合并的结果
+    """
+
+    def __init__(self, fingerprint, content=None, error=None):
+        """
+        该函数用于初始化合并结果
+        :param fingerprint:     合并开始前文档树的指纹
+        :param content:         合并后的文档（UTF-8 编码），合并失败时为 None
+        :param error:           合并失败时的错误信息
+        """
+        self.fingerprint = fingerprint
+        self.content = content
+        self.error = error
+        # ETag 由内容计算，文件被修改但合并结果不变时，客户端的缓存仍然有效
+        self.etag = None if content is None else f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+class MergedDocumentCache:
+    """
+    该类用于缓存合并后的文档，并保证同一时间只有一个线程在合并：
+    文档树的指纹与缓存一致时直接返回缓存，否则等待正在进行的合并完成，合并结果仍不是最新时才重新合并
+    """
+
+    def __init__(self, merger):
+        """
+        该函数用于初始化缓存
+        :param merger:  合并器（DocsifyMerger），只会在持有锁时使用
+        """
+        self.merger = merger
+        self.lock = threading.Lock()
+        self.document = None
+        # 用于输出日志的统计：合并次数，以及等待其他请求的合并结果的次数
+        self.builds = 0
+        self.coalesced = 0
+
+    def get(self):
+        """
+        该函数用于获取最新的合并结果
+        :return:    合并结果（MergedDocument）
+        """
+        fingerprint = take_tree_fingerprint(self.merger.docsify_path)
+        document = self.document
+        if document is not None and document.fingerprint == fingerprint:
+            return document
+        with self.lock:
+            document = self.document
+            if document is not None and document.fingerprint == fingerprint:
+                self.coalesced += 1
+                return document
+            self.document = document = self.build(fingerprint)
+            return document
+
+    def build(self, fingerprint):
+        """
+        该函数用于重新合并，合并失败的结果同样被缓存，直到文档树发生变化
+        :param fingerprint:     合并开始前文档树的指纹。合并期间文件发生变化时，下一次请求的指纹不同，会再次合并
+        :return:                合并结果（MergedDocument）
+        """
+        logger = get_logger()
+        start = time.perf_counter()
+        self.builds += 1
+        try:
+            # 行缓冲中的文档已经是 UTF-8 字节，不需要先拼接为一个大字符串再编码
+            content = self.merger.merge_to_buffer().to_bytes()
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            # 编辑过程中文件可能暂时不存在或不完整，文件再次变化后会重新合并
+            logger.error(f"{t('Rebuild failed:')} {e}")
+            return MergedDocument(fingerprint, error=str(e))
+        elapsed = (time.perf_counter() - start) * 1000
+        logger.info(f"{t('Rebuilt in')} {elapsed:.1f} ms, {len(content)} bytes, "
+                    f"{self.coalesced} {t('requests coalesced')}")
+        return MergedDocument(fingerprint, content=content)
+
+
+def etag_matches(if_none_match, etag):
+    """
+    该函数用于判断请求头 If-None-Match 是否与 ETag 一致，按弱比较处理
+    :param if_none_match:   If-None-Match 请求头，可以包含多个以逗号分隔的 ETag 或 "*"
+    :param etag:            当前文档的 ETag
+    :return:                是否一致
+    """
+    if not if_none_match or etag is None:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or (tag[2:] if tag.startswith('W/') else tag) == etag:
+            return True
+    return False
+
+
+class MergedDocumentHandler(BaseHTTPRequestHandler):
+    """
+    该类用于处理 HTTP 请求：GET 与 HEAD 请求 SERVE_PATH 时返回合并后的文档
+    """
+    server_version = 'DocsifyMerger/1.0.0'
+
+    def do_GET(self):
+        self.send_document(head=False)
+
+    def do_HEAD(self):
+        self.send_document(head=True)
+
+    def send_document(self, head):
+        """
+        该函数用于发送合并后的文档
+        :param head:    是否为 HEAD 请求，HEAD 请求只发送响应头
+        """
+        if urlsplit(self.path).path != SERVE_PATH:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        document = self.server.document_cache.get()
+        if document.content is None:
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, explain=document.error)
+            return
+        if etag_matches(self.headers.get('If-None-Match'), document.etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', document.etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/markdown; charset=utf-8')
+        self.send_header('Content-Length', str(len(document.content)))
+        self.send_header('ETag', document.etag)
+        # 客户端每次使用缓存前都需要重新验证，文档未变化时只需要一个 304 响应
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if not head:
+            self.wfile.write(document.content)
+
+    def log_message(self, format, *args):
+        # 访问日志写入日志文件，而不是标准错误输出
+        get_logger().debug(f"{self.address_string()} {format % args}")
+
+
+def serve(merger, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    该函数用于启动服务模式，直到用户按下 Ctrl+C
+    :param merger:  合并器（DocsifyMerger）
+    :param host:    监听的主机
+    :param port:    监听的端口
+    """
+    logger = get_logger()
+    # 只提供合并后的文档，复制到资源目录的图片无法通过 HTTP 访问
+    if merger.assets_dir is not None:
+        raise ValueError(t('Collecting images is not supported in serve mode'))
+    document_cache = MergedDocumentCache(merger)
+    # 启动前先合并一次，第一个请求不需要等待，合并失败时也能尽早看到错误
+    document_cache.get()
+    try:
+        server = ThreadingHTTPServer((host, port), MergedDocumentHandler)
+    except OSError as e:
+        raise ValueError(f"{t('Serve address')} '{host}:{port}' {t('is invalid')}: {e}")
+    server.daemon_threads = True
+    server.document_cache = document_cache
+    url = f"http://{host}:{server.server_address[1]}{SERVE_PATH}"
+    logger.info(f"{t('Serving:')} {url}")
+    print(f"{t('Serving:')} {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info(t('Stop serving'))
+    finally:
+        server.server_close()
@@ -2,7 +2,22 @@
 # Time    : 2023-08-03 22:56
 # Author  : Jiang Liu
 # Desc    : 解析 Docsify 的侧边栏文件 为 SidebarTreeNode 对象（树形结构）
+import os
+import posixpath
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.i18n import translate as t
+from src.log import get_logger
+from src.report import get_report
+
+SIDEBAR_FILE_NAME = '_sidebar.md'
+
+# regex101: https://regex101.com/r/Iyh4Z1/8
+# 侧边栏文件可能有数万行，因此正则只在模块加载时编译一次
+_SIDEBAR_LINE = re.compile(r"^[ ]*- (?:\[(?P<name>.*)\]\([ ]*(?P<link>\S+)?(?:[ ]+[\"\'](?P<title>.*)[\"\'])?[ ]*\)|"
+                           r"(?P<foldername>.*))[ ]*$")
 
 
 class SidebarTreeNode:
@@ -53,12 +68,11 @@ def parse_sidebar(lines, homepage):
         level = indentation // 4 + 1
         while len(stack) > level:
             stack.pop()
-        node = SidebarTreeNode(name=name, link=link, children=[], level=level)
-        if node.link == '/' or node.link == '' or node.link is None:
-            node.link = homepage
         if folder_name is not None:
-            node.name = folder_name
-            node.link = None
+            name, link = folder_name, None
+        elif link == '/' or link == '' or link is None:
+            link = homepage
+        node = SidebarTreeNode(name=name, link=link, children=[], level=level)
         stack[-1].children.append(node)
         stack.append(node)
     return root
@@ -70,23 +84,204 @@ def parse_line(line):
     :param line:    侧边栏文件的每一行
     :return:        该行的缩进、名称、链接、标题
     """
-    indentation = len(line) - len(line.lstrip())
-    line = line.lstrip()
-    name = None
-    link = None
-    title = None
-    folder_name = None
-    # regex101: https://regex101.com/r/Iyh4Z1/8
-    regex = r"^[ ]*- (?:\[(?P<name>.*)\]\([ ]*(?P<link>\S+)?(?:[ ]+[\"\'](?P<title>.*)[\"\'])?[ ]*\)|(?P<foldername>.*))[ ]*$"
-    pattern = re.compile(regex)
-    match = pattern.match(line)
-
-    if match:
-        name = match.group('name')
-        # 替换name中的转义字符：\\ -> \, \[ -> [, \] -> ]
-        if name is not None:
-            name = name.replace('\\\\', '\\').replace('\\[', '[').replace('\\]', ']')
-        link = match.group('link')
-        title = match.group('title')
-        folder_name = match.group('foldername')
+    stripped = line.lstrip()
+    indentation = len(line) - len(stripped)
+    match = _SIDEBAR_LINE.match(stripped)
+    if match is None:
+        return indentation, None, None, None, None
+    name, link, title, folder_name = match.group('name', 'link', 'title', 'foldername')
+    # 替换name中的转义字符：\\ -> \, \[ -> [, \] -> ]
+    if name is not None and '\\' in name:
+        name = name.replace('\\\\', '\\').replace('\\[', '[').replace('\\]', ']')
     return indentation, name, link, title, folder_name
+
+
+def iter_nodes(root):
+    """
+    该函数用于按侧边栏中的顺序（先序）遍历所有节点，不包括根节点
+    :param root:    侧边栏文件的根节点
+    :return:        节点的迭代器（生成器）
+    """
+    stack = list(reversed(root.children))
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+class FileIndex:
+    """
+    该类用于缓存 Docsify 根目录下各个文件夹中的文件名。子侧边栏中的每个条目都需要确认页面是否存在，
+    每个文件夹只列出一次，比逐个条目调用 stat 快得多
+    """
+
+    def __init__(self, docsify_root_path):
+        """
+        该函数用于初始化文件名缓存
+        :param docsify_root_path:   Docsify的根目录
+        """
+        self.docsify_root_path = docsify_root_path
+        self.folders = {}
+
+    def exists(self, path):
+        """
+        该函数用于判断文件是否存在
+        :param path:    文件的路径，相对于根目录、以 "/" 分隔
+        :return:        文件是否存在
+        """
+        folder, _, name = path.rpartition('/')
+        names = self.folders.get(folder)
+        if names is None:
+            try:
+                with os.scandir(os.path.join(self.docsify_root_path, folder)) as entries:
+                    names = frozenset(entry.name for entry in entries if entry.is_file())
+            except OSError:
+                names = frozenset()
+            self.folders[folder] = names
+        return name in names
+
+
+def resolve_sidebar_link(files, folder, link):
+    """
+    该函数用于确定侧边栏中的链接指向的页面：先相对于侧边栏所在的文件夹查找，再相对于根目录查找，
+    因此无论 Docsify 是否开启了 relativePath，子侧边栏中的链接都能被正确解析
+    :param files:   文件名缓存（FileIndex）
+    :param folder:  侧边栏所在的文件夹，相对于根目录、以 "/" 分隔，根目录为空字符串
+    :param link:    侧边栏中的链接
+    :return:        (页面, 子侧边栏所在的文件夹)。页面相对于根目录、以 "/" 分隔，不存在时为 None；
+                    链接指向一个包含侧边栏文件的文件夹（"guide/" 或 "guide/README.md"）时，子侧边栏所在的文件夹不为 None
+    """
+    path = link.split('#', 1)[0].split('?', 1)[0]
+    candidates = [path] if path.startswith('/') or not folder else [f"{folder}/{path}", path]
+    for candidate in candidates:
+        page = candidate.lstrip('/')
+        if not page or page.endswith('/'):
+            page += 'README.md'
+        if '/.' in page or '//' in page or page.startswith('.'):
+            page = posixpath.normpath(page)
+            # 不允许指向根目录之外
+            if page == '..' or page.startswith('../'):
+                continue
+        parent, _, name = page.rpartition('/')
+        nested = parent if name == 'README.md' and files.exists(f"{parent}/{SIDEBAR_FILE_NAME}") else None
+        if not files.exists(page):
+            page = None
+        if page is not None or nested is not None:
+            return page, nested
+    return None, None
+
+
+def read_folder_sidebar(files, folder):
+    """
+    该函数用于读取一个文件夹下的侧边栏文件
+    :param files:   文件名缓存（FileIndex）
+    :param folder:  侧边栏所在的文件夹，相对于根目录、以 "/" 分隔，根目录为空字符串
+    :return:        侧边栏文件的行列表
+    """
+    with open(os.path.join(files.docsify_root_path, folder, SIDEBAR_FILE_NAME), 'r', encoding='utf-8') as file:
+        return file.readlines()
+
+
+def parse_folder_sidebar(files, folder, lines, homepage):
+    """
+    该函数用于解析一个文件夹下的侧边栏文件，并将其中的链接改写为相对于根目录的路径
+    :param files:       文件名缓存（FileIndex）
+    :param folder:      侧边栏所在的文件夹，相对于根目录、以 "/" 分隔，根目录为空字符串
+    :param lines:       侧边栏文件的行列表
+    :param homepage:    Docsify的主页文件
+    :return:            (侧边栏文件的根节点, 所有节点的列表, [(指向子侧边栏的叶子节点, 子侧边栏所在的文件夹)])
+    """
+    root = parse_sidebar(lines, homepage)
+    nodes = list(iter_nodes(root))
+    nested_links = []
+    for node in nodes:
+        if node.link is None or node.link == homepage:
+            continue
+        page, nested = resolve_sidebar_link(files, folder, node.link)
+        if page is not None:
+            node.link = page
+        # 已经列出了子节点的条目不再展开子侧边栏
+        if nested is not None and len(node.children) == 0:
+            nested_links.append((node, nested))
+    return root, nodes, nested_links
+
+
+def load_nested_sidebars(docsify_root_path, homepage, workers=1):
+    """
+    该函数用于解析根目录及各个子文件夹下的侧边栏文件（Docsify 的 loadSidebar），并合并为一棵树：
+    指向某个包含侧边栏文件的文件夹的叶子节点成为目录，其子节点依次为该文件夹的主页与子侧边栏中的所有条目，层级随之加深。
+    子侧边栏在被发现后立即提交给线程池并发读取；解析受 GIL 限制，多线程并不会更快，因此在当前线程中按发现的顺序进行。
+    指向祖先侧边栏的条目（循环）与已经展开过的侧边栏（重复）保持为普通的页面
+    :param docsify_root_path:   Docsify的根目录
+    :param homepage:            Docsify的主页文件
+    :param workers:             并发读取侧边栏文件的线程数，小于等于1时按顺序逐个读取
+    :return:                    合并后的侧边栏文件的根节点
+    """
+    files = FileIndex(docsify_root_path)
+    executor = None
+    if workers is not None and workers > 1:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sidebar')
+
+    def submit(folder):
+        submitted.add(folder)
+        pending.append((folder, None if executor is None else executor.submit(read_folder_sidebar, files, folder)))
+
+    sidebars = {}
+    submitted = set()
+    pending = deque()
+    try:
+        submit('')
+        while pending:
+            folder, future = pending.popleft()
+            lines = read_folder_sidebar(files, folder) if future is None else future.result()
+            sidebars[folder] = parse_folder_sidebar(files, folder, lines, homepage)
+            for _, nested in sidebars[folder][2]:
+                if nested not in submitted:
+                    submit(nested)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    logger = get_logger()
+    grafted = set()
+    cycles = 0
+    duplicates = 0
+
+    def graft(folder, level, chain):
+        nonlocal cycles, duplicates
+        root, nodes, nested_links = sidebars[folder]
+        grafted.add(folder)
+        if level > 0:
+            for node in nodes:
+                node.level += level
+        for node, nested in nested_links:
+            # 指向侧边栏自身所在的文件夹或根目录（例如 "首页"），只是普通的页面
+            if nested == folder or nested == '':
+                continue
+            if nested in chain:
+                cycles += 1
+                cycle = ' -> '.join(posixpath.join(item, SIDEBAR_FILE_NAME) for item in chain + [nested])
+                logger.warning(f"{t('Sidebar cycle:')} {cycle}")
+                continue
+            if nested in grafted:
+                duplicates += 1
+                logger.warning(f"{t('Duplicate sidebar:')} {posixpath.join(nested, SIDEBAR_FILE_NAME)}")
+                continue
+            # 子侧边栏中没有列出该文件夹的主页时，将其作为第一个子节点
+            page = posixpath.join(nested, 'README.md')
+            listed = any(child.link == page for child in sidebars[nested][1])
+            children = graft(nested, node.level, chain + [nested]).children
+            if not listed and files.exists(page):
+                children.insert(0, SidebarTreeNode(name=node.name, link=page, level=node.level + 1))
+            node.link = None
+            node.children = children
+        return root
+
+    tree = graft('', 0, [''])
+    report = get_report()
+    report.count('sidebars_parsed', len(sidebars))
+    report.count('sidebar_cycles', cycles)
+    report.count('sidebar_duplicates', duplicates)
+    logger.info(f"{t('Nested sidebars:')} {len(grafted) - 1}, {t('cycles')} {cycles}, "
+                f"{t('duplicates')} {duplicates}")
+    return tree
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-26 10:30
+# Author  : Jiang Liu
+# Desc    : 分章节输出：侧边栏的每个顶级节点（或按大小合并的若干个相邻顶级节点）输出为一个文件，另外输出一个索引文件。
+#           各章节在进程池中并行合并；标题编号在章节之间保持连续：每个章节先记录其标题对计数器的影响，
+#           依次推算出每个章节开始时的计数器后，再从该计数器开始重新编号并写入章节文件
+import copy
+import os
+import pickle
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import src.log as log
+from src.fragment_cache import FragmentCache, records_to_tokens, tokens_to_records
+from src.i18n import translate as t
+from src.markdown_lexer import LineKind
+from src.merger_markdown import FragmentBuilder, load_sidebar, merge_tree
+from src.output_writer import write_output
+from src.prefetch import iter_markdown_files, iter_sidebar_pages, prefetch_markdown_files
+from src.renumber_title import TitleTransformer
+from src.report import get_report, init_report, is_report_enabled
+from src.sidebar_resolver import SIDEBAR_FILE_NAME, SidebarTreeNode
+
+# 章节的中间结果每次序列化的行数
+RECORD_BATCH_SIZE = 4096
+
+
+class Chapter:
+    """
+    该类用于描述一个输出文件：侧边栏中一个或多个相邻的顶级节点
+    """
+
+    def __init__(self, nodes, output_file_path=None):
+        """
+        该函数用于初始化章节
+        :param nodes:               章节包含的顶级节点
+        :param output_file_path:    章节文件的路径
+        """
+        self.nodes = nodes
+        self.output_file_path = output_file_path
+        # 作为合并时的根节点，与整个侧边栏的根节点一样，各顶级节点之后都会添加一个空行
+        self.root = SidebarTreeNode(children=nodes)
+        # 侧边栏中的空行等没有名称的节点不计入章节名称
+        self.name = ' / '.join(node.name for node in nodes if node.name)
+        # 前面的章节中已经输出过、本章节中只输出引用的页面（只在 dedupe_pages 时使用）
+        self.emitted = frozenset()
+        # 写入后填充：章节文件的大小（字节）以及是否发生了变化
+        self.size = None
+        self.changed = None
+
+
+def get_chapter_size(docsify_root_path, node):
+    """
+    该函数用于估算一个顶级节点合并后的大小，即其中所有页面（重复出现的页面只计一次）的文件大小之和
+    :param docsify_root_path:   Docsify的根目录
+    :param node:                顶级节点
+    :return:                    大小（字节），不存在的文件不计入，合并时再报告错误
+    """
+    size = 0
+    for path in {path for path, _ in iter_sidebar_pages(docsify_root_path, SidebarTreeNode(children=[node]))}:
+        try:
+            size += os.path.getsize(path)
+        except OSError:
+            pass
+    return size
+
+
+def split_chapters(docsify_root_path, root, split_size=None):
+    """
+    该函数用于将侧边栏拆分为章节
+    :param docsify_root_path:   Docsify的根目录
+    :param root:                侧边栏文件的根节点
+    :param split_size:          每个章节的大致大小上限（字节）。为 None 或 0 时每个顶级节点为一个章节；
+                                否则按顺序合并相邻的顶级节点，直到再加入一个节点就会超过上限，单个节点超过上限时单独成为一个章节
+    :return:                    章节（Chapter）的列表
+    """
+    if not split_size:
+        return [Chapter([node]) for node in root.children]
+    chapters = []
+    nodes = []
+    size = 0
+    for node in root.children:
+        node_size = get_chapter_size(docsify_root_path, node)
+        if nodes and size + node_size > split_size:
+            chapters.append(Chapter(nodes))
+            nodes = []
+            size = 0
+        nodes.append(node)
+        size += node_size
+    if nodes:
+        chapters.append(Chapter(nodes))
+    return chapters
+
+
+def get_chapter_paths(output_file_path, count):
+    """
+    该函数用于生成章节文件的路径：与输出文件位于同一目录，文件名为输出文件名加上章节序号，例如 book-01.md
+    :param output_file_path:    输出文件（即索引文件）的路径，以 ".gz" 结尾时章节文件同样使用 gzip 压缩
+    :param count:               章节数
+    :return:                    章节文件路径的列表
+    """
+    folder, name = os.path.split(output_file_path)
+    compress = ''
+    if name.endswith('.gz'):
+        name, compress = name[:-3], '.gz'
+    stem, extension = os.path.splitext(name)
+    width = max(2, len(str(count)))
+    return [os.path.join(folder, f"{stem}-{index:0{width}d}{extension}{compress}") for index in range(1, count + 1)]
+
+
+def chain_counters(counters, chapter_counters, lowest_level):
+    """
+    该函数用于根据一个章节开始时的计数器，推算下一个章节开始时的计数器
+    :param counters:            本章节开始时的各级计数器
+    :param chapter_counters:    本章节从全 0 开始计数后的各级计数器
+    :param lowest_level:        本章节中被编号的标题的最小层级，为 None 时本章节不影响计数器
+    :return:                    下一个章节开始时的各级计数器
+    """
+    if lowest_level is None:
+        return list(counters)
+    # 比最小层级更高的层级不变；最小层级在原来的基础上继续计数；更低的层级在本章节中已经被清空过，与从 0 开始计数的结果相同
+    index = lowest_level - 1
+    return counters[:index] + [counters[index] + chapter_counters[index]] + chapter_counters[index + 1:]
+
+
+def build_chapter(merger, chapter, records_path, collect_report=False):
+    """
+    该函数用于合并一个章节并将去除编号后的行保存到中间文件，在进程池的工作进程中调用
+    :param merger:          合并器（DocsifyMerger）
+    :param chapter:         章节（Chapter）
+    :param records_path:    中间文件的路径
+    :param collect_report:  是否记录本章节的运行报告并返回给主进程
+    :return:                (从全 0 开始计数后的各级计数器, 被编号的标题的最小层级, 运行报告的数据或 None)
+    """
+    log.use_default_logger()
+    report = init_report() if collect_report else None
+    docsify_root_path = merger.docsify_path
+    builder = FragmentBuilder(serial_number_matcher=merger.serial_number_matcher, cache=merger.cache, memo={},
+                              mmap_threshold=merger.mmap_threshold,
+                              repeats=Counter(iter_sidebar_pages(docsify_root_path, chapter.root)),
+                              dedupe_pages=merger.dedupe_pages, expand_includes=merger.expand_includes)
+    paths = iter_markdown_files(docsify_root_path, chapter.root, builder.memo, merger.dedupe_pages,
+                                merger.mmap_threshold, chapter.emitted)
+    sources = prefetch_markdown_files(paths, merger.workers, merger.mmap_threshold)
+    tokens = merge_tree(docsify_root_path, chapter.root, sources, builder, chapter.emitted)
+    # 这里只计数不生成编号：本章节开始时的计数器尚未确定，按全 0 生成上级编号可能超出格式的范围
+    transformer = TitleTransformer(handel_unserial_number_title=merger.handel_unserial_number_title,
+                                   handle_title_greater_than_level_six=merger.handle_title_greater_than_level_six,
+                                   remove_serial=False, serial_number_generator=merger.serial_number_generator)
+    with open(records_path, 'wb') as file:
+        batch = []
+        for token in tokens:
+            if token.kind is LineKind.HEADING:
+                transformer.count_title(token)
+            batch.append(token)
+            if len(batch) >= RECORD_BATCH_SIZE:
+                pickle.dump(tokens_to_records(batch), file, pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            pickle.dump(tokens_to_records(batch), file, pickle.HIGHEST_PROTOCOL)
+    generator = merger.serial_number_generator
+    return generator.counters, generator.lowest_level, None if report is None else report.collect()
+
+
+def load_records(records_path):
+    """
+    该函数用于读取 build_chapter 保存的中间文件
+    :param records_path:    中间文件的路径
+    :return:                分类后的行迭代器（生成器）
+    """
+    with open(records_path, 'rb') as file:
+        while True:
+            try:
+                records = pickle.load(file)
+            except EOFError:
+                return
+            yield from records_to_tokens(records)
+
+
+def write_chapter(merger, chapter, records_path, counters, collect_report=False):
+    """
+    该函数用于从章节开始时的计数器开始重新编号，并写入章节文件，在进程池的工作进程中调用
+    :param merger:          合并器（DocsifyMerger）
+    :param chapter:         章节（Chapter）
+    :param records_path:    build_chapter 保存的中间文件的路径
+    :param counters:        本章节开始时的各级计数器
+    :param collect_report:  是否记录写入本章节的运行报告并返回给主进程
+    :return:                (章节文件的大小, 章节文件是否发生了变化, 运行报告的数据或 None)
+    """
+    log.use_default_logger()
+    report = init_report() if collect_report else None
+    generator = merger.serial_number_generator
+    # 每个章节文件单独显示，因此目录与锚点的去重都只在章节内进行
+    toc = merger.new_table_of_contents()
+    transformer = TitleTransformer(handel_unserial_number_title=merger.handel_unserial_number_title,
+                                   handle_title_greater_than_level_six=merger.handle_title_greater_than_level_six,
+                                   remove_serial=False, serial_number_generator=generator, toc=toc)
+    generator.reset(counters)
+    changed = write_output(chapter.output_file_path, transformer.transform(load_records(records_path)),
+                           raw=merger.mmap_threshold is not None, toc=toc)
+    return os.path.getsize(chapter.output_file_path), changed, None if report is None else report.collect()
+
+
+def build_index(chapters, output_file_path):
+    """
+    该函数用于生成索引文件的内容：按顺序列出所有章节文件及其大小
+    :param chapters:            已写入的章节（Chapter）的列表
+    :param output_file_path:    索引文件的路径，章节文件的链接相对于索引文件所在的目录
+    :return:                    索引文件的行列表
+    """
+    folder = os.path.dirname(output_file_path) or '.'
+    lines = []
+    for chapter in chapters:
+        link = os.path.relpath(chapter.output_file_path, folder)
+        lines.append(f"- [{chapter.name or link}]({link}) ({chapter.size} bytes)\n")
+    return lines
+
+
+def merge_to_chapters(merger, output_file_path, split_size=None, processes=None, initializer=None, initargs=()):
+    """
+    该函数用于分章节合并文档：每个章节写入一个文件，并在 output_file_path 写入索引文件
+    :param merger:              合并器（DocsifyMerger），不支持 resolve_links（章节之间的内链无法改写为文档内的锚点）
+                                与 assets_dir
+    :param output_file_path:    索引文件的路径
+    :param split_size:          每个章节的大致大小上限（字节），为 None 或 0 时每个顶级节点为一个章节
+    :param processes:           进程数，为 None 时使用 CPU 核心数
+    :param initializer:         工作进程的初始化函数，用于在每个进程中初始化日志与语言
+    :param initargs:            初始化函数的参数
+    :return:                    章节（Chapter）的列表
+    """
+    logger = log.get_logger()
+    if merger.resolve_links:
+        raise ValueError(t('Resolving links is not supported when splitting the output'))
+    if merger.assets_dir is not None:
+        raise ValueError(t('Collecting images is not supported when splitting the output'))
+    docsify_root_path = merger.docsify_path
+    root = load_sidebar(docsify_root_path, merger.homepage, merger.nested_sidebars, merger.workers)
+    if root is None:
+        raise ValueError(f"{t('The sidebar file is not exists')}: "
+                         f"{os.path.join(docsify_root_path, SIDEBAR_FILE_NAME)}")
+    chapters = split_chapters(docsify_root_path, root, split_size)
+    for chapter, path in zip(chapters, get_chapter_paths(output_file_path, len(chapters))):
+        chapter.output_file_path = path
+    if merger.dedupe_pages:
+        # 页面只在整本书中第一次出现时输出，之后的章节中只输出引用
+        seen = set()
+        for chapter in chapters:
+            pages = {path for path, _ in iter_sidebar_pages(docsify_root_path, chapter.root)}
+            chapter.emitted = frozenset(pages & seen)
+            seen |= pages
+    output_folder = os.path.dirname(output_file_path)
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+
+    # 多个进程共享同一个缓存目录，缓存的整理在所有章节完成后统一进行一次
+    worker_merger = copy.copy(merger)
+    if merger.cache is not None:
+        worker_merger.cache = FragmentCache(merger.cache.cache_dir, max_size=None,
+                                            config_hash=merger.cache.config_hash)
+    records_paths = [f"{chapter.output_file_path}.{os.getpid()}.records.tmp" for chapter in chapters]
+    # 工作进程中的统计与耗时不会计入主进程的报告，因此在各进程中分别记录，完成后合并
+    report = get_report()
+    collect_report = is_report_enabled()
+    try:
+        if chapters:
+            processes = min(processes or os.cpu_count() or 1, len(chapters))
+            with ProcessPoolExecutor(max_workers=processes, initializer=initializer, initargs=initargs) as executor:
+                builds = [executor.submit(build_chapter, worker_merger, chapter, records_path, collect_report)
+                          for chapter, records_path in zip(chapters, records_paths)]
+                # 按顺序推算每个章节开始时的计数器，前面的章节合并完成后即可开始写入下一个章节，不必等待所有章节
+                counters = [0] * len(merger.serial_number_generator.counters)
+                writes = []
+                for chapter, records_path, build in zip(chapters, records_paths, builds):
+                    chapter_counters, lowest_level, data = build.result()
+                    if data is not None:
+                        report.merge(data)
+                    writes.append(executor.submit(write_chapter, worker_merger, chapter, records_path, counters,
+                                                  collect_report))
+                    counters = chain_counters(counters, chapter_counters, lowest_level)
+                for chapter, write in zip(chapters, writes):
+                    chapter.size, chapter.changed, data = write.result()
+                    if data is not None:
+                        report.merge(data)
+                    logger.info(f"{t('Write chapter file:')} '{chapter.output_file_path}' ({chapter.size} bytes)")
+    finally:
+        for records_path in records_paths:
+            if os.path.exists(records_path):
+                os.remove(records_path)
+    if merger.cache is not None:
+        merger.cache.evict()
+    logger.info(f"{t('Write to output file:')} '{output_file_path}'")
+    write_output(output_file_path, build_index(chapters, output_file_path))
+    return chapters
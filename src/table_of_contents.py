@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-26 15:20
+# Author  : Jiang Liu
+# Desc    : 目录：在重新编号的同一遍中记录每个标题重新编号后的内容与锚点，写入完成后生成目录并拼接到文档的开头，
+#           不需要再次读取与解析合并后的文档
+from src.anchor_index import github_slugify, strip_link_markers, unique_slug
+from src.report import get_report
+
+# 目录默认包含的最大标题层级
+DEFAULT_TOC_DEPTH = 3
+
+
+class TableOfContents:
+    """
+    该类用于收集合并后文档的目录。锚点与 AnchorIndex 一致（GitHub 风格，与 Typora、Pandoc 一致），
+    重复的锚点按文档中所有标题的顺序去重，因此层级超过 max_depth 的标题同样需要记录
+    """
+
+    def __init__(self, max_depth=DEFAULT_TOC_DEPTH):
+        """
+        该函数用于初始化目录
+        :param max_depth:   目录包含的最大标题层级，1 到 6
+        """
+        self.max_depth = max_depth
+        # (层级, 标题的内容, 锚点)
+        self.entries = []
+        # 合并后的锚点出现的次数，用于去重
+        self.counts = {}
+
+    def add_heading(self, line):
+        """
+        该函数用于记录一个重新编号后的标题
+        :param line:    重新编号后的行，不是标题（例如被转换为引用的七级标题）时忽略
+        """
+        if not line.startswith('#'):
+            return
+        text = line.lstrip('#')
+        level = len(line) - len(text)
+        # 解析内链时标题中可能包含内链的占位标记，目录项只保留其描述
+        text = strip_link_markers(text)
+        slug = unique_slug(github_slugify(text), self.counts)
+        if level <= self.max_depth:
+            self.entries.append((level, text.strip(), slug))
+
+    def lines(self):
+        """
+        该函数用于生成目录：以最高的标题层级为第一层的嵌套列表，之后是一个空行
+        :return:    目录的行列表，没有标题时为空列表
+        """
+        if not self.entries:
+            return []
+        top = min(level for level, _, _ in self.entries)
+        lines = [f"{'  ' * (level - top)}- [{text}](#{slug})\n" for level, text, slug in self.entries]
+        lines.append("\n")
+        get_report().count('toc_entries', len(self.entries))
+        return lines
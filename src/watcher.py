@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+# Time    : 2023-08-16 21:12
+# Author  : Jiang Liu
+# Desc    : 监视模式：监视 Docsify 根目录中的 Markdown 文件，发生变化时只重新处理被修改的文件并重新输出
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from src.i18n import translate as t
+from src.log import get_logger
+from src.merger_markdown import FragmentBuilder, load_sidebar, merge_tree
+from src.output_writer import write_output
+from src.prefetch import iter_markdown_files, prefetch_markdown_files
+from src.renumber_title import renumber_titles
+from src.sidebar_resolver import SIDEBAR_FILE_NAME
+
+# inotify 事件掩码，参见 <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_watched_file(path):
+    """
+    该函数用于判断文件的变化是否需要触发重新合并，只有 Markdown 文件会影响合并结果
+    :param path:    文件路径
+    :return:        是否需要触发重新合并
+    """
+    return path.endswith('.md')
+
+
+def iter_watched_folders(root_path):
+    """
+    该函数用于遍历需要监视的文件夹，跳过隐藏文件夹（例如 .git 或缓存目录）
+    :param root_path:   Docsify的根目录
+    :return:            文件夹路径的迭代器（生成器）
+    """
+    for folder, folder_names, _ in os.walk(root_path):
+        folder_names[:] = [name for name in folder_names if not name.startswith('.')]
+        yield folder
+
+
+def take_snapshot(root_path):
+    """
+    该函数用于获取 Docsify 根目录中所有 Markdown 文件（包括各级侧边栏文件）的修改时间与大小
+    :param root_path:   Docsify的根目录
+    :return:            文件路径到 (修改时间, 大小) 的字典
+    """
+    snapshot = {}
+    for folder in iter_watched_folders(root_path):
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_file() and is_watched_file(entry.name):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+class PollingWatcher:
+    """
+    该类通过定期比较文件的修改时间与大小来发现变化，适用于所有平台
+    """
+
+    def __init__(self, root_path, interval=0.5):
+        """
+        该函数用于初始化轮询监视器
+        :param root_path:   Docsify的根目录
+        :param interval:    轮询的间隔（秒）
+        """
+        self.root_path = root_path
+        self.interval = interval
+        self.snapshot = take_snapshot(root_path)
+
+    def poll(self, timeout):
+        """
+        该函数用于等待文件发生变化
+        :param timeout:     最长等待时间（秒），为 None 时一直等待
+        :return:            发生变化的文件路径集合，超时则为空集合
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = take_snapshot(self.root_path)
+            changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            wait = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    该类通过 Linux 的 inotify 接口监视文件变化，无需轮询
+    """
+
+    def __init__(self, root_path):
+        """
+        该函数用于初始化 inotify 监视器
+        :param root_path:   Docsify的根目录
+        """
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.folders = {}
+        for folder in iter_watched_folders(root_path):
+            self.add_watch(folder)
+
+    def add_watch(self, folder):
+        """
+        该函数用于监视一个文件夹
+        :param folder:  文件夹路径
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd >= 0:
+            self.folders[wd] = folder
+
+    def poll(self, timeout):
+        """
+        该函数用于等待文件发生变化
+        :param timeout:     最长等待时间（秒），为 None 时一直等待
+        :return:            发生变化的文件路径集合，超时则为空集合
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            # 事件队列溢出时无法知道具体的文件，按所有文件都已变化处理
+            if mask & IN_Q_OVERFLOW:
+                changed.add('')
+                continue
+            folder = self.folders.get(wd)
+            if folder is None:
+                continue
+            path = os.path.join(folder, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_watch(path)
+                continue
+            if is_watched_file(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(root_path):
+    """
+    该函数用于创建文件监视器，在 Linux 上优先使用 inotify，否则使用轮询
+    :param root_path:   Docsify的根目录
+    :return:            文件监视器
+    """
+    root_path = os.path.normpath(root_path)
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root_path)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root_path)
+
+
+class WatchSession:
+    """
+    该类用于实现监视模式：在内存中保留解析后的侧边栏与每个文件的片段，
+    文件变化时只使对应的片段失效，只有侧边栏文件变化时才重新解析侧边栏
+    """
+
+    def __init__(self, merger, output_file_path, debounce=0.2):
+        """
+        该函数用于初始化监视模式
+        :param merger:              合并器（DocsifyMerger），提供全部合并选项、标题编号匹配器、编号生成器与片段缓存。
+                                    嵌入文件在每次重新合并时重新读取，修改嵌入的 Markdown 文件同样会触发重新合并；
+                                    内存映射的文件不保留在内存中，每次重新合并时重新读取；资源目录中的变化不会触发重新合并
+        :param output_file_path:    输出文件路径
+        :param debounce:            防抖时间（秒），连续的文件变化在该时间内会被合并为一次重新合并
+        """
+        self.merger = merger
+        self.docsify_root_path = merger.docsify_path
+        self.output_file_path = os.path.abspath(output_file_path)
+        self.sidebar_path = os.path.normpath(os.path.join(self.docsify_root_path, '_sidebar.md'))
+        self.debounce = debounce
+        self.assets_dir = None
+        if merger.assets_dir is not None:
+            self.assets_dir = os.path.join(os.path.dirname(self.output_file_path), merger.assets_dir)
+        self.memo = {}
+        self.builder = FragmentBuilder(serial_number_matcher=merger.serial_number_matcher, cache=merger.cache,
+                                       memo=self.memo, resolve_links=merger.resolve_links,
+                                       mmap_threshold=merger.mmap_threshold, dedupe_pages=merger.dedupe_pages,
+                                       expand_includes=merger.expand_includes)
+        self.root = None
+
+    def invalidate(self, changed):
+        """
+        该函数用于使发生变化的文件对应的片段失效
+        :param changed:     发生变化的文件路径集合，包含空字符串时表示所有文件都需要重新读取
+        """
+        if '' in changed:
+            self.memo.clear()
+            self.root = None
+            return
+        changed = {os.path.normpath(path) for path in changed}
+        if self.sidebar_path in changed:
+            self.root = None
+        # 任何一个子侧边栏文件变化时，合并后的树都需要重新生成
+        elif self.merger.nested_sidebars and any(os.path.basename(path) == SIDEBAR_FILE_NAME for path in changed):
+            self.root = None
+        for key in [key for key in self.memo if os.path.normpath(key[0]) in changed]:
+            del self.memo[key]
+
+    def rebuild(self):
+        """
+        该函数用于重新合并并写入输出文件
+        :return:    重新读取的文件数量
+        """
+        merger = self.merger
+        if self.root is None:
+            self.root = load_sidebar(self.docsify_root_path, merger.homepage, merger.nested_sidebars, merger.workers)
+            if self.root is None:
+                return 0
+            # 侧边栏变化后，文件的层级可能发生变化，旧的片段不再适用
+            self.memo.clear()
+        cached = len(self.memo)
+        paths = iter_markdown_files(self.docsify_root_path, self.root, self.memo, merger.dedupe_pages,
+                                    merger.mmap_threshold)
+        sources = prefetch_markdown_files(paths, merger.workers, merger.mmap_threshold)
+        # 图片收集器只用于一次合并，片段中的占位标记与收集器无关，因此 memo 中的片段可以继续复用
+        assets = merger.new_asset_collector(os.path.dirname(self.output_file_path))
+        self.builder.assets = assets
+        tokens = merge_tree(self.docsify_root_path, self.root, sources, self.builder)
+        # 每次重新合并后标题的编号都可能变化，因此锚点索引每次重新建立
+        anchor_index = merger.new_anchor_index()
+        toc = merger.new_table_of_contents()
+        lines = renumber_titles(tokens, handel_unserial_number_title=merger.handel_unserial_number_title,
+                                handle_title_greater_than_level_six=merger.handle_title_greater_than_level_six,
+                                anchor_index=anchor_index, serial_number_generator=merger.serial_number_generator,
+                                toc=toc)
+        if assets is not None:
+            lines = assets.resolve_lines(lines)
+        write_output(self.output_file_path, lines, raw=merger.mmap_threshold is not None, anchor_index=anchor_index,
+                     toc=toc)
+        return len(self.memo) - cached
+
+    def is_output(self, path):
+        """
+        该函数用于判断发生变化的文件是否为本程序写入的文件（输出文件或资源目录中的文件）
+        :param path:    文件路径
+        :return:        是否为本程序写入的文件
+        """
+        if path == self.output_file_path:
+            return True
+        return self.assets_dir is not None and path.startswith(os.path.join(self.assets_dir, ''))
+
+    def wait_for_changes(self, watcher):
+        """
+        该函数用于等待文件发生变化，并在防抖时间内收集后续的变化
+        :param watcher:     文件监视器
+        :return:            发生变化的文件路径集合
+        """
+        while True:
+            changed = {path for path in watcher.poll(None) if not self.is_output(path)}
+            if changed:
+                break
+        while True:
+            more = {path for path in watcher.poll(self.debounce) if not self.is_output(path)}
+            if not more:
+                return changed
+            changed |= more
+
+    def run(self):
+        """
+        该函数用于启动监视模式，直到用户按下 Ctrl+C
+        """
+        logger = get_logger()
+        watcher = create_watcher(self.docsify_root_path)
+        logger.info(f"{t('Watching:')} '{self.docsify_root_path}' ({type(watcher).__name__})")
+        print(f"{t('Watching:')} '{self.docsify_root_path}'")
+        changed = None
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    reloaded = self.rebuild()
+                except (OSError, UnicodeDecodeError, ValueError) as e:
+                    # 编辑过程中文件可能暂时不存在或不完整，编号也可能超出范围，记录错误后继续监视
+                    logger.error(f"{t('Rebuild failed:')} {e}")
+                    print(f"{t('Rebuild failed:')} {e}")
+                else:
+                    # 磁盘缓存只用于加速第一次合并，之后的片段都保留在内存中，也避免每次重新合并时整理缓存目录
+                    self.builder.cache = None
+                    elapsed = (time.perf_counter() - start) * 1000
+                    logger.info(f"{t('Rebuilt in')} {elapsed:.1f} ms, {reloaded} {t('files reloaded')}"
+                                + (f", {len(changed)} {t('files changed')}" if changed else ""))
+                    print(f"{t('Rebuilt in')} {elapsed:.1f} ms, {reloaded} {t('files reloaded')}")
+                changed = self.wait_for_changes(watcher)
+                self.invalidate(changed)
+        except KeyboardInterrupt:
+            logger.info(t('Stop watching'))
+        finally:
+            watcher.close()